@@ -23,6 +23,12 @@ class BookAdmin(admin.ModelAdmin):
     prepopulated_fields = {'url': ('title',)}
     inlines = [ChapterInline]
 
+    def save_model(self, request, obj, form, change):
+        if change:
+            obj.save(update_fields=obj.changed_fields(form.changed_data))
+        else:
+            super().save_model(request, obj, form, change)
+
 @admin.register(Thematique)
 class ThematiqueAdmin(admin.ModelAdmin):
     list_display = ('title', 'book', 'created_at')
@@ -6,8 +6,24 @@ import fitz
 from PIL import Image
 import io
 import hashlib
+import multiprocessing
+from bisect import bisect_left, bisect_right
 from collections import defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Optional
 import pytesseract
+try:
+    import numpy as np  # optionnel : regroupement vectorisé des caractères en lignes
+except ImportError:
+    np = None
+
+from . import markers
+from .markers import classify_line, is_structural_marker
+from .ocr_cache import get_ocr_cache, ocr_cache_key
+
+# Version du résultat de parse_marked_pdf / extract_assets : à incrémenter quand la
+# sortie change, pour invalider les checkpoints de traitement (books.checkpoints)
+PARSER_VERSION = "1"
 
 def normalize_ws(s: str) -> str:
     return (
@@ -38,7 +54,7 @@ def split_heading_title_and_content(s: str):
 def is_page_number_line(s: str) -> bool:
     return bool(re.fullmatch(r"\d{1,3}", s))
 
-def parse_marked_pdf(pdf_path: str):
+def parse_marked_pdf(pdf_path: str, page_models=None, workers=None):
     result = {"thematiques": [], "chapters_sans_thematique": []}
     structure = result["chapters_sans_thematique"]
     current_thematique = None
@@ -47,198 +63,167 @@ def parse_marked_pdf(pdf_path: str):
     current_subsection = None
     ignore_mode = False
     ignored_repeat = set()
+    # Lecture unique des pages : toutes les passes ci-dessous travaillent sur ce modèle
+    if page_models is None:
+        page_models = build_page_models(pdf_path, workers=workers)
     try:
-        ignored_repeat = collect_repeating_headers_footers(pdf_path)
+        ignored_repeat = collect_repeating_headers_footers(pdf_path, page_models)
     except Exception:
         pass
-    # Regions for typed zones (used to filter content inside !!! table areas)
-    regions_by_page = {}
-    try:
-        regions_by_page = collect_capture_regions(pdf_path)
-    except Exception:
-        regions_by_page = {}
-    # Auto-detected table regions (to avoid adding table body into textual content)
-    auto_table_regions = {}
-    try:
-        auto_table_regions = collect_auto_table_regions(pdf_path)
-    except Exception:
-        auto_table_regions = {}
-    with pdfplumber.open(pdf_path) as pdf:
-        total_pages = len(pdf.pages)
-        for page_index, page in enumerate(pdf.pages):
-            page_height = float(page.height)
-            page_width = float(page.width)
-            lines = _page_lines_with_boxes(page)
-            if not lines:
+    # Regions for typed zones and auto-detected tables (to keep table bodies out of textual content)
+    region_index = build_region_index(pdf_path, page_models)
+    total_pages = len(page_models)
+    for page_index, pm in enumerate(page_models):
+        page_height = pm['height']
+        page_width = pm['width']
+        lines = pm['lines']
+        if not lines:
+            continue
+        # Cas particulier OCR : certaines pages scannées donnent une ligne '##' seule
+        # puis la ligne suivante '1.3 ...'. On mémorise qu'un marqueur de section
+        # vient d'apparaître pour promouvoir la ligne suivante en titre de section.
+        pending_hash_section = False
+        for ln in lines:
+            line = normalize_ws(ln.get('text', '')).strip()
+            if not line:
                 continue
-            # Cas particulier OCR : certaines pages scannées donnent une ligne '##' seule
-            # puis la ligne suivante '1.3 ...'. On mémorise qu'un marqueur de section
-            # vient d'apparaître pour promouvoir la ligne suivante en titre de section.
-            pending_hash_section = False
-            # merge typed regions and auto-detected table regions
-            page_regions = (regions_by_page.get(page_index + 1, []) or []) + (auto_table_regions.get(page_index + 1, []) or [])
-            for ln in lines:
-                line = normalize_ws(ln.get('text', '')).strip()
-                if not line:
-                    continue
-                if is_page_number_line(line):
-                    continue
-                if line in ignored_repeat:
-                    continue
-                # Determine if this line lies inside a typed table region (to avoid false chapter detections)
+            if is_page_number_line(line):
+                continue
+            if line in ignored_repeat:
+                continue
+            # Determine if this line lies inside a typed table region (to avoid false chapter detections)
+            try:
+                in_typed_table = region_index.line_in_table(
+                    page_index + 1,
+                    (float(ln.get('y0', 0.0)) + float(ln.get('y1', 0.0))) / 2.0,
+                    float(ln.get('x0', 0.0)),
+                    float(ln.get('x1', page_width)),
+                )
+            except Exception:
                 in_typed_table = False
-                try:
-                    if page_regions:
-                        ymid = (float(ln.get('y0', 0.0)) + float(ln.get('y1', 0.0))) / 2.0
-                        lx0 = float(ln.get('x0', 0.0))
-                        lx1 = float(ln.get('x1', page_width))
-                        def _overlap(a0, a1, b0, b1):
-                            return not (a1 <= b0 or a0 >= b1)
-                        in_typed_table = any(
-                            (r.get('kind') == 'table')
-                            and (float(r['y0']) <= ymid <= float(r['y1']))
-                            and _overlap(lx0, lx1, float(r.get('x0', 0.0)), float(r.get('x1', page_width)))
-                            for r in page_regions
-                        )
-                except Exception:
-                    in_typed_table = False
-                # Compute relative vertical position for heading heuristics
-                ymid = (float(ln.get('y0', 0.0)) + float(ln.get('y1', 0.0))) / 2.0
-                top_zone_ch = page_height * 0.35
-                top_zone_sec = page_height * 0.5
-                marker_bang = line.replace('！', '!').replace('﹗', '!').replace('︕', '!')
-                if re.match(r'^\s*[\-\u2022•▪·»]*\s*!!\s*/\s*$', marker_bang):
-                    ignore_mode = False
-                    continue
-                if re.match(r'^\s*[\-\u2022•▪·»]*\s*!!(?!/).*$' , marker_bang):
-                    ignore_mode = True
-                    continue
-                if ignore_mode:
-                    continue
-                marker = marker_bang
-                # Skip region capture markers from structure/content
-                if re.match(r'^\s*!!!\s*/\s*$', marker) or re.match(r'^\s*!!!(?!/).*$' , marker):
-                    continue
-                # Skip typed region tags <table>, </table>, <img>, </img> from structure/content
-                if re.match(r'^\s*<\s*/?\s*table\s*>\s*$', marker, flags=re.IGNORECASE) or \
-                   re.match(r'^\s*<\s*/?\s*img\s*>\s*$', marker, flags=re.IGNORECASE):
-                    continue
-                if re.match(r'^\s*!\s*/\s*$', marker):
-                    if current_thematique and 'end_page' not in current_thematique:
-                        current_thematique['end_page'] = page_index + 1
-                    current_thematique = None
-                    structure = result["chapters_sans_thematique"]
-                    current_chapter = None
-                    current_section = None
-                    current_subsection = None
-                    continue
-                m_theme = re.match(r'^\s*!\s*(.+)$', marker)
-                m_sub = re.match(r'^\s*#{3,}\s*(.+)$', line)
-                m_sec = re.match(r'^\s*##(?!#)\s*(.+)$', line)
-                m_ch = re.match(r'^\s*#(?!#)\s*(.+)$', line)
-                # Heuristics for numeric/keyword headings when '#' not present
-                m_ch_num = None
-                m_sec_num = None
-                # Chapter-like: within top zone, accept even if inside typed table (to not miss headings near tables)
-                if ymid <= top_zone_ch:
-                    m_ch_num = re.match(r'^\s*\d{1,2}\s*[\.)]\s*(.+)$', line)
-                    if not m_ch_num and re.match(r'^\s*(Appendix\s+[A-Z]|Glossary|Further\s+Reading)\b', line, flags=re.IGNORECASE):
-                        m_ch_num = re.match(r'^(.*)$', line)
-                # Section-like: allow a bit deeper zone
-                if ymid <= top_zone_sec:
-                    m_sec_num = re.match(r'^\s*\d{1,2}\.\d+\s+(.+)$', line)
-
-                # Cas OCR : si la ligne précédente était exactement '##',
-                # on traite cette ligne numérique comme un titre de section.
-                if pending_hash_section and not m_sec and not m_sec_num:
-                    m_sec_num = re.match(r'^\s*\d{1,2}\.\d+\s+(.+)$', line)
-                # Une fois la ligne courante analysée, on réinitialise le flag
-                # (on ne veut l'appliquer que sur la ligne immédiatement suivante).
-                if not re.fullmatch(r'^\s*##\s*$', line):
-                    pending_hash_section = False
-                if m_theme:
-                    if current_thematique and 'end_page' not in current_thematique:
-                        current_thematique['end_page'] = page_index + 1
-                    raw_theme = m_theme.group(1).strip()
-                    left, right = split_heading_title_and_content(raw_theme)
-                    theme = {"title": left, "description": right or "", "chapters": [], "start_page": page_index + 1}
-                    result["thematiques"].append(theme)
-                    current_thematique = theme
-                    structure = current_thematique["chapters"]
-                    current_chapter = None
-                    current_section = None
-                    current_subsection = None
+            # Compute relative vertical position for heading heuristics
+            ymid = (float(ln.get('y0', 0.0)) + float(ln.get('y1', 0.0))) / 2.0
+            top_zone_ch = page_height * 0.35
+            top_zone_sec = page_height * 0.5
+            tok = classify_line(line)
+            kind = tok.kind
+            if kind == markers.IGNORE_END:
+                ignore_mode = False
+                continue
+            if kind == markers.IGNORE_START:
+                ignore_mode = True
+                continue
+            if ignore_mode:
+                continue
+            # Skip region capture markers and typed region tags <table>, </table>, <img>, </img>
+            if kind in (markers.REGION, markers.TAG_OPEN, markers.TAG_CLOSE, markers.TAG_SPACED):
+                continue
+            if kind == markers.THEME_END:
+                if current_thematique and 'end_page' not in current_thematique:
+                    current_thematique['end_page'] = page_index + 1
+                current_thematique = None
+                structure = result["chapters_sans_thematique"]
+                current_chapter = None
+                current_section = None
+                current_subsection = None
+                continue
+            # Heuristics for numeric/keyword headings when '#' not present
+            ch_num = None
+            sec_num = None
+            # Chapter-like: within top zone, accept even if inside typed table (to not miss headings near tables)
+            if ymid <= top_zone_ch:
+                ch_num = tok.ch_num if tok.ch_num is not None else tok.keyword
+            # Section-like: allow a bit deeper zone
+            if ymid <= top_zone_sec:
+                sec_num = tok.sec_num
+
+            # Cas OCR : si la ligne précédente était exactement '##',
+            # on traite cette ligne numérique comme un titre de section.
+            if pending_hash_section and kind != markers.SECTION and sec_num is None:
+                sec_num = tok.sec_num
+            # Une fois la ligne courante analysée, on réinitialise le flag
+            # (on ne veut l'appliquer que sur la ligne immédiatement suivante).
+            if kind != markers.HASH_ONLY:
+                pending_hash_section = False
+            if kind == markers.THEME:
+                if current_thematique and 'end_page' not in current_thematique:
+                    current_thematique['end_page'] = page_index + 1
+                raw_theme = tok.title.strip()
+                left, right = split_heading_title_and_content(raw_theme)
+                theme = {"title": left, "description": right or "", "chapters": [], "start_page": page_index + 1}
+                result["thematiques"].append(theme)
+                current_thematique = theme
+                structure = current_thematique["chapters"]
+                current_chapter = None
+                current_section = None
+                current_subsection = None
+                continue
+            if kind == markers.CHAPTER or ch_num is not None:
+                if current_subsection and 'end_page' not in current_subsection:
+                    current_subsection['end_page'] = page_index + 1
+                if current_section and 'end_page' not in current_section:
+                    current_section['end_page'] = page_index + 1
+                if current_chapter and 'end_page' not in current_chapter:
+                    current_chapter['end_page'] = page_index + 1
+                ch_title = (tok.title if kind == markers.CHAPTER else ch_num).strip()
+                current_chapter = {"title": ch_title, "content": [], "sections": [], "images": [], "tables": [], "start_page": page_index + 1}
+                structure.append(current_chapter)
+                current_section = None
+                current_subsection = None
+                continue
+            if kind == markers.SECTION or sec_num is not None:
+                if current_chapter is None:
+                    # Ignore sections until a chapter '#' is explicitly set
                     continue
-                if m_ch or (m_ch_num and not m_ch):
-                    if current_subsection and 'end_page' not in current_subsection:
-                        current_subsection['end_page'] = page_index + 1
-                    if current_section and 'end_page' not in current_section:
-                        current_section['end_page'] = page_index + 1
-                    if current_chapter and 'end_page' not in current_chapter:
-                        current_chapter['end_page'] = page_index + 1
-                    ch_title = (m_ch.group(1) if m_ch else m_ch_num.group(1)).strip()
-                    current_chapter = {"title": ch_title, "content": [], "sections": [], "images": [], "tables": [], "start_page": page_index + 1}
-                    structure.append(current_chapter)
-                    current_section = None
-                    current_subsection = None
+                if current_subsection and 'end_page' not in current_subsection:
+                    current_subsection['end_page'] = page_index + 1
+                if current_section and 'end_page' not in current_section:
+                    current_section['end_page'] = page_index + 1
+                sec_title = (tok.title if kind == markers.SECTION else sec_num).strip()
+                current_section = {"title": sec_title, "content": [], "subsections": [], "images": [], "tables": [], "start_page": page_index + 1}
+                current_chapter["sections"].append(current_section)
+                current_subsection = None
+                continue
+            if kind == markers.SUBSECTION:
+                if current_chapter is None:
+                    # Ignore subsections until a chapter '#' is explicitly set
                     continue
-                if m_sec or (m_sec_num and not m_sec):
-                    if current_chapter is None:
-                        # Ignore sections until a chapter '#' is explicitly set
-                        continue
-                    if current_subsection and 'end_page' not in current_subsection:
-                        current_subsection['end_page'] = page_index + 1
-                    if current_section and 'end_page' not in current_section:
-                        current_section['end_page'] = page_index + 1
-                    sec_title = (m_sec.group(1) if m_sec else m_sec_num.group(1)).strip()
-                    current_section = {"title": sec_title, "content": [], "subsections": [], "images": [], "tables": [], "start_page": page_index + 1}
+                if current_subsection and 'end_page' not in current_subsection:
+                    current_subsection['end_page'] = page_index + 1
+                sub_title = tok.title.strip()
+                if current_section is None:
+                    # Create a default section only if a chapter exists
+                    current_section = {"title": "Section", "content": [], "subsections": [], "images": [], "tables": [], "start_page": page_index + 1}
                     current_chapter["sections"].append(current_section)
-                    current_subsection = None
-                    continue
-                if m_sub:
-                    if current_chapter is None:
-                        # Ignore subsections until a chapter '#' is explicitly set
-                        continue
-                    if current_subsection and 'end_page' not in current_subsection:
-                        current_subsection['end_page'] = page_index + 1
-                    sub_title = m_sub.group(1).strip()
-                    if current_section is None:
-                        # Create a default section only if a chapter exists
-                        current_section = {"title": "Section", "content": [], "subsections": [], "images": [], "tables": [], "start_page": page_index + 1}
-                        current_chapter["sections"].append(current_section)
-                    current_subsection = {"title": sub_title, "content": [], "images": [], "tables": [], "start_page": page_index + 1}
-                    current_section["subsections"].append(current_subsection)
-                    continue
-                # Si la ligne est exactement '##' (cas OCR), on ne l'ajoute pas au contenu
-                # mais on marque que la prochaine ligne numérique pourra devenir une section.
-                if re.fullmatch(r'^\s*##\s*$', line):
-                    pending_hash_section = True
-                    continue
+                current_subsection = {"title": sub_title, "content": [], "images": [], "tables": [], "start_page": page_index + 1}
+                current_section["subsections"].append(current_subsection)
+                continue
+            # Si la ligne est exactement '##' (cas OCR), on ne l'ajoute pas au contenu
+            # mais on marque que la prochaine ligne numérique pourra devenir une section.
+            if kind == markers.HASH_ONLY:
+                pending_hash_section = True
+                continue
 
-                # Skip figure/table caption lines from textual content
-                if re.match(r"^(?:fig(?:ure)?\.?)[\s\u00A0]*\d*\s*[:.-]?\s*.+$", line, flags=re.IGNORECASE):
-                    continue
-                if re.match(r"^(?:tableau|table)\s*\d*\s*[:.-]?\s*.+$", line, flags=re.IGNORECASE):
-                    continue
-                if re.search(r"\*(.+?)\*", line):
-                    continue
-                # Skip lines inside typed table regions to avoid duplicating into textual content
-                if in_typed_table:
-                    continue
-                if current_subsection is not None:
-                    current_subsection["content"].append(line)
-                elif current_section is not None:
-                    current_section["content"].append(line)
-                elif current_chapter is not None:
-                    current_chapter["content"].append(line)
-        if current_subsection and 'end_page' not in current_subsection:
-            current_subsection['end_page'] = total_pages
-        if current_section and 'end_page' not in current_section:
-            current_section['end_page'] = total_pages
-        if current_chapter and 'end_page' not in current_chapter:
-            current_chapter['end_page'] = total_pages
-        if current_thematique and 'end_page' not in current_thematique:
-            current_thematique['end_page'] = total_pages
+            # Skip figure/table caption lines and *emphasised* lines from textual content
+            if tok.caption or tok.emphasis:
+                continue
+            # Skip lines inside typed table regions to avoid duplicating into textual content
+            if in_typed_table:
+                continue
+            if current_subsection is not None:
+                current_subsection["content"].append(line)
+            elif current_section is not None:
+                current_section["content"].append(line)
+            elif current_chapter is not None:
+                current_chapter["content"].append(line)
+    if current_subsection and 'end_page' not in current_subsection:
+        current_subsection['end_page'] = total_pages
+    if current_section and 'end_page' not in current_section:
+        current_section['end_page'] = total_pages
+    if current_chapter and 'end_page' not in current_chapter:
+        current_chapter['end_page'] = total_pages
+    if current_thematique and 'end_page' not in current_thematique:
+        current_thematique['end_page'] = total_pages
     return result
 
 def ocr_page(page):
@@ -274,60 +259,100 @@ def ocr_page(page):
             pil_img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
         if pil_img.mode != "RGB":
             pil_img = pil_img.convert("RGB")
-        text = pytesseract.image_to_string(pil_img)
-        return text or ""
+        return _ocr_image(pil_img)
     except Exception:
         return ""
 
-def collect_page_captions(pdf_path: str):
-    page_image_caps = {}
-    page_table_caps = {}
+
+# Langue tesseract utilisée pour l'OCR de secours (défaut tesseract: 'eng')
+OCR_LANG = os.getenv("OCR_LANG", "eng")
+_tesseract_version = None
+
+
+def _get_tesseract_version() -> str:
+    global _tesseract_version
+    if _tesseract_version is None:
+        try:
+            _tesseract_version = str(pytesseract.get_tesseract_version())
+        except Exception:
+            _tesseract_version = "unknown"
+    return _tesseract_version
+
+
+def _ocr_image(pil_img, lang: Optional[str] = None) -> str:
+    """OCR d'une image PIL, avec le cache disque (ocr_cache) partagé entre livres.
+
+    La même page rendue (même pixels, même langue, même version de tesseract)
+    n'est reconnue qu'une seule fois ; seuls les résultats réussis sont mis en cache.
+    """
+    lang = lang or OCR_LANG
+    cache = None
+    key = None
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            for page_index, page in enumerate(pdf.pages):
-                text = page.extract_text(x_tolerance=2, y_tolerance=3) or ""
-                if not text.strip():
-                    # Fallback OCR pour les pages scannées
-                    text = ocr_page(page)
-                if not text:
-                    continue
-                img_caps = []
-                tbl_caps = []
-                lines = text.split("\n")
-                i = 0
-                while i < len(lines):
-                    line = normalize_ws(lines[i]).strip()
-                    # Détection Figure avec ou sans numéro + titre évent sur ligne suivante
-                    m_fig = re.match(r"^(?:fig(?:ure)?\.?)\s*\d*\s*[:.-]?\s*(.*)$", line, flags=re.IGNORECASE)
-                    if m_fig:
-                        cap = m_fig.group(1).strip()
-                        if not cap and i+1 < len(lines):
-                            cap = normalize_ws(lines[i+1]).strip()
-                            i += 1
-                        if cap:
-                            img_caps.append(cap)
-                    # Même chose pour Table/Tableau – plus souple
-                    m_tab = re.match(r"^(?:tableau|table)\s*\d+\s*[:.—–-]?\s*(.*)$", line, flags=re.IGNORECASE)
-                    if m_tab:
-                        cap = m_tab.group(1).strip()
-                        if not cap and i+1 < len(lines):
-                            next_line = normalize_ws(lines[i+1])
-                            if not next_line.isupper() and len(next_line) > 5:  # évite les faux positifs
-                                cap = next_line.strip()
-                                i += 1
-                        if cap or m_tab.group(0):  # accepte même sans titre
-                            tbl_caps.append(cap or "Tableau sans titre")
-                    elif re.search(r"\*(.+?)\*", line):
-                        for c in re.findall(r"\*(.+?)\*", line):
-                            c2 = c.strip()
-                            if c2:
-                                img_caps.append(c2)
+        cache = get_ocr_cache()
+        if cache is not None:
+            key = ocr_cache_key(pil_img, lang, _get_tesseract_version())
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+    except Exception as e:
+        print(f"⚠️ Cache OCR indisponible: {e}")
+        cache = None
+    text = pytesseract.image_to_string(pil_img, lang=lang) or ""
+    if cache is not None and key is not None:
+        try:
+            cache.put(key, text)
+        except Exception as e:
+            print(f"⚠️ Écriture du cache OCR impossible: {e}")
+    return text
+
+def _captions_from_text(text: str):
+    """Extrait les légendes Figure/Tableau d'un texte de page (extract_text ou OCR)."""
+    img_caps = []
+    tbl_caps = []
+    lines = text.split("\n")
+    i = 0
+    while i < len(lines):
+        line = normalize_ws(lines[i]).strip()
+        # Détection Figure avec ou sans numéro + titre évent sur ligne suivante
+        m_fig = re.match(r"^(?:fig(?:ure)?\.?)\s*\d*\s*[:.-]?\s*(.*)$", line, flags=re.IGNORECASE)
+        if m_fig:
+            cap = m_fig.group(1).strip()
+            if not cap and i+1 < len(lines):
+                cap = normalize_ws(lines[i+1]).strip()
+                i += 1
+            if cap:
+                img_caps.append(cap)
+        # Même chose pour Table/Tableau – plus souple
+        m_tab = re.match(r"^(?:tableau|table)\s*\d+\s*[:.—–-]?\s*(.*)$", line, flags=re.IGNORECASE)
+        if m_tab:
+            cap = m_tab.group(1).strip()
+            if not cap and i+1 < len(lines):
+                next_line = normalize_ws(lines[i+1])
+                if not next_line.isupper() and len(next_line) > 5:  # évite les faux positifs
+                    cap = next_line.strip()
                     i += 1
+            if cap or m_tab.group(0):  # accepte même sans titre
+                tbl_caps.append(cap or "Tableau sans titre")
+        elif re.search(r"\*(.+?)\*", line):
+            for c in re.findall(r"\*(.+?)\*", line):
+                c2 = c.strip()
+                if c2:
+                    img_caps.append(c2)
+        i += 1
+    return img_caps, tbl_caps
 
-                if img_caps:
-                    page_image_caps[page_index + 1] = img_caps
-                if tbl_caps:
-                    page_table_caps[page_index + 1] = tbl_caps
+def collect_page_captions(pdf_path: str, page_models=None):
+    page_image_caps = {}
+    page_table_caps = {}
+    try:
+        if page_models is None:
+            page_models = build_page_models(pdf_path)
+        for pm in page_models:
+            if pm['image_captions']:
+                page_image_caps[pm['number']] = list(pm['image_captions'])
+            if pm['table_captions']:
+                page_table_caps[pm['number']] = list(pm['table_captions'])
     except Exception as e:
         pass
     return page_image_caps, page_table_caps
@@ -368,6 +393,12 @@ def _page_lines_with_boxes(page):
             x1 = max(float(it.get('x1', x0+1)) for it in current)
             lines.append({'text': normalize_ws(text).strip(), 'y0': y0, 'y1': y1, 'x0': x0, 'x1': x1})
         return lines
+    if np is not None:
+        try:
+            return _char_lines_numpy(chars)
+        except (KeyError, TypeError, ValueError):
+            # caractère sans coordonnées exploitables : regroupement Python ci-dessous
+            pass
     chars.sort(key=lambda c: (float(c.get('top', 0)), float(c.get('x0', 0))))
     lines = []
     current = []
@@ -401,209 +432,486 @@ def _page_lines_with_boxes(page):
         ln['text'] = ln['text'].strip()
     return lines
 
-def collect_repeating_headers_footers(pdf_path: str):
-    from collections import defaultdict as _dd
-    repeats = _dd(int)
-    total_pages = 0
-    try:
-        with pdfplumber.open(pdf_path) as pdf:
-            for page in pdf.pages:
-                total_pages += 1
-                h = float(page.height)
-                lines = _page_lines_with_boxes(page)
-                for ln in lines:
-                    y0 = float(ln.get('y0', 0.0))
-                    y1 = float(ln.get('y1', 0.0))
-                    mid = (y0 + y1) / 2.0
-                    top_zone = h * 0.14
-                    bot_zone = h * 0.86
-                    if mid <= top_zone or mid >= bot_zone:
-                        t = ln.get('text', '').strip()
-                        if t and not is_page_number_line(t):
-                            repeats[t] += 1
-    except Exception:
-        return set()
-    thr = max(3, int(0.4 * max(1, total_pages)))
-    return {t for t, c in repeats.items() if c >= thr}
+def _char_lines_numpy(chars, tol=3.0):
+    """Version NumPy du regroupement caractères -> lignes de _page_lines_with_boxes.
 
-def collect_capture_regions(pdf_path: str):
-    regions_by_page = {}
+    Même résultat que la boucle Python : tri stable (top, x0), une ligne regroupe
+    les caractères à moins de tol du premier caractère de la ligne, texte dans
+    l'ordre des x0, boîte = min/max des coordonnées.
+    """
+    n = len(chars)
+    tops = np.fromiter((float(c['top']) for c in chars), dtype=float, count=n)
+    bottoms = np.fromiter((float(c['bottom']) for c in chars), dtype=float, count=n)
+    x0s = np.fromiter((float(c['x0']) for c in chars), dtype=float, count=n)
+    x1s = np.fromiter((float(c['x1']) for c in chars), dtype=float, count=n)
+    texts = [c.get('text', '') for c in chars]
+    order = np.lexsort((x0s, tops))
+    tops_s = tops[order]
+    # Début de chaque ligne : premier caractère à plus de tol du début de la ligne
+    # précédente (searchsorted, puis ajustement exact sur la comparaison top - début <= tol)
+    starts = []
+    start = 0
+    while start < n:
+        anchor = tops_s[start]
+        k = int(np.searchsorted(tops_s, anchor + tol, side='right'))
+        while k < n and tops_s[k] - anchor <= tol:
+            k += 1
+        while k > start + 1 and tops_s[k - 1] - anchor > tol:
+            k -= 1
+        starts.append(start)
+        start = k
+    bounds = np.array(starts)
+    y0s = np.minimum.reduceat(tops_s, bounds).tolist()
+    y1s = np.maximum.reduceat(bottoms[order], bounds).tolist()
+    lx0s = np.minimum.reduceat(x0s[order], bounds).tolist()
+    lx1s = np.maximum.reduceat(x1s[order], bounds).tolist()
+    ends = starts[1:] + [n]
+    lines = []
+    for i, (s, e) in enumerate(zip(starts, ends)):
+        idx = order[s:e]
+        idx = idx[np.argsort(x0s[idx], kind='stable')]
+        text = "".join([texts[j] for j in idx.tolist()])
+        lines.append({'text': normalize_ws(text).strip(), 'y0': y0s[i], 'y1': y1s[i], 'x0': lx0s[i], 'x1': lx1s[i]})
+    return lines
+
+def _resolve_workers(workers):
+    """Nombre de processus d'extraction, borné par le nombre de CPU (1 = séquentiel)."""
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            active = None  # (start_page_idx, start_y, kind)
-            for pi, page in enumerate(pdf.pages):
-                page_height = float(page.height)
-                lines = _page_lines_with_boxes(page)
-                for ln in lines:
-                    text = ln['text']
-                    # Chapitres/sections (lignes commençant par '#') ont la priorité :
-                    # on ne les utilise jamais pour ouvrir/fermer une région.
-                    if re.match(r'^\s*#', text):
-                        continue
+        workers = int(workers or 1)
+    except (TypeError, ValueError):
+        workers = 1
+    return max(1, min(workers, os.cpu_count() or 1))
 
-                    marker_bang = text.replace('！', '!').replace('﹗', '!').replace('︕', '!')
+def _page_ranges(total_pages, workers, min_pages=8):
+    """Découpe [0, total_pages) en plages contiguës, environ 4 par worker pour équilibrer la charge."""
+    if total_pages <= 0:
+        return []
+    size = max(min_pages, -(-total_pages // (workers * 4)))
+    return [(start, min(total_pages, start + size)) for start in range(0, total_pages, size)]
 
-                    lower = marker_bang.strip().lower()
+def _process_pool(workers):
+    # 'spawn' plutôt que fork : l'import tourne dans un thread du serveur web
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
 
-                    # --- Fin de région sur balises fermantes </table> ou </img> ---
-                    if re.match(r'^\s*</\s*table\s*>\s*$', lower) or re.match(r'^\s*</\s*img\s*>\s*$', lower):
-                        if active is not None:
-                            sp, sy, kind = active
-                            if sp == pi:
-                                regions_by_page.setdefault(pi + 1, []).append({
-                                    'y0': sy,
-                                    'y1': max(ln['y0'], sy),
-                                    'kind': kind
-                                })
-                            else:
-                                # first partial page
-                                regions_by_page.setdefault(sp + 1, []).append({'y0': sy, 'y1': pdf.pages[sp].height, 'kind': kind})
-                                # middle full pages
-                                for mid in range(sp + 1, pi):
-                                    regions_by_page.setdefault(mid + 1, []).append({'y0': 0.0, 'y1': pdf.pages[mid].height, 'kind': kind})
-                                # last partial
-                                regions_by_page.setdefault(pi + 1, []).append({'y0': 0.0, 'y1': max(ln['y0'], 0.0), 'kind': kind})
-                            active = None
-                        continue
+def _count_pages(pdf_path):
+    with fitz.open(pdf_path) as doc:
+        return len(doc)
 
-                    # --- Début de région sur <table> ou <img> ---
-                    if re.match(r'^\s*<\s*table\s*>\s*$', lower):
-                        # début de région pour un tableau
-                        active = (pi, float(ln['y1']), 'table')
-                        continue
-                    if re.match(r'^\s*<\s*img\s*>\s*$', lower):
-                        # début de région pour une image
-                        active = (pi, float(ln['y1']), 'image')
-                        continue
-                # page end: continue until an end marker appears on later page
-            # document end: if still active, close to end of last page
-            if active is not None:
-                sp, sy, kind = active
-                regions_by_page.setdefault(sp + 1, []).append({'y0': sy, 'y1': pdf.pages[sp].height, 'kind': kind})
+def _release_page(page):
+    # pdfplumber garde en cache les objets de chaque page ouverte
+    try:
+        page.close()
     except Exception:
         pass
-    return regions_by_page
 
-def collect_auto_table_regions(pdf_path: str):
-    regions_by_page = {}
+_TABLE_SETTINGS_LINES = {
+    "vertical_strategy": "lines",
+    "horizontal_strategy": "lines",
+    "intersection_tolerance": 5,
+    "snap_tolerance": 3,
+    "edge_min_length": 3,
+    "min_words_vertical": 1,
+    "min_words_horizontal": 1,
+    "join_tolerance": 3,
+    "text_x_tolerance": 2,
+    "text_y_tolerance": 2,
+}
+
+_TABLE_SETTINGS_TEXT = {
+    "vertical_strategy": "text",
+    "horizontal_strategy": "text",
+    "snap_tolerance": 3,
+    "join_tolerance": 3,
+    "text_x_tolerance": 3,
+    "text_y_tolerance": 3,
+}
+
+def _find_table_bboxes(ppage):
+    """Boîtes (x0, top, x1, bottom) des tableaux pdfplumber d'au moins 2x2 cellules."""
+    tables = []
+    try:
+        if hasattr(ppage, 'find_tables'):
+            tables = ppage.find_tables(table_settings=_TABLE_SETTINGS_LINES) or []
+            if not tables:
+                tables = ppage.find_tables(table_settings=_TABLE_SETTINGS_TEXT) or []
+    except Exception:
+        tables = []
+    bboxes = []
+    for t in tables or []:
+        try:
+            extracted = t.extract() if hasattr(t, 'extract') else []
+            nrows = len(extracted) if extracted else 0
+            ncols = max((len(r) if r else 0) for r in extracted) if nrows > 0 else 0
+            if nrows >= 2 and ncols >= 2:
+                x0, top, x1, bottom = t.bbox
+                bboxes.append((float(x0), float(top), float(x1), float(bottom)))
+        except Exception:
+            pass
+    return bboxes
+
+def build_page_models(pdf_path: str, workers=None, ocr_workers=None):
+    """Lit chaque page du PDF une seule fois et retourne un modèle en mémoire par page.
+
+    Chaque modèle (dict) contient : numéro, dimensions, lignes avec boîtes,
+    texte brut (OCR en secours), légendes figure/tableau, dessins vectoriels
+    et, pour les pages proches d'une légende de tableau, les boîtes des
+    tableaux détectés. Les collecteurs (en-têtes répétés, régions balisées,
+    légendes, tableaux auto) lisent ce modèle au lieu de rouvrir le PDF.
+
+    Avec workers > 1, les plages de pages sont lues dans un pool de processus
+    puis fusionnées dans l'ordre. Avec ocr_workers > 1, l'OCR des pages sans
+    texte est sorti de la lecture et confié à un pool dédié (voir _run_ocr_stage).
+    """
+    workers = _resolve_workers(workers)
+    defer_ocr = _resolve_workers(ocr_workers) > 1
+    ranges = _page_ranges(_count_pages(pdf_path), workers) if workers > 1 else []
+    if len(ranges) <= 1:
+        page_models = _page_models_for_range(pdf_path, 0, None, defer_ocr)
+        if not defer_ocr:
+            return page_models
+    else:
+        with _process_pool(workers) as ex:
+            futures = [ex.submit(_page_models_for_range, pdf_path, start, stop, defer_ocr) for start, stop in ranges]
+            page_models = [pm for fut in futures for pm in fut.result()]
+    if defer_ocr:
+        _run_ocr_stage(pdf_path, page_models, ocr_workers)
+    _resolve_table_windows(pdf_path, page_models)
+    return page_models
+
+def _page_models_for_range(pdf_path, start, stop, defer_ocr=False):
+    """Modèles des pages [start, stop) avec ses propres handles pdfplumber/PyMuPDF.
+
+    La fenêtre « légende de tableau » dépend des deux pages précédentes : en début
+    de plage (start > 0) elle peut rester indéterminée (table_window = None), elle
+    est alors résolue après fusion par _resolve_table_windows.
+    Avec defer_ocr, les pages sans texte sont marquées 'needs_ocr' au lieu d'être
+    reconnues ici.
+    """
+    page_models = []
+    fdoc = None
     try:
-        # only trust auto regions on pages that actually contain a table caption
-        _, page_table_caps = collect_page_captions(pdf_path)
+        fdoc = fitz.open(pdf_path)
     except Exception:
-        page_table_caps = {}
+        fdoc = None
     try:
         with pdfplumber.open(pdf_path) as pdf:
             last_caption_page = None
-            for pi, ppage in enumerate(pdf.pages):
-                has_caption = bool(page_table_caps.get(pi + 1))
-                allow_from_caption_window = (last_caption_page is not None) and ((pi + 1) - last_caption_page <= 2)
-                if not (has_caption or allow_from_caption_window):
-                    if has_caption:
-                        last_caption_page = pi + 1
-                    continue
-                if has_caption:
-                    last_caption_page = pi + 1
-                tables = []
+            stop = len(pdf.pages) if stop is None else min(stop, len(pdf.pages))
+            for page_index in range(start, stop):
+                page = pdf.pages[page_index]
                 try:
-                    if hasattr(ppage, 'find_tables'):
-                        ts_line = {
-                            "vertical_strategy": "lines",
-                            "horizontal_strategy": "lines",
-                            "intersection_tolerance": 5,
-                            "snap_tolerance": 3,
-                            "edge_min_length": 3,
-                            "min_words_vertical": 1,
-                            "min_words_horizontal": 1,
-                            "join_tolerance": 3,
-                            "text_x_tolerance": 2,
-                            "text_y_tolerance": 2,
-                        }
-                        tables = ppage.find_tables(table_settings=ts_line) or []
-                        if not tables:
-                            ts_text = {
-                                "vertical_strategy": "text",
-                                "horizontal_strategy": "text",
-                                "snap_tolerance": 3,
-                                "join_tolerance": 3,
-                                "text_x_tolerance": 3,
-                                "text_y_tolerance": 3,
-                            }
-                            tables = ppage.find_tables(table_settings=ts_text) or []
+                    lines = _page_lines_with_boxes(page)
                 except Exception:
-                    tables = []
+                    lines = []
                 try:
-                    pw = float(ppage.width); ph = float(ppage.height)
+                    text = page.extract_text(x_tolerance=2, y_tolerance=3) or ""
                 except Exception:
-                    pw = 1.0; ph = 1.0
-                pad_x = 0.02 * pw
-                pad_y0 = 0.005 * ph
-                pad_y1 = 0.01 * ph
-                regions_local = []
-                for t in tables or []:
-                    try:
-                        extracted = t.extract() if hasattr(t, 'extract') else []
-                        nrows = len(extracted) if extracted else 0
-                        ncols = max((len(r) if r else 0) for r in extracted) if nrows > 0 else 0
-                        if nrows >= 2 and ncols >= 2:
-                            x0, top, x1, bottom = t.bbox
-                            regions_local.append((float(x0), float(top), float(x1), float(bottom)))
-                    except Exception:
-                        pass
-                if not regions_local:
+                    text = ""
+                needs_ocr = not text.strip()
+                if needs_ocr and not defer_ocr:
+                    # Fallback OCR pour les pages scannées
+                    text = ocr_page(page)
+                    needs_ocr = False
+                img_caps, tbl_caps = _captions_from_text(text) if text else ([], [])
+                drawings = []
+                if fdoc is not None:
                     try:
-                        drs = ppage.parent.load_page(pi).get_drawings()
+                        drawings = fdoc.load_page(page_index).get_drawings() or []
                     except Exception:
-                        drs = []
-                    tmp = []
-                    try:
-                        area_min = 0.05 * (pw * ph)
-                        area_max = 0.85 * (pw * ph)
-                        for d in drs or []:
-                            r = d.get('rect')
-                            if r is not None:
-                                bb = (float(r.x0), float(r.y0), float(r.x1), float(r.y1))
-                            else:
-                                items = d.get('items') or []
-                                xs, ys = [], []
-                                for it in items:
-                                    pts = it[1] if len(it) > 1 else []
-                                    for pt in pts:
-                                        xs.append(pt[0]); ys.append(pt[1])
-                                if xs and ys:
-                                    bb = (float(min(xs)), float(min(ys)), float(max(xs)), float(max(ys)))
-                                else:
-                                    continue
-                            area = (bb[2] - bb[0]) * (bb[3] - bb[1])
-                            if area_min <= area <= area_max:
-                                tmp.append(bb)
-                        tmp.sort(key=lambda b: (b[2]-b[0])*(b[3]-b[1]), reverse=True)
-                        uniq = []
-                        for b in tmp:
-                            if not uniq:
-                                uniq.append(b)
-                                continue
-                            iox0 = max(b[0], uniq[-1][0]); ioy0 = max(b[1], uniq[-1][1])
-                            iox1 = min(b[2], uniq[-1][2]); ioy1 = min(b[3], uniq[-1][3])
-                            iow = max(0.0, iox1 - iox0); ioh = max(0.0, ioy1 - ioy0)
-                            inter = iow * ioh
-                            ua = (b[2]-b[0])*(b[3]-b[1]) + (uniq[-1][2]-uniq[-1][0])*(uniq[-1][3]-uniq[-1][1]) - inter
-                            if ua == 0 or (inter / ua) < 0.5:
-                                uniq.append(b)
-                        regions_local = uniq[:2]
-                    except Exception:
-                        regions_local = []
-                for (x0, top, x1, bottom) in regions_local:
-                    regions_by_page.setdefault(pi + 1, []).append({
-                        'x0': 0.0,
-                        'x1': float(pw),
-                        'y0': float(max(0.0, top - pad_y0)),
-                        'y1': float(bottom + pad_y1),
-                        'kind': 'table'
-                    })
+                        drawings = []
+                # only trust auto table regions on pages that actually contain a table caption
+                # (or within the two pages following one)
+                has_caption = bool(tbl_caps)
+                if has_caption or ((last_caption_page is not None) and ((page_index + 1) - last_caption_page <= 2)):
+                    table_window = True
+                elif start > 0 and page_index - start < 2:
+                    table_window = None
+                else:
+                    table_window = False
+                if has_caption:
+                    last_caption_page = page_index + 1
+                page_models.append({
+                    'index': page_index,
+                    'number': page_index + 1,
+                    'width': float(page.width),
+                    'height': float(page.height),
+                    'lines': lines,
+                    'text': text or "",
+                    'image_captions': img_caps,
+                    'table_captions': tbl_caps,
+                    'drawings': drawings,
+                    'table_window': table_window,
+                    'table_bboxes': _find_table_bboxes(page) if table_window else [],
+                    'needs_ocr': needs_ocr,
+                })
+                _release_page(page)
+    finally:
+        if fdoc is not None:
+            fdoc.close()
+    return page_models
+
+def _resolve_table_windows(pdf_path, page_models):
+    """Recalcule les fenêtres de légende sur le livre entier (frontières de plages, pages OCR).
+
+    Les boîtes de tableaux ne sont calculées que pour les pages entrées dans une
+    fenêtre ; celles déjà calculées pendant la lecture sont conservées.
+    """
+    pending = []
+    last_caption_page = None
+    for pm in page_models:
+        known = pm['table_window'] is True
+        has_caption = bool(pm['table_captions'])
+        pm['table_window'] = has_caption or ((last_caption_page is not None) and (pm['number'] - last_caption_page <= 2))
+        if pm['table_window'] and not known:
+            pending.append(pm)
+        elif not pm['table_window']:
+            pm['table_bboxes'] = []
+        if has_caption:
+            last_caption_page = pm['number']
+    if not pending:
+        return
+    with pdfplumber.open(pdf_path) as pdf:
+        for pm in pending:
+            page = pdf.pages[pm['index']]
+            pm['table_bboxes'] = _find_table_bboxes(page)
+            _release_page(page)
+
+# Pages OCR par tâche, et tâches en vol par worker (borne la mémoire et la file d'attente)
+_OCR_BATCH_PAGES = 4
+_OCR_INFLIGHT_PER_WORKER = 2
+
+def _ocr_pages(pdf_path, page_indexes):
+    """Worker OCR : rend et reconnaît un lot de pages, retourne [(index, texte)].
+
+    Le rendu 300 dpi est fait dans le worker, une page à la fois : les images
+    ne transitent jamais entre processus.
+    """
+    results = []
+    with pdfplumber.open(pdf_path) as pdf:
+        for page_index in page_indexes:
+            page = pdf.pages[page_index]
+            results.append((page_index, ocr_page(page)))
+            _release_page(page)
+    return results
+
+def _run_ocr_stage(pdf_path, page_models, ocr_workers):
+    """OCR des pages marquées 'needs_ocr' dans un pool borné de processus tesseract.
+
+    Les lots sont soumis au fil de l'eau (au plus _OCR_INFLIGHT_PER_WORKER par
+    worker) et chaque résultat est appliqué au modèle de page dès qu'il arrive.
+    """
+    todo = [pm['index'] for pm in page_models if pm.get('needs_ocr')]
+    if not todo:
+        return
+    by_index = {pm['index']: pm for pm in page_models}
+    batches = [todo[i:i + _OCR_BATCH_PAGES] for i in range(0, len(todo), _OCR_BATCH_PAGES)]
+    workers = min(_resolve_workers(ocr_workers), len(batches))
+    max_inflight = workers * _OCR_INFLIGHT_PER_WORKER
+    print(f"🔎 OCR de {len(todo)} page(s) sans texte ({workers} worker(s))")
+    done_pages = 0
+    with _process_pool(workers) as ex:
+        pending = set()
+        queue = iter(batches)
+        while True:
+            for batch in queue:
+                pending.add(ex.submit(_ocr_pages, pdf_path, batch))
+                if len(pending) >= max_inflight:
+                    break
+            if not pending:
+                break
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                try:
+                    results = fut.result()
+                except Exception as e:
+                    print(f"⚠️ Lot OCR en échec: {e}")
+                    continue
+                for page_index, text in results:
+                    pm = by_index[page_index]
+                    pm['text'] = text or ""
+                    pm['image_captions'], pm['table_captions'] = _captions_from_text(text) if text else ([], [])
+                    pm['needs_ocr'] = False
+                    done_pages += 1
+            print(f"   OCR {done_pages}/{len(todo)}")
+
+def collect_repeating_headers_footers(pdf_path: str, page_models=None):
+    from collections import defaultdict as _dd
+    repeats = _dd(int)
+    total_pages = 0
+    try:
+        if page_models is None:
+            page_models = build_page_models(pdf_path)
+        for pm in page_models:
+            total_pages += 1
+            h = pm['height']
+            for ln in pm['lines']:
+                y0 = float(ln.get('y0', 0.0))
+                y1 = float(ln.get('y1', 0.0))
+                mid = (y0 + y1) / 2.0
+                top_zone = h * 0.14
+                bot_zone = h * 0.86
+                if mid <= top_zone or mid >= bot_zone:
+                    t = ln.get('text', '').strip()
+                    if t and not is_page_number_line(t):
+                        repeats[t] += 1
+    except Exception:
+        return set()
+    thr = max(3, int(0.4 * max(1, total_pages)))
+    return {t for t, c in repeats.items() if c >= thr}
+
+def collect_capture_regions(pdf_path: str, page_models=None):
+    regions_by_page = {}
+    try:
+        if page_models is None:
+            page_models = build_page_models(pdf_path)
+        active = None  # (start_page_idx, start_y, kind)
+        for pi, pm in enumerate(page_models):
+            for ln in pm['lines']:
+                # Chapitres/sections (lignes commençant par '#') ont la priorité :
+                # classify_line ne les range jamais parmi les tags de région.
+                tok = classify_line(ln['text'])
+
+                # --- Fin de région sur balises fermantes </table> ou </img> ---
+                if tok.kind == markers.TAG_CLOSE:
+                    if active is not None:
+                        sp, sy, kind = active
+                        if sp == pi:
+                            regions_by_page.setdefault(pi + 1, []).append({
+                                'y0': sy,
+                                'y1': max(ln['y0'], sy),
+                                'kind': kind
+                            })
+                        else:
+                            # first partial page
+                            regions_by_page.setdefault(sp + 1, []).append({'y0': sy, 'y1': page_models[sp]['height'], 'kind': kind})
+                            # middle full pages
+                            for mid in range(sp + 1, pi):
+                                regions_by_page.setdefault(mid + 1, []).append({'y0': 0.0, 'y1': page_models[mid]['height'], 'kind': kind})
+                            # last partial
+                            regions_by_page.setdefault(pi + 1, []).append({'y0': 0.0, 'y1': max(ln['y0'], 0.0), 'kind': kind})
+                        active = None
+                    continue
+
+                # --- Début de région sur <table> ou <img> ---
+                if tok.kind == markers.TAG_OPEN:
+                    # début de région pour un tableau ou une image
+                    active = (pi, float(ln['y1']), 'table' if tok.title == 'table' else 'image')
+                    continue
+            # page end: continue until an end marker appears on later page
+        # document end: if still active, close to end of last page
+        if active is not None:
+            sp, sy, kind = active
+            regions_by_page.setdefault(sp + 1, []).append({'y0': sy, 'y1': page_models[sp]['height'], 'kind': kind})
+    except Exception:
+        pass
+    return regions_by_page
+
+def collect_auto_table_regions(pdf_path: str, page_models=None):
+    regions_by_page = {}
+    try:
+        if page_models is None:
+            page_models = build_page_models(pdf_path)
+        for pi, pm in enumerate(page_models):
+            if not pm['table_window']:
+                continue
+            pw = pm['width'] or 1.0
+            ph = pm['height'] or 1.0
+            pad_x = 0.02 * pw
+            pad_y0 = 0.005 * ph
+            pad_y1 = 0.01 * ph
+            # Seules les boîtes de tableaux pdfplumber sont retenues : les cadres dessinés
+            # (encadrés, colonnes de texte) ne sont pas des tableaux et masqueraient du contenu.
+            regions_local = list(pm['table_bboxes'])
+            for (x0, top, x1, bottom) in regions_local:
+                regions_by_page.setdefault(pi + 1, []).append({
+                    'x0': 0.0,
+                    'x1': float(pw),
+                    'y0': float(max(0.0, top - pad_y0)),
+                    'y1': float(bottom + pad_y1),
+                    'kind': 'table'
+                })
     except Exception:
         pass
     return regions_by_page
 
+class _TableIntervals:
+    """Zones 'table' d'une page, indexées sur y pour tester l'appartenance d'une ligne.
+
+    Les bornes y0/y1 de toutes les zones forment un tableau trié ; pour chaque
+    borne et chaque intervalle entre deux bornes, on garde les intervalles x des
+    zones qui le couvrent (bornes incluses, comme y0 <= ymid <= y1).
+    """
+
+    def __init__(self, regions, page_width):
+        spans = []
+        for r in regions:
+            if r.get('kind') != 'table':
+                continue
+            y0, y1 = float(r['y0']), float(r['y1'])
+            if y0 <= y1:
+                spans.append((y0, y1, float(r.get('x0', 0.0)), float(r.get('x1', page_width))))
+        self._points = sorted({y for sp in spans for y in sp[:2]})
+        self._at = [[] for _ in self._points]
+        self._before = [[] for _ in self._points]
+        for y0, y1, x0, x1 in spans:
+            lo = bisect_left(self._points, y0)
+            hi = bisect_left(self._points, y1)
+            for k in range(lo, hi + 1):
+                self._at[k].append((x0, x1))
+                if k > lo:
+                    self._before[k].append((x0, x1))
+
+    def contains(self, ymid, lx0, lx1):
+        k = bisect_left(self._points, ymid)
+        if k < len(self._points) and self._points[k] == ymid:
+            cover = self._at[k]
+        elif 0 < k < len(self._points):
+            cover = self._before[k]
+        else:
+            return False
+        return any(not (lx1 <= x0 or lx0 >= x1) for x0, x1 in cover)
+
+class PageRegionIndex:
+    """Régions balisées (<table>/<img>) et tableaux auto-détectés, par numéro de page.
+
+    Construit une fois par livre à partir du modèle de pages ; partagé par
+    parse_marked_pdf (lignes à écarter car dans un tableau) et extract_assets
+    (régions balisées à capturer).
+    """
+
+    def __init__(self, page_models, capture_regions, auto_table_regions):
+        self._capture = capture_regions or {}
+        self._tables = {}
+        for pm in page_models:
+            page_num = pm['number']
+            regions = (self._capture.get(page_num, []) or []) + ((auto_table_regions or {}).get(page_num, []) or [])
+            if not regions:
+                continue
+            try:
+                self._tables[page_num] = _TableIntervals(regions, pm['width'])
+            except Exception:
+                pass
+
+    def capture_regions(self, page_num):
+        return self._capture.get(page_num, [])
+
+    def line_in_table(self, page_num, ymid, lx0, lx1):
+        idx = self._tables.get(page_num)
+        return idx is not None and idx.contains(ymid, lx0, lx1)
+
+def build_region_index(pdf_path: str, page_models):
+    capture_regions = {}
+    try:
+        capture_regions = collect_capture_regions(pdf_path, page_models)
+    except Exception:
+        capture_regions = {}
+    auto_table_regions = {}
+    try:
+        auto_table_regions = collect_auto_table_regions(pdf_path, page_models)
+    except Exception:
+        auto_table_regions = {}
+    return PageRegionIndex(page_models, capture_regions, auto_table_regions)
+
 def find_node_for_page(structured_data, page_num):
     node = {"thematique": None, "chapter": None, "section": None, "subsection": None}
     for th in structured_data.get("thematiques", []):
@@ -650,15 +958,736 @@ def find_node_for_page(structured_data, page_num):
             return node
     return node
 
-def extract_assets(pdf_path, output_dir, structured_data):
+def _node_pages(node):
+    return node.get("start_page", 0), node.get("end_page", 0)
+
+class _PageIntervals:
+    """Tableau trié des segments de pages d'une liste de nœuds frères.
+
+    Chaque segment garde le premier nœud (dans l'ordre de la liste) qui couvre
+    ses pages, comme le parcours linéaire de find_node_for_page.
+    """
+
+    def __init__(self, nodes):
+        spans = []
+        for node in nodes or []:
+            s, e = _node_pages(node)
+            if s and e:
+                spans.append((s, e, node))
+        self._points = sorted({s for s, _, _ in spans} | {e + 1 for _, e, _ in spans})
+        self._owners = [None] * len(self._points)
+        # en sens inverse : le premier nœud de la liste écrit en dernier et l'emporte
+        for s, e, node in reversed(spans):
+            for k in range(bisect_left(self._points, s), bisect_left(self._points, e + 1)):
+                self._owners[k] = node
+
+    def find(self, page_num):
+        k = bisect_right(self._points, page_num) - 1
+        return self._owners[k] if k >= 0 else None
+
+class PageNodeIndex:
+    """Index page -> thématique/chapitre/section/sous-section, construit une fois par livre.
+
+    Donne le même résultat que find_node_for_page en O(log n) par niveau ;
+    les index des enfants sont construits à la première consultation.
+    """
+
+    def __init__(self, structured_data):
+        structured_data = structured_data or {}
+        self._thematiques = _PageIntervals(structured_data.get("thematiques", []))
+        self._orphan_chapters = _PageIntervals(structured_data.get("chapters_sans_thematique", []))
+        self._children = {}
+
+    def _child(self, node, key):
+        idx = self._children.get((id(node), key))
+        if idx is None:
+            idx = self._children[(id(node), key)] = _PageIntervals(node.get(key, []))
+        return idx
+
+    def find(self, page_num):
+        node = {"thematique": None, "chapter": None, "section": None, "subsection": None}
+        th = self._thematiques.find(page_num)
+        if th is not None:
+            node["thematique"] = th
+            ch = self._child(th, "chapters").find(page_num)
+        else:
+            ch = self._orphan_chapters.find(page_num)
+        if ch is None:
+            return node
+        node["chapter"] = ch
+        sec = self._child(ch, "sections").find(page_num)
+        if sec is None:
+            return node
+        node["section"] = sec
+        node["subsection"] = self._child(sec, "subsections").find(page_num)
+        return node
+
+def _rect_intersect(a, b):
+    return not (a[2] <= b[0] or a[0] >= b[2] or a[3] <= b[1] or a[1] >= b[3])
+
+def _to_hex_color(col):
+    try:
+        if col is None:
+            return None
+        if isinstance(col, (list, tuple)):
+            # normalize floats 0-1 to 0-255
+            vals = []
+            for v in col[:3]:
+                if isinstance(v, float) and 0.0 <= v <= 1.0:
+                    vals.append(int(round(v * 255)))
+                else:
+                    vals.append(int(v))
+            r, g, b = [max(0, min(255, x)) for x in vals]
+            return f"#{r:02X}{g:02X}{b:02X}"
+        # single int (e.g., grayscale)
+        v = int(col)
+        v = max(0, min(255, v))
+        return f"#{v:02X}{v:02X}{v:02X}"
+    except Exception:
+        return None
+
+def _dominant_color_pil(img):
+    try:
+        # Downscale for speed
+        small = img.resize((max(1, img.width // 4), max(1, img.height // 4)))
+        # Get colors frequency
+        colors = small.getcolors(maxcolors=small.width * small.height) or []
+        # Filter near-white
+        filtered = []
+        for cnt, rgb in colors:
+            if isinstance(rgb, tuple) and len(rgb) >= 3:
+                if not (rgb[0] >= 245 and rgb[1] >= 245 and rgb[2] >= 245):
+                    filtered.append((cnt, rgb))
+            else:
+                filtered.append((cnt, rgb))
+        if not filtered and colors:
+            filtered = colors
+        if not filtered:
+            return None
+        best = max(filtered, key=lambda x: x[0])[1]
+        if isinstance(best, tuple):
+            return _to_hex_color(best[:3])
+        return _to_hex_color(best)
+    except Exception:
+        return None
+
+def _is_structural_marker_text(s: str) -> bool:
+    try:
+        return bool(s) and is_structural_marker(s)
+    except Exception:
+        return False
+
+def _cell_text_and_color(fpage, cell_rect):
+    text = []
+    colors = []
+    try:
+        td = fpage.get_text("dict")
+        cx0, cy0, cx1, cy1 = cell_rect
+        for blk in td.get("blocks", []):
+            if blk.get("type") != 0:
+                continue
+            bx0, by0, bx1, by1 = blk.get("bbox", [0, 0, 0, 0])
+            if not _rect_intersect((bx0, by0, bx1, by1), (cx0, cy0, cx1, cy1)):
+                continue
+            for line in blk.get("lines", []):
+                for span in line.get("spans", []):
+                    sx0, sy0, sx1, sy1 = span.get("bbox", [0, 0, 0, 0])
+                    if _rect_intersect((sx0, sy0, sx1, sy1), (cx0, cy0, cx1, cy1)):
+                        val = span.get("text", "")
+                        if val:
+                            text.append(val)
+                        col = span.get("color", None)
+                        if col is not None:
+                            colors.append(col)
+    except Exception:
+        pass
+    txt = normalize_ws(" ".join(text)).strip()
+    # Strip embedded structural markers that might have leaked into cell text
+    try:
+        # remove explicit end marker anywhere
+        txt = txt.replace("!!/", " ")
+        # remove isolated !!! tokens
+        txt = re.sub(r"\b!!!\b", " ", txt)
+        # remove leading '!!' marker tokens
+        txt = re.sub(r"^\s*!!\s*", " ", txt)
+        # remove typed region tags <table>, </table>, <img>, </img>
+        txt = re.sub(r"<\s*/?\s*(table|img)\s*>", " ", txt, flags=re.IGNORECASE)
+        txt = normalize_ws(txt).strip()
+    except Exception:
+        pass
+    if _is_structural_marker_text(txt):
+        txt = ""
+    # pick the most frequent color
+    col_hex = None
+    if colors:
+        try:
+            # normalize and count
+            norm = [_to_hex_color(c) for c in colors]
+            norm = [c for c in norm if c]
+            if norm:
+                from collections import Counter
+                col_hex = Counter(norm).most_common(1)[0][0]
+        except Exception:
+            pass
+    return txt, col_hex
+
+def _cell_icons_and_bg(fpage, drawings, cell_rect, images_dir_local, page_num_local, idx_local, col_local, row_local):
+    cx0, cy0, cx1, cy1 = cell_rect
+    icons = []
+    bg_color = None
+    # background via drawings (rect fills)
+    try:
+        for d in drawings or []:
+            # PyMuPDF drawings API varies; try common keys
+            rect = d.get("rect")
+            fill = d.get("fill") or d.get("fill_color") or d.get("color")
+            if rect and fill:
+                rx0, ry0, rx1, ry1 = float(rect.x0), float(rect.y0), float(rect.x1), float(rect.y1)
+                if _rect_intersect((rx0, ry0, rx1, ry1), (cx0, cy0, cx1, cy1)):
+                    bg_color = _to_hex_color(fill)
+                    break
+    except Exception:
+        pass
+    # fallback: sample pixmap for dominant color
+    if bg_color is None:
+        try:
+            mat = fitz.Matrix(1.5, 1.5)
+            clip = fitz.Rect(cx0, cy0, cx1, cy1)
+            pm = fpage.get_pixmap(matrix=mat, alpha=False, clip=clip)
+            pil_img = Image.frombytes("RGB", [pm.width, pm.height], pm.samples)
+            bg_color = _dominant_color_pil(pil_img)
+        except Exception:
+            pass
+    # image icons inside cell
+    try:
+        for img in fpage.get_images(full=True) or []:
+            xref = img[0]
+            for rect in fpage.get_image_rects(xref) or []:
+                rx0, ry0, rx1, ry1 = rect.x0, rect.y0, rect.x1, rect.y1
+                if _rect_intersect((rx0, ry0, rx1, ry1), (cx0, cy0, cx1, cy1)):
+                    icons.append({"type": "image", "bbox": [rx0, ry0, rx1, ry1]})
+    except Exception:
+        pass
+    # vector icons (small filled paths)
+    try:
+        for d in drawings or []:
+            if d.get("rect"):
+                continue  # already treated as background
+            fill = d.get("fill") or d.get("fill_color")
+            parts = d.get("items") or []
+            # approximate bbox from parts
+            xs, ys = [], []
+            for it in parts:
+                # it is a tuple: (op, points, ...)
+                pts = it[1] if len(it) > 1 else []
+                for p in pts:
+                    xs.append(p[0])
+                    ys.append(p[1])
+            if xs and ys and fill:
+                bb = (min(xs), min(ys), max(xs), max(ys))
+                if _rect_intersect(bb, (cx0, cy0, cx1, cy1)):
+                    icons.append({"type": "vector", "bbox": list(bb), "color": _to_hex_color(fill)})
+    except Exception:
+        pass
+    return icons, bg_color
+
+def _get_field(o, name, default=None):
+    try:
+        if isinstance(o, dict):
+            return o.get(name, default)
+        if hasattr(o, name):
+            return getattr(o, name)
+    except Exception:
+        return default
+    return default
+
+def _cell_bbox(cell):
+    x0 = _get_field(cell, 'x0')
+    x1 = _get_field(cell, 'x1')
+    top = _get_field(cell, 'top')
+    bottom = _get_field(cell, 'bottom')
+    if x0 is None or x1 is None or top is None or bottom is None:
+        if isinstance(cell, (list, tuple)) and len(cell) >= 4:
+            try:
+                x0, top, x1, bottom = cell[0], cell[1], cell[2], cell[3]
+            except Exception:
+                return None
+        else:
+            return None
+    try:
+        return [float(x0), float(top), float(x1), float(bottom)]
+    except Exception:
+        return None
+
+def _dedup(vals, tol=1.0):
+    out = []
+    for v in sorted(vals):
+        if not out or abs(v - out[-1]) > tol:
+            out.append(v)
+    return out
+
+def _find_bucket(val, edges, tol=1.0):
+    try:
+        for i in range(len(edges) - 1):
+            if edges[i] - tol <= val <= edges[i + 1] + tol:
+                return i
+    except Exception:
+        pass
+    if len(edges) >= 2:
+        try:
+            return max(0, min(len(edges) - 2, min(range(len(edges) - 1), key=lambda i: abs(val - edges[i]))))
+        except Exception:
+            return 0
+    return 0
+
+def _extract_page_tables(ppage, fpage, page_num, drawings, page_has_caption, images_dir, tables_dir):
+    """Extrait les tableaux d'une page (pdfplumber + PyMuPDF) et écrit leurs exports.
+
+    Retourne la liste des tableaux de la page, dans l'ordre ; le titre (numérotation
+    globale / légende) et le rattachement à la structure sont faits par l'appelant.
+    """
+    page_tables = []
+    def _edge_counts_in_bbox(tbbox, tol=1.0):
+        try:
+            x0, y0, x1, y1 = float(tbbox[0]), float(tbbox[1]), float(tbbox[2]), float(tbbox[3])
+        except Exception:
+            return 0, 0, 0, 0
+        v_cnt = 0
+        h_cnt = 0
+        long_v = 0
+        long_h = 0
+        try:
+            edges = getattr(ppage, 'edges', []) or []
+            w = max(1.0, x1 - x0)
+            h = max(1.0, y1 - y0)
+            for e in edges:
+                ex0 = float(e.get('x0', 0.0)); ey0 = float(e.get('y0', 0.0))
+                ex1 = float(e.get('x1', ex0)); ey1 = float(e.get('y1', ey0))
+                bb = (min(ex0, ex1), min(ey0, ey1), max(ex0, ex1), max(ey0, ey1))
+                if not _rect_intersect(bb, (x0, y0, x1, y1)):
+                    continue
+                dx = abs(ex0 - ex1)
+                dy = abs(ey0 - ey1)
+                if dx <= tol:
+                    v_cnt += 1
+                    if dy >= 0.5 * h:  # long vertical line spans at least 50% of table height
+                        long_v += 1
+                if dy <= tol:
+                    h_cnt += 1
+                    if (max(ex0, ex1) - min(ex0, ex1)) >= 0.5 * w:  # long horizontal spans 50% width
+                        long_h += 1
+        except Exception:
+            return 0, 0, 0, 0
+        return v_cnt, h_cnt, long_v, long_h
+    def _is_plausible_table(t_obj):
+        tbbox = getattr(t_obj, 'bbox', None)
+        # shape of table from extract()
+        nrows = 0
+        ncols = 0
+        extracted = []
+        try:
+            extracted = t_obj.extract() if hasattr(t_obj, 'extract') else []
+        except Exception:
+            extracted = []
+        if extracted:
+            try:
+                nrows = len(extracted)
+                ncols = max((len(r) if r else 0) for r in extracted) if nrows > 0 else 0
+            except Exception:
+                nrows, ncols = 0, 0
+        if nrows < 2 or ncols < 2:
+            return False
+        has_caption = page_has_caption
+        has_graphics = False
+        if tbbox:
+            try:
+                x0, top, x1, bottom = tbbox
+                v_cnt, h_cnt, long_v, long_h = _edge_counts_in_bbox((x0, top, x1, bottom))
+                has_graphics = (long_v >= 1 and long_h >= 1) or (v_cnt >= 4 and h_cnt >= 4)
+            except Exception:
+                has_graphics = False
+        # duplication heuristic: many identical cells across columns -> likely multicolumn text
+        try:
+            if extracted:
+                dup_rows = 0
+                total_rows = 0
+                from collections import Counter
+                for row in extracted:
+                    vals = [normalize_ws(str(c or "")).strip() for c in (row or []) if str(c or "").strip()]
+                    if not vals:
+                        continue
+                    total_rows += 1
+                    most = Counter(vals).most_common(1)[0][1]
+                    if most / max(1, len(vals)) >= 0.6:
+                        dup_rows += 1
+                if total_rows and (dup_rows / total_rows) >= 0.4:
+                    return False
+        except Exception:
+            pass
+        # require either real graphics (grid) or a true caption to accept as a table
+        if not has_graphics and not has_caption:
+            return False
+        # reject narrow-width candidates without caption (likely sidebars or color bars)
+        if tbbox and not has_caption:
+            try:
+                x0, top, x1, bottom = tbbox
+                w_ratio = (x1 - x0) / max(1.0, float(fpage.rect.width))
+                if w_ratio < 0.3:
+                    return False
+            except Exception:
+                pass
+        # for 1-2 column candidates without caption, require stronger grid complexity
+        if not has_caption and ncols <= 2:
+            try:
+                # need at least 2 long vertical AND 2 long horizontal or >=3 short edges each
+                if not ((long_v >= 2 and long_h >= 2) or (v_cnt >= 3 and h_cnt >= 3)):
+                    return False
+            except Exception:
+                return False
+        # reject if structural markers (!! or !!/) appear frequently inside extracted cells
+        try:
+            if extracted:
+                marker_rows = 0
+                tot = 0
+                for row in extracted:
+                    txt_line = " ".join([str(c or "") for c in (row or [])])
+                    if re.search(r"!!/?", txt_line):
+                        marker_rows += 1
+                    tot += 1
+                if (tot and (marker_rows / tot) >= 0.2) or (marker_rows >= 1 and not has_caption):
+                    return False
+        except Exception:
+            pass
+        # high empty-cell ratio and many columns without graphics/caption -> likely not a table
+        try:
+            if extracted and ncols >= 6 and not has_graphics and not has_caption:
+                total = sum(len(r or []) for r in extracted)
+                empties = sum(1 for r in extracted for c in (r or []) if (not str(c or "").strip()))
+                if total and (empties / total) >= 0.5:
+                    return False
+        except Exception:
+            pass
+        # overly wide, many columns, no graphics/caption -> likely not a table
+        if tbbox:
+            try:
+                x0, top, x1, bottom = tbbox
+                w_ratio = (x1 - x0) / max(1.0, float(fpage.rect.width))
+                h_ratio = (bottom - top) / max(1.0, float(fpage.rect.height))
+                if w_ratio > 0.85 and ncols >= 6 and not extracted:
+                    return False
+            except Exception:
+                pass
+        # otherwise, accept if we extracted some non-empty cells
+        try:
+            if extracted:
+                non_empty = any((str(c or "").strip() for r in extracted for c in (r or [])))
+                return bool(non_empty)
+        except Exception:
+            return False
+        return False
+    # Prefer find_tables for structure (cells), fallback to extract_tables for content
+    tables = []
+    try:
+        if hasattr(ppage, 'find_tables'):
+            # two strategies to improve recall
+            ts_line = {
+                "vertical_strategy": "lines",
+                "horizontal_strategy": "lines",
+                "intersection_tolerance": 5,
+                "snap_tolerance": 3,
+                "edge_min_length": 3,
+                "min_words_vertical": 1,
+                "min_words_horizontal": 1,
+                "join_tolerance": 3,
+                "text_x_tolerance": 2,
+                "text_y_tolerance": 2,
+            }
+            tables = ppage.find_tables(table_settings=ts_line) or []
+            if not tables:
+                ts_text = {
+                    "vertical_strategy": "text",
+                    "horizontal_strategy": "text",
+                    "snap_tolerance": 3,
+                    "join_tolerance": 3,
+                    "text_x_tolerance": 3,
+                    "text_y_tolerance": 3,
+                }
+                tables = ppage.find_tables(table_settings=ts_text) or []
+    except Exception:
+        tables = []
+    # filter out probable false positives (e.g., multicolumn body text)
+    try:
+        tables = [t for t in (tables or []) if _is_plausible_table(t)]
+    except Exception:
+        pass
+    if not tables:
+        # fallback: only textual extraction, no cells/bboxes
+        simple = []
+        # only allow textual fallback if a caption exists on the page
+        if page_has_caption:
+            # also require graphics (grid) somewhere on the page to reduce false positives
+            try:
+                full_bb = (0.0, 0.0, float(fpage.rect.width), float(fpage.rect.height))
+                vcnt, hcnt, lv, lh = _edge_counts_in_bbox(full_bb)
+            except Exception:
+                vcnt, hcnt, lv, lh = 0, 0, 0, 0
+            if (lv >= 1 and lh >= 1) or (vcnt >= 4 and hcnt >= 4):
+                simple = ppage.extract_tables() or []
+        for table_index, table in enumerate(simple):
+            # sanitize cells for structural markers in textual fallback
+            cleaned_rows = []
+            for row in table:
+                out_cells = []
+                for cell in row:
+                    s = normalize_ws(str(cell or "")).strip()
+                    try:
+                        s = s.replace("!!/", " ")
+                        s = re.sub(r"\b!!!\b", " ", s)
+                        s = re.sub(r"^\s*!!\s*", " ", s)
+                        # remove typed region tags <table>, </table>, <img>, </img>
+                        s = re.sub(r"<\s*/?\s*(table|img)\s*>", " ", s, flags=re.IGNORECASE)
+                        s = normalize_ws(s).strip()
+                    except Exception:
+                        pass
+                    if _is_structural_marker_text(s):
+                        s = ""
+                    out_cells.append(s)
+                cleaned_rows.append(" | ".join(out_cells))
+            rows_text = cleaned_rows
+            filename = f"table_p{page_num+1}_{table_index+1}.txt"
+            filepath = os.path.join(tables_dir, filename)
+            try:
+                with open(filepath, 'w', encoding='utf-8') as f:
+                    f.write("\n".join(rows_text))
+            except Exception:
+                pass
+            table_data = {
+                "id": f"table_{page_num+1}_{table_index}",
+                "page": page_num + 1,
+                "index": table_index,
+                "filename": filename,
+                "filepath": filepath,
+                "url": f"/assets/tables/{filename}",
+                "rows": len(table),
+                "columns": len(table[0]) if table else 0,
+                "title": None,
+                "content": rows_text,
+            }
+            page_tables.append(table_data)
+        return page_tables
+    # Enriched extraction using table cells
+    for table_index, t in enumerate(tables):
+        try:
+            tbbox = getattr(t, 'bbox', None)
+            cells = getattr(t, 'cells', None)
+        except Exception:
+            tbbox = None
+            cells = None
+        data_rows = []
+        rows_text = []
+        cell_matrix = []
+        nrows = 0
+        ncols = 0
+        # Build a grid from cell bboxes if available
+        if cells:
+            xs_all = []
+            ys_all = []
+            for c in cells:
+                bb = _cell_bbox(c)
+                if not bb:
+                    continue
+                cx0, cy0, cx1, cy1 = bb
+                xs_all.extend([cx0, cx1])
+                ys_all.extend([cy0, cy1])
+            xs = _dedup(xs_all)
+            ys = _dedup(ys_all)
+            ncols = max(0, len(xs) - 1)
+            nrows = max(0, len(ys) - 1)
+            # init matrix
+            cell_matrix = [[None for _ in range(ncols)] for _ in range(nrows)]
+            # map each cell to grid position
+            for c in cells:
+                bb = _cell_bbox(c)
+                if not bb:
+                    continue
+                x0, y0, x1, y1 = bb[0], bb[1], bb[2], bb[3]
+                try:
+                    col0 = _find_bucket(x0, xs)
+                    row0 = _find_bucket(y0, ys)
+                    if 0 <= row0 < nrows and 0 <= col0 < ncols:
+                        cell_matrix[row0][col0] = [x0, y0, x1, y1]
+                except Exception:
+                    continue
+        else:
+            # fallback: use extracted textual table for rows/cols
+            try:
+                extracted = t.extract() if hasattr(t, 'extract') else []
+            except Exception:
+                extracted = []
+            if extracted:
+                nrows = len(extracted)
+                ncols = len(extracted[0]) if extracted else 0
+                cell_matrix = [[None for _ in range(ncols)] for _ in range(nrows)]
+                # approximate bbox grid from tbbox
+                if tbbox and ncols and nrows:
+                    x0, top, x1, bottom = tbbox
+                    colw = (x1 - x0) / ncols
+                    rowh = (bottom - top) / nrows
+                    for r in range(nrows):
+                        for cidx in range(ncols):
+                            cx0 = x0 + cidx * colw
+                            cx1 = x0 + (cidx + 1) * colw
+                            cy0 = top + r * rowh
+                            cy1 = top + (r + 1) * rowh
+                            cell_matrix[r][cidx] = [cx0, cy0, cx1, cy1]
+        # Extract content/colors/icons per cell
+        for r in range(nrows):
+            row_texts = []
+            row_data = []
+            for cidx in range(ncols):
+                bbox = cell_matrix[r][cidx]
+                if not bbox:
+                    row_texts.append("")
+                    row_data.append("")
+                    continue
+                txt, txt_color = _cell_text_and_color(fpage, bbox)
+                icons, bg_color = _cell_icons_and_bg(fpage, drawings, bbox, images_dir, page_num + 1, table_index, cidx, r)
+                row_texts.append(txt)
+                row_data.append({
+                    "bbox": bbox,
+                    "text": txt,
+                    "text_color": txt_color,
+                    "background_color": bg_color,
+                    "icons": icons,
+                })
+            rows_text.append(" | ".join((t or "").strip() for t in row_texts))
+            data_rows.append(row_data)
+        # columns content aggregation
+        columns_content = []
+        for cidx in range(ncols):
+            col_texts = []
+            for r in range(nrows):
+                item = data_rows[r][cidx]
+                if isinstance(item, dict):
+                    if item.get("text"):
+                        col_texts.append(item.get("text"))
+                elif isinstance(item, str) and item:
+                    col_texts.append(item)
+            columns_content.append(" \n".join(col_texts))
+        # Capture PNG du tableau entier (bbox de table ou union des cellules)
+        snap_name = None
+        snap_path = None
+        try:
+            tbbox_final = None
+            if tbbox is not None:
+                try:
+                    tx0, ttop, tx1, tbottom = tbbox
+                    tbbox_final = (float(tx0), float(ttop), float(tx1), float(tbottom))
+                except Exception:
+                    tbbox_final = None
+            if tbbox_final is None and cell_matrix:
+                xs_all = []
+                ys_all = []
+                for r in range(nrows):
+                    for cidx in range(ncols):
+                        bb = cell_matrix[r][cidx]
+                        if not bb:
+                            continue
+                        xs_all.extend([bb[0], bb[2]])
+                        ys_all.extend([bb[1], bb[3]])
+                if xs_all and ys_all:
+                    tbbox_final = (min(xs_all), min(ys_all), max(xs_all), max(ys_all))
+            if tbbox_final is not None:
+                rx0, ry0, rx1, ry1 = tbbox_final
+                rect = fitz.Rect(rx0, ry0, rx1, ry1)
+                mat_snap = fitz.Matrix(2.0, 2.0)
+                pix_tbl = fpage.get_pixmap(matrix=mat_snap, alpha=False, clip=rect)
+                snap_name = f"table_snapshot_p{page_num+1}_{table_index+1}.png"
+                snap_path = os.path.join(tables_dir, snap_name)
+                pix_tbl.save(snap_path)
+        except Exception:
+            snap_name = None
+            snap_path = None
+        filename = f"table_p{page_num+1}_{table_index+1}.txt"
+        filepath = os.path.join(tables_dir, filename)
+        try:
+            with open(filepath, 'w', encoding='utf-8') as f:
+                f.write("\n".join(rows_text))
+        except Exception:
+            pass
+        table_data = {
+            "id": f"table_{page_num+1}_{table_index}",
+            "page": page_num + 1,
+            "index": table_index,
+            "filename": filename,
+            "filepath": filepath,
+            "url": f"/assets/tables/{filename}",
+            "rows": nrows,
+            "columns": ncols,
+            "title": None,
+            "content": rows_text,
+            "cells": data_rows,
+            "columns_content": columns_content,
+        }
+        if snap_name and snap_path:
+            table_data["snapshot_filename"] = snap_name
+            table_data["snapshot_filepath"] = snap_path
+            table_data["snapshot_url"] = f"/assets/tables/{snap_name}"
+        page_tables.append(table_data)
+    return page_tables
+
+def _page_tables_for_range(pdf_path, start, stop, caption_pages, images_dir, tables_dir, drawings_by_page=None):
+    """Tableaux des pages [start, stop), avec ses propres handles pdfplumber/PyMuPDF.
+
+    Exécutable dans un processus worker : sans drawings_by_page, les dessins sont relus sur place.
+    """
+    out = []
+    with pdfplumber.open(pdf_path) as pdf, fitz.open(pdf_path) as fdoc:
+        for page_num in range(start, min(stop, len(pdf.pages))):
+            ppage = pdf.pages[page_num]
+            fpage = fdoc.load_page(page_num)
+            if drawings_by_page is not None:
+                drawings = drawings_by_page.get(page_num, [])
+            else:
+                try:
+                    drawings = fpage.get_drawings()
+                except Exception:
+                    drawings = []
+            page_tables = _extract_page_tables(ppage, fpage, page_num, drawings, (page_num + 1) in caption_pages, images_dir, tables_dir)
+            out.append((page_num, page_tables))
+            _release_page(ppage)
+    return out
+
+def _iter_page_tables(pdf_path, page_table_caps, drawings_by_page, images_dir, tables_dir, workers=None):
+    """Itère (page_num, tableaux) dans l'ordre des pages, en parallèle si workers > 1."""
+    caption_pages = {p for p, caps in page_table_caps.items() if caps}
+    workers = _resolve_workers(workers)
+    total_pages = _count_pages(pdf_path)
+    ranges = _page_ranges(total_pages, workers)
+    if workers <= 1 or len(ranges) <= 1:
+        yield from _page_tables_for_range(pdf_path, 0, total_pages, caption_pages, images_dir, tables_dir, drawings_by_page)
+        return
+    with _process_pool(workers) as ex:
+        futures = [
+            ex.submit(_page_tables_for_range, pdf_path, start, stop, caption_pages, images_dir, tables_dir)
+            for start, stop in ranges
+        ]
+        for fut in futures:
+            yield from fut.result()
+
+def extract_assets(pdf_path, output_dir, structured_data, page_models=None, workers=None):
     images_dir = os.path.join(output_dir, 'images')
     tables_dir = os.path.join(output_dir, 'tables')
     os.makedirs(images_dir, exist_ok=True)
     os.makedirs(tables_dir, exist_ok=True)
     assets = {"images": [], "tables": [], "metadata": {"pdf_path": os.path.abspath(pdf_path), "images_dir": images_dir, "tables_dir": tables_dir}}
     image_hashes = set()
-    page_image_caps, page_table_caps = collect_page_captions(pdf_path)
-    capture_regions = collect_capture_regions(pdf_path)
+    if page_models is None:
+        page_models = build_page_models(pdf_path, workers=workers)
+    page_image_caps, page_table_caps = collect_page_captions(pdf_path, page_models)
+    region_index = build_region_index(pdf_path, page_models)
+    drawings_by_page = {pm['index']: pm['drawings'] for pm in page_models}
+    node_index = PageNodeIndex(structured_data)
     caption_ptr_img = {}
     caption_ptr_tbl = {}
     images_by_page = defaultdict(int)
@@ -682,7 +1711,7 @@ def extract_assets(pdf_path, output_dir, structured_data):
                 filename = f"img_p{page_num+1}_{img_index}_{img_hash[:8]}.png"
                 filepath = os.path.join(images_dir, filename)
                 pil.save(filepath, 'PNG')
-                node = find_node_for_page(structured_data, page_num + 1)
+                node = node_index.find(page_num + 1)
                 context = {
                     "thematique": {"title": node["thematique"].get("title")} if node["thematique"] else None,
                     "chapter": {"title": node["chapter"].get("title")} if node["chapter"] else None,
@@ -727,13 +1756,10 @@ def extract_assets(pdf_path, output_dir, structured_data):
             # If a page has at least one figure caption, try to produce snapshots (to capture vector-only figures or multi-panel figures)
             if caps_img:
                 page = doc.load_page(p)
-                regions = capture_regions.get(p + 1, [])
+                regions = region_index.capture_regions(p + 1)
                 if not regions:
                     # Guess regions from drawings when no manual regions are provided
-                    try:
-                        drs = page.get_drawings()
-                    except Exception:
-                        drs = []
+                    drs = drawings_by_page.get(p, [])
                     guess = []
                     try:
                         pxw = float(page.rect.width); pxh = float(page.rect.height)
@@ -848,7 +1874,7 @@ def extract_assets(pdf_path, output_dir, structured_data):
                     snap_name = f"snapshot_p{p+1}_{k}.png"
                     snap_path = os.path.join(images_dir, snap_name)
                     pix.save(snap_path)
-                    chnode = find_node_for_page(structured_data, p + 1)
+                    chnode = node_index.find(p + 1)
                     image_data = {
                         "id": f"imgsnap_{p+1}_{k}",
                         "page": p + 1,
@@ -879,758 +1905,113 @@ def extract_assets(pdf_path, output_dir, structured_data):
         if 'doc' in locals():
             doc.close()
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            # Helper functions for enriched extraction
-            def rect_intersect(a, b):
-                return not (a[2] <= b[0] or a[0] >= b[2] or a[3] <= b[1] or a[1] >= b[3])
-
-            def _to_hex_color(col):
-                try:
-                    if col is None:
-                        return None
-                    if isinstance(col, (list, tuple)):
-                        # normalize floats 0-1 to 0-255
-                        vals = []
-                        for v in col[:3]:
-                            if isinstance(v, float) and 0.0 <= v <= 1.0:
-                                vals.append(int(round(v * 255)))
-                            else:
-                                vals.append(int(v))
-                        r, g, b = [max(0, min(255, x)) for x in vals]
-                        return f"#{r:02X}{g:02X}{b:02X}"
-                    # single int (e.g., grayscale)
-                    v = int(col)
-                    v = max(0, min(255, v))
-                    return f"#{v:02X}{v:02X}{v:02X}"
-                except Exception:
-                    return None
-
-            def _dominant_color_pil(img):
-                try:
-                    # Downscale for speed
-                    small = img.resize((max(1, img.width // 4), max(1, img.height // 4)))
-                    # Get colors frequency
-                    colors = small.getcolors(maxcolors=small.width * small.height) or []
-                    # Filter near-white
-                    filtered = []
-                    for cnt, rgb in colors:
-                        if isinstance(rgb, tuple) and len(rgb) >= 3:
-                            if not (rgb[0] >= 245 and rgb[1] >= 245 and rgb[2] >= 245):
-                                filtered.append((cnt, rgb))
-                        else:
-                            filtered.append((cnt, rgb))
-                    if not filtered and colors:
-                        filtered = colors
-                    if not filtered:
-                        return None
-                    best = max(filtered, key=lambda x: x[0])[1]
-                    if isinstance(best, tuple):
-                        return _to_hex_color(best[:3])
-                    return _to_hex_color(best)
-                except Exception:
-                    return None
-
-            def _is_structural_marker_text(s: str) -> bool:
-                try:
-                    if not s:
-                        return False
-                    marker_bang = s.replace('！', '!').replace('﹗', '!').replace('︕', '!').strip()
-                    if re.match(r'^\s*[\-\u2022•▪·»]*\s*!!\s*/\s*$', marker_bang):
-                        return True
-                    if re.match(r'^\s*[\-\u2022•▪·»]*\s*!!(?!/).*$' , marker_bang):
-                        return True
-                    if re.match(r'^\s*!!!\s*/\s*$', marker_bang) or re.match(r'^\s*!!!(?!/).*$' , marker_bang):
-                        return True
-                    if re.match(r'^\s*!\s*[^!].*$', marker_bang):  # thematique line
-                        return True
-                    # typed region tags <table>, </table>, <img>, </img>
-                    if re.match(r'^\s*<\s*/?\s*table\s*>\s*$', marker_bang, flags=re.IGNORECASE):
-                        return True
-                    if re.match(r'^\s*<\s*/?\s*img\s*>\s*$', marker_bang, flags=re.IGNORECASE):
-                        return True
-                except Exception:
-                    return False
-                return False
-
-            def _cell_text_and_color(fpage, cell_rect):
-                text = []
-                colors = []
-                try:
-                    td = fpage.get_text("dict")
-                    cx0, cy0, cx1, cy1 = cell_rect
-                    for blk in td.get("blocks", []):
-                        if blk.get("type") != 0:
-                            continue
-                        bx0, by0, bx1, by1 = blk.get("bbox", [0, 0, 0, 0])
-                        if not rect_intersect((bx0, by0, bx1, by1), (cx0, cy0, cx1, cy1)):
-                            continue
-                        for line in blk.get("lines", []):
-                            for span in line.get("spans", []):
-                                sx0, sy0, sx1, sy1 = span.get("bbox", [0, 0, 0, 0])
-                                if rect_intersect((sx0, sy0, sx1, sy1), (cx0, cy0, cx1, cy1)):
-                                    val = span.get("text", "")
-                                    if val:
-                                        text.append(val)
-                                    col = span.get("color", None)
-                                    if col is not None:
-                                        colors.append(col)
-                except Exception:
-                    pass
-                txt = normalize_ws(" ".join(text)).strip()
-                # Strip embedded structural markers that might have leaked into cell text
-                try:
-                    # remove explicit end marker anywhere
-                    txt = txt.replace("!!/", " ")
-                    # remove isolated !!! tokens
-                    txt = re.sub(r"\b!!!\b", " ", txt)
-                    # remove leading '!!' marker tokens
-                    txt = re.sub(r"^\s*!!\s*", " ", txt)
-                    # remove typed region tags <table>, </table>, <img>, </img>
-                    txt = re.sub(r"<\s*/?\s*(table|img)\s*>", " ", txt, flags=re.IGNORECASE)
-                    txt = normalize_ws(txt).strip()
-                except Exception:
-                    pass
-                if _is_structural_marker_text(txt):
-                    txt = ""
-                # pick the most frequent color
-                col_hex = None
-                if colors:
-                    try:
-                        # normalize and count
-                        norm = [_to_hex_color(c) for c in colors]
-                        norm = [c for c in norm if c]
-                        if norm:
-                            from collections import Counter
-                            col_hex = Counter(norm).most_common(1)[0][0]
-                    except Exception:
-                        pass
-                return txt, col_hex
-
-            def _cell_icons_and_bg(fpage, drawings, cell_rect, images_dir_local, page_num_local, idx_local, col_local, row_local):
-                cx0, cy0, cx1, cy1 = cell_rect
-                icons = []
-                bg_color = None
-                # background via drawings (rect fills)
-                try:
-                    for d in drawings or []:
-                        # PyMuPDF drawings API varies; try common keys
-                        rect = d.get("rect")
-                        fill = d.get("fill") or d.get("fill_color") or d.get("color")
-                        if rect and fill:
-                            rx0, ry0, rx1, ry1 = float(rect.x0), float(rect.y0), float(rect.x1), float(rect.y1)
-                            if rect_intersect((rx0, ry0, rx1, ry1), (cx0, cy0, cx1, cy1)):
-                                bg_color = _to_hex_color(fill)
-                                break
-                except Exception:
-                    pass
-                # fallback: sample pixmap for dominant color
-                if bg_color is None:
-                    try:
-                        mat = fitz.Matrix(1.5, 1.5)
-                        clip = fitz.Rect(cx0, cy0, cx1, cy1)
-                        pm = fpage.get_pixmap(matrix=mat, alpha=False, clip=clip)
-                        pil_img = Image.frombytes("RGB", [pm.width, pm.height], pm.samples)
-                        bg_color = _dominant_color_pil(pil_img)
-                    except Exception:
-                        pass
-                # image icons inside cell
-                try:
-                    for img in fpage.get_images(full=True) or []:
-                        xref = img[0]
-                        for rect in fpage.get_image_rects(xref) or []:
-                            rx0, ry0, rx1, ry1 = rect.x0, rect.y0, rect.x1, rect.y1
-                            if rect_intersect((rx0, ry0, rx1, ry1), (cx0, cy0, cx1, cy1)):
-                                icons.append({"type": "image", "bbox": [rx0, ry0, rx1, ry1]})
-                except Exception:
-                    pass
-                # vector icons (small filled paths)
-                try:
-                    for d in drawings or []:
-                        if d.get("rect"):
-                            continue  # already treated as background
-                        fill = d.get("fill") or d.get("fill_color")
-                        parts = d.get("items") or []
-                        # approximate bbox from parts
-                        xs, ys = [], []
-                        for it in parts:
-                            # it is a tuple: (op, points, ...)
-                            pts = it[1] if len(it) > 1 else []
-                            for p in pts:
-                                xs.append(p[0])
-                                ys.append(p[1])
-                        if xs and ys and fill:
-                            bb = (min(xs), min(ys), max(xs), max(ys))
-                            if rect_intersect(bb, (cx0, cy0, cx1, cy1)):
-                                icons.append({"type": "vector", "bbox": list(bb), "color": _to_hex_color(fill)})
-                except Exception:
-                    pass
-                return icons, bg_color
-
-            def _get_field(o, name, default=None):
-                try:
-                    if isinstance(o, dict):
-                        return o.get(name, default)
-                    if hasattr(o, name):
-                        return getattr(o, name)
-                except Exception:
-                    return default
-                return default
-
-            def _cell_bbox(cell):
-                x0 = _get_field(cell, 'x0')
-                x1 = _get_field(cell, 'x1')
-                top = _get_field(cell, 'top')
-                bottom = _get_field(cell, 'bottom')
-                if x0 is None or x1 is None or top is None or bottom is None:
-                    if isinstance(cell, (list, tuple)) and len(cell) >= 4:
-                        try:
-                            x0, top, x1, bottom = cell[0], cell[1], cell[2], cell[3]
-                        except Exception:
-                            return None
-                    else:
-                        return None
-                try:
-                    return [float(x0), float(top), float(x1), float(bottom)]
-                except Exception:
-                    return None
-
-            def _dedup(vals, tol=1.0):
-                out = []
-                for v in sorted(vals):
-                    if not out or abs(v - out[-1]) > tol:
-                        out.append(v)
-                return out
-
-            def _find_bucket(val, edges, tol=1.0):
-                try:
-                    for i in range(len(edges) - 1):
-                        if edges[i] - tol <= val <= edges[i + 1] + tol:
-                            return i
-                except Exception:
-                    pass
-                if len(edges) >= 2:
-                    try:
-                        return max(0, min(len(edges) - 2, min(range(len(edges) - 1), key=lambda i: abs(val - edges[i]))))
-                    except Exception:
-                        return 0
-                return 0
-
-            tables_by_page = defaultdict(int)
-            # Open once to analyze text/drawings/colors
-            with fitz.open(pdf_path) as fdoc_tables:
-                for page_num, ppage in enumerate(pdf.pages):
-                    fpage = fdoc_tables.load_page(page_num)
-                    drawings = []
-                    try:
-                        drawings = fpage.get_drawings()
-                    except Exception:
-                        drawings = []
-                    def _edge_counts_in_bbox(tbbox, tol=1.0):
-                        try:
-                            x0, y0, x1, y1 = float(tbbox[0]), float(tbbox[1]), float(tbbox[2]), float(tbbox[3])
-                        except Exception:
-                            return 0, 0, 0, 0
-                        v_cnt = 0
-                        h_cnt = 0
-                        long_v = 0
-                        long_h = 0
-                        try:
-                            edges = getattr(ppage, 'edges', []) or []
-                            w = max(1.0, x1 - x0)
-                            h = max(1.0, y1 - y0)
-                            for e in edges:
-                                ex0 = float(e.get('x0', 0.0)); ey0 = float(e.get('y0', 0.0))
-                                ex1 = float(e.get('x1', ex0)); ey1 = float(e.get('y1', ey0))
-                                bb = (min(ex0, ex1), min(ey0, ey1), max(ex0, ex1), max(ey0, ey1))
-                                if not rect_intersect(bb, (x0, y0, x1, y1)):
-                                    continue
-                                dx = abs(ex0 - ex1)
-                                dy = abs(ey0 - ey1)
-                                if dx <= tol:
-                                    v_cnt += 1
-                                    if dy >= 0.5 * h:  # long vertical line spans at least 50% of table height
-                                        long_v += 1
-                                if dy <= tol:
-                                    h_cnt += 1
-                                    if (max(ex0, ex1) - min(ex0, ex1)) >= 0.5 * w:  # long horizontal spans 50% width
-                                        long_h += 1
-                        except Exception:
-                            return 0, 0, 0, 0
-                        return v_cnt, h_cnt, long_v, long_h
-                    def _is_plausible_table(t_obj):
-                        tbbox = getattr(t_obj, 'bbox', None)
-                        # shape of table from extract()
-                        nrows = 0
-                        ncols = 0
-                        extracted = []
-                        try:
-                            extracted = t_obj.extract() if hasattr(t_obj, 'extract') else []
-                        except Exception:
-                            extracted = []
-                        if extracted:
-                            try:
-                                nrows = len(extracted)
-                                ncols = max((len(r) if r else 0) for r in extracted) if nrows > 0 else 0
-                            except Exception:
-                                nrows, ncols = 0, 0
-                        if nrows < 2 or ncols < 2:
-                            return False
-                        has_caption = bool(page_table_caps.get(page_num + 1))
-                        has_graphics = False
-                        if tbbox:
+        tables_by_page = defaultdict(int)
+        for page_num, page_tables in _iter_page_tables(pdf_path, page_table_caps, drawings_by_page, images_dir, tables_dir, workers):
+            for table_data in page_tables:
+                table_data["title"] = f"Tableau {len(assets['tables']) + 1}"
+                caps_tbl = page_table_caps.get(page_num + 1)
+                if caps_tbl:
+                    ptrt = caption_ptr_tbl.get(page_num + 1, 0)
+                    if ptrt < len(caps_tbl):
+                        table_data["title"] = caps_tbl[ptrt]
+                        caption_ptr_tbl[page_num + 1] = ptrt + 1
+                assets["tables"].append(table_data)
+                tables_by_page[page_num + 1] += 1
+                node = node_index.find(page_num + 1)
+                if node["subsection"] is not None:
+                    node["subsection"].setdefault("tables", []).append(table_data)
+                elif node["section"] is not None:
+                    node["section"].setdefault("tables", []).append(table_data)
+                elif node["chapter"] is not None:
+                    node["chapter"].setdefault("tables", []).append(table_data)
+        # Fallback: for pages with table captions but no table extracted, create a region snapshot only when regions exist
+        try:
+            with fitz.open(pdf_path) as doc2:
+                zoom = 2.0
+                mat = fitz.Matrix(zoom, zoom)
+                for p in range(len(doc2)):
+                    caps_tbl = page_table_caps.get(p + 1, []) or []
+                    extracted_t = tables_by_page.get(p + 1, 0)
+                    if extracted_t < len(caps_tbl):
+                        page2 = doc2.load_page(p)
+                        regions = region_index.capture_regions(p + 1)
+                        if not regions:
+                            # try to guess regions from drawings if no manual regions
+                            drs = drawings_by_page.get(p, [])
+                            guess = []
                             try:
-                                x0, top, x1, bottom = tbbox
-                                v_cnt, h_cnt, long_v, long_h = _edge_counts_in_bbox((x0, top, x1, bottom))
-                                has_graphics = (long_v >= 1 and long_h >= 1) or (v_cnt >= 4 and h_cnt >= 4)
-                            except Exception:
-                                has_graphics = False
-                        # duplication heuristic: many identical cells across columns -> likely multicolumn text
-                        try:
-                            if extracted:
-                                dup_rows = 0
-                                total_rows = 0
-                                from collections import Counter
-                                for row in extracted:
-                                    vals = [normalize_ws(str(c or "")).strip() for c in (row or []) if str(c or "").strip()]
-                                    if not vals:
+                                pxw = float(page2.rect.width); pxh = float(page2.rect.height)
+                                area_min = 0.05 * (pxw * pxh)
+                                area_max = 0.80 * (pxw * pxh)
+                                for d in drs or []:
+                                    r = d.get('rect')
+                                    if r is not None:
+                                        bb = fitz.Rect(r.x0, r.y0, r.x1, r.y1)
+                                    else:
+                                        items = d.get('items') or []
+                                        xs, ys = [], []
+                                        for it in items:
+                                            pts = it[1] if len(it) > 1 else []
+                                            for pt in pts:
+                                                xs.append(pt[0]); ys.append(pt[1])
+                                        if xs and ys:
+                                            bb = fitz.Rect(min(xs), min(ys), max(xs), max(ys))
+                                        else:
+                                            continue
+                                    area = bb.width * bb.height
+                                    if area_min <= area <= area_max:
+                                        guess.append(bb)
+                                # sort by area desc and deduplicate close boxes
+                                guess.sort(key=lambda r: r.width * r.height, reverse=True)
+                                uniq = []
+                                for g in guess:
+                                    if not uniq:
+                                        uniq.append(g)
                                         continue
-                                    total_rows += 1
-                                    most = Counter(vals).most_common(1)[0][1]
-                                    if most / max(1, len(vals)) >= 0.6:
-                                        dup_rows += 1
-                                if total_rows and (dup_rows / total_rows) >= 0.4:
-                                    return False
-                        except Exception:
-                            pass
-                        # require either real graphics (grid) or a true caption to accept as a table
-                        if not has_graphics and not has_caption:
-                            return False
-                        # reject narrow-width candidates without caption (likely sidebars or color bars)
-                        if tbbox and not has_caption:
-                            try:
-                                x0, top, x1, bottom = tbbox
-                                w_ratio = (x1 - x0) / max(1.0, float(fpage.rect.width))
-                                if w_ratio < 0.3:
-                                    return False
-                            except Exception:
-                                pass
-                        # for 1-2 column candidates without caption, require stronger grid complexity
-                        if not has_caption and ncols <= 2:
-                            try:
-                                # need at least 2 long vertical AND 2 long horizontal or >=3 short edges each
-                                if not ((long_v >= 2 and long_h >= 2) or (v_cnt >= 3 and h_cnt >= 3)):
-                                    return False
+                                    iou = max(0, min(g.x1, uniq[-1].x1) - max(g.x0, uniq[-1].x0)) * max(0, min(g.y1, uniq[-1].y1) - max(g.y0, uniq[-1].y0))
+                                    uarea = g.width * g.height + uniq[-1].width * uniq[-1].height - iou
+                                    if uarea == 0 or (iou / uarea) < 0.5:
+                                        uniq.append(g)
+                                regions = [{'y0': float(r.y0), 'y1': float(r.y1), 'x0': float(r.x0), 'x1': float(r.x1)} for r in uniq[:len(caps_tbl)]]
                             except Exception:
-                                return False
-                        # reject if structural markers (!! or !!/) appear frequently inside extracted cells
-                        try:
-                            if extracted:
-                                marker_rows = 0
-                                tot = 0
-                                for row in extracted:
-                                    txt_line = " ".join([str(c or "") for c in (row or [])])
-                                    if re.search(r"!!/?", txt_line):
-                                        marker_rows += 1
-                                    tot += 1
-                                if (tot and (marker_rows / tot) >= 0.2) or (marker_rows >= 1 and not has_caption):
-                                    return False
-                        except Exception:
-                            pass
-                        # high empty-cell ratio and many columns without graphics/caption -> likely not a table
-                        try:
-                            if extracted and ncols >= 6 and not has_graphics and not has_caption:
-                                total = sum(len(r or []) for r in extracted)
-                                empties = sum(1 for r in extracted for c in (r or []) if (not str(c or "").strip()))
-                                if total and (empties / total) >= 0.5:
-                                    return False
-                        except Exception:
-                            pass
-                        # overly wide, many columns, no graphics/caption -> likely not a table
-                        if tbbox:
-                            try:
-                                x0, top, x1, bottom = tbbox
-                                w_ratio = (x1 - x0) / max(1.0, float(fpage.rect.width))
-                                h_ratio = (bottom - top) / max(1.0, float(fpage.rect.height))
-                                if w_ratio > 0.85 and ncols >= 6 and not extracted:
-                                    return False
-                            except Exception:
-                                pass
-                        # otherwise, accept if we extracted some non-empty cells
-                        try:
-                            if extracted:
-                                non_empty = any((str(c or "").strip() for r in extracted for c in (r or [])))
-                                return bool(non_empty)
-                        except Exception:
-                            return False
-                        return False
-                    # Prefer find_tables for structure (cells), fallback to extract_tables for content
-                    tables = []
-                    try:
-                        if hasattr(ppage, 'find_tables'):
-                            # two strategies to improve recall
-                            ts_line = {
-                                "vertical_strategy": "lines",
-                                "horizontal_strategy": "lines",
-                                "intersection_tolerance": 5,
-                                "snap_tolerance": 3,
-                                "edge_min_length": 3,
-                                "min_words_vertical": 1,
-                                "min_words_horizontal": 1,
-                                "join_tolerance": 3,
-                                "text_x_tolerance": 2,
-                                "text_y_tolerance": 2,
-                            }
-                            tables = ppage.find_tables(table_settings=ts_line) or []
-                            if not tables:
-                                ts_text = {
-                                    "vertical_strategy": "text",
-                                    "horizontal_strategy": "text",
-                                    "snap_tolerance": 3,
-                                    "join_tolerance": 3,
-                                    "text_x_tolerance": 3,
-                                    "text_y_tolerance": 3,
-                                }
-                                tables = ppage.find_tables(table_settings=ts_text) or []
-                    except Exception:
-                        tables = []
-                    # filter out probable false positives (e.g., multicolumn body text)
-                    try:
-                        tables = [t for t in (tables or []) if _is_plausible_table(t)]
-                    except Exception:
-                        pass
-                    if not tables:
-                        # fallback: only textual extraction, no cells/bboxes
-                        simple = []
-                        # only allow textual fallback if a caption exists on the page
-                        if page_table_caps.get(page_num + 1):
-                            # also require graphics (grid) somewhere on the page to reduce false positives
-                            try:
-                                full_bb = (0.0, 0.0, float(fpage.rect.width), float(fpage.rect.height))
-                                vcnt, hcnt, lv, lh = _edge_counts_in_bbox(full_bb)
-                            except Exception:
-                                vcnt, hcnt, lv, lh = 0, 0, 0, 0
-                            if (lv >= 1 and lh >= 1) or (vcnt >= 4 and hcnt >= 4):
-                                simple = ppage.extract_tables() or []
-                        for table_index, table in enumerate(simple):
-                            # sanitize cells for structural markers in textual fallback
-                            cleaned_rows = []
-                            for row in table:
-                                out_cells = []
-                                for cell in row:
-                                    s = normalize_ws(str(cell or "")).strip()
-                                    try:
-                                        s = s.replace("!!/", " ")
-                                        s = re.sub(r"\b!!!\b", " ", s)
-                                        s = re.sub(r"^\s*!!\s*", " ", s)
-                                        # remove typed region tags <table>, </table>, <img>, </img>
-                                        s = re.sub(r"<\s*/?\s*(table|img)\s*>", " ", s, flags=re.IGNORECASE)
-                                        s = normalize_ws(s).strip()
-                                    except Exception:
-                                        pass
-                                    if _is_structural_marker_text(s):
-                                        s = ""
-                                    out_cells.append(s)
-                                cleaned_rows.append(" | ".join(out_cells))
-                            rows_text = cleaned_rows
-                            filename = f"table_p{page_num+1}_{table_index+1}.txt"
-                            filepath = os.path.join(tables_dir, filename)
-                            try:
-                                with open(filepath, 'w', encoding='utf-8') as f:
-                                    f.write("\n".join(rows_text))
-                            except Exception:
-                                pass
+                                regions = []
+                        if not regions:
+                            continue  # still nothing -> skip
+                        for k in range(extracted_t, len(caps_tbl)):
+                            idx = k - extracted_t
+                            if idx >= len(regions):
+                                break
+                            r = regions[idx]
+                            rx0 = float(r.get('x0', 0.0))
+                            rx1 = float(r.get('x1', page2.rect.width))
+                            rect = fitz.Rect(rx0, float(r['y0']), rx1, float(r['y1']))
+                            pix2 = page2.get_pixmap(matrix=mat, alpha=False, clip=rect)
+                            snap_name = f"table_snapshot_p{p+1}_{k}.png"
+                            snap_path = os.path.join(tables_dir, snap_name)
+                            pix2.save(snap_path)
+                            node2 = node_index.find(p + 1)
                             table_data = {
-                                "id": f"table_{page_num+1}_{table_index}",
-                                "page": page_num + 1,
-                                "index": table_index,
-                                "filename": filename,
-                                "filepath": filepath,
-                                "url": f"/assets/tables/{filename}",
-                                "rows": len(table),
-                                "columns": len(table[0]) if table else 0,
-                                "title": f"Tableau {len(assets['tables']) + 1}",
-                                "content": rows_text,
+                                "id": f"table_snap_{p+1}_{k}",
+                                "page": p + 1,
+                                "index": k,
+                                "filename": snap_name,
+                                "filepath": snap_path,
+                                "url": f"/assets/tables/{snap_name}",
+                                "rows": 0,
+                                "columns": 0,
+                                "title": caps_tbl[k],
+                                "content": [],
+                                "is_snapshot": True
                             }
-                            caps_tbl = page_table_caps.get(page_num + 1)
-                            if caps_tbl:
-                                ptrt = caption_ptr_tbl.get(page_num + 1, 0)
-                                if ptrt < len(caps_tbl):
-                                    table_data["title"] = caps_tbl[ptrt]
-                                    caption_ptr_tbl[page_num + 1] = ptrt + 1
                             assets["tables"].append(table_data)
-                            tables_by_page[page_num + 1] += 1
-                            node = find_node_for_page(structured_data, page_num + 1)
-                            if node["subsection"] is not None:
-                                node["subsection"].setdefault("tables", []).append(table_data)
-                            elif node["section"] is not None:
-                                node["section"].setdefault("tables", []).append(table_data)
-                            elif node["chapter"] is not None:
-                                node["chapter"].setdefault("tables", []).append(table_data)
-                        continue
-                    # Enriched extraction using table cells
-                    for table_index, t in enumerate(tables):
-                        try:
-                            tbbox = getattr(t, 'bbox', None)
-                            cells = getattr(t, 'cells', None)
-                        except Exception:
-                            tbbox = None
-                            cells = None
-                        data_rows = []
-                        rows_text = []
-                        cell_matrix = []
-                        nrows = 0
-                        ncols = 0
-                        # Build a grid from cell bboxes if available
-                        if cells:
-                            xs_all = []
-                            ys_all = []
-                            for c in cells:
-                                bb = _cell_bbox(c)
-                                if not bb:
-                                    continue
-                                cx0, cy0, cx1, cy1 = bb
-                                xs_all.extend([cx0, cx1])
-                                ys_all.extend([cy0, cy1])
-                            xs = _dedup(xs_all)
-                            ys = _dedup(ys_all)
-                            ncols = max(0, len(xs) - 1)
-                            nrows = max(0, len(ys) - 1)
-                            # init matrix
-                            cell_matrix = [[None for _ in range(ncols)] for _ in range(nrows)]
-                            # map each cell to grid position
-                            for c in cells:
-                                bb = _cell_bbox(c)
-                                if not bb:
-                                    continue
-                                x0, y0, x1, y1 = bb[0], bb[1], bb[2], bb[3]
-                                try:
-                                    col0 = _find_bucket(x0, xs)
-                                    row0 = _find_bucket(y0, ys)
-                                    if 0 <= row0 < nrows and 0 <= col0 < ncols:
-                                        cell_matrix[row0][col0] = [x0, y0, x1, y1]
-                                except Exception:
-                                    continue
-                        else:
-                            # fallback: use extracted textual table for rows/cols
-                            try:
-                                extracted = t.extract() if hasattr(t, 'extract') else []
-                            except Exception:
-                                extracted = []
-                            if extracted:
-                                nrows = len(extracted)
-                                ncols = len(extracted[0]) if extracted else 0
-                                cell_matrix = [[None for _ in range(ncols)] for _ in range(nrows)]
-                                # approximate bbox grid from tbbox
-                                if tbbox and ncols and nrows:
-                                    x0, top, x1, bottom = tbbox
-                                    colw = (x1 - x0) / ncols
-                                    rowh = (bottom - top) / nrows
-                                    for r in range(nrows):
-                                        for cidx in range(ncols):
-                                            cx0 = x0 + cidx * colw
-                                            cx1 = x0 + (cidx + 1) * colw
-                                            cy0 = top + r * rowh
-                                            cy1 = top + (r + 1) * rowh
-                                            cell_matrix[r][cidx] = [cx0, cy0, cx1, cy1]
-                        # Extract content/colors/icons per cell
-                        for r in range(nrows):
-                            row_texts = []
-                            row_data = []
-                            for cidx in range(ncols):
-                                bbox = cell_matrix[r][cidx]
-                                if not bbox:
-                                    row_texts.append("")
-                                    row_data.append("")
-                                    continue
-                                txt, txt_color = _cell_text_and_color(fpage, bbox)
-                                icons, bg_color = _cell_icons_and_bg(fpage, drawings, bbox, images_dir, page_num + 1, table_index, cidx, r)
-                                row_texts.append(txt)
-                                row_data.append({
-                                    "bbox": bbox,
-                                    "text": txt,
-                                    "text_color": txt_color,
-                                    "background_color": bg_color,
-                                    "icons": icons,
-                                })
-                            rows_text.append(" | ".join((t or "").strip() for t in row_texts))
-                            data_rows.append(row_data)
-                        # columns content aggregation
-                        columns_content = []
-                        for cidx in range(ncols):
-                            col_texts = []
-                            for r in range(nrows):
-                                item = data_rows[r][cidx]
-                                if isinstance(item, dict):
-                                    if item.get("text"):
-                                        col_texts.append(item.get("text"))
-                                elif isinstance(item, str) and item:
-                                    col_texts.append(item)
-                            columns_content.append(" \n".join(col_texts))
-                        # Capture PNG du tableau entier (bbox de table ou union des cellules)
-                        snap_name = None
-                        snap_path = None
-                        try:
-                            tbbox_final = None
-                            if tbbox is not None:
-                                try:
-                                    tx0, ttop, tx1, tbottom = tbbox
-                                    tbbox_final = (float(tx0), float(ttop), float(tx1), float(tbottom))
-                                except Exception:
-                                    tbbox_final = None
-                            if tbbox_final is None and cell_matrix:
-                                xs_all = []
-                                ys_all = []
-                                for r in range(nrows):
-                                    for cidx in range(ncols):
-                                        bb = cell_matrix[r][cidx]
-                                        if not bb:
-                                            continue
-                                        xs_all.extend([bb[0], bb[2]])
-                                        ys_all.extend([bb[1], bb[3]])
-                                if xs_all and ys_all:
-                                    tbbox_final = (min(xs_all), min(ys_all), max(xs_all), max(ys_all))
-                            if tbbox_final is not None:
-                                rx0, ry0, rx1, ry1 = tbbox_final
-                                rect = fitz.Rect(rx0, ry0, rx1, ry1)
-                                mat_snap = fitz.Matrix(2.0, 2.0)
-                                pix_tbl = fpage.get_pixmap(matrix=mat_snap, alpha=False, clip=rect)
-                                snap_name = f"table_snapshot_p{page_num+1}_{table_index+1}.png"
-                                snap_path = os.path.join(tables_dir, snap_name)
-                                pix_tbl.save(snap_path)
-                        except Exception:
-                            snap_name = None
-                            snap_path = None
-                        filename = f"table_p{page_num+1}_{table_index+1}.txt"
-                        filepath = os.path.join(tables_dir, filename)
-                        try:
-                            with open(filepath, 'w', encoding='utf-8') as f:
-                                f.write("\n".join(rows_text))
-                        except Exception:
-                            pass
-                        table_data = {
-                            "id": f"table_{page_num+1}_{table_index}",
-                            "page": page_num + 1,
-                            "index": table_index,
-                            "filename": filename,
-                            "filepath": filepath,
-                            "url": f"/assets/tables/{filename}",
-                            "rows": nrows,
-                            "columns": ncols,
-                            "title": f"Tableau {len(assets['tables']) + 1}",
-                            "content": rows_text,
-                            "cells": data_rows,
-                            "columns_content": columns_content,
-                        }
-                        if snap_name and snap_path:
-                            table_data["snapshot_filename"] = snap_name
-                            table_data["snapshot_filepath"] = snap_path
-                            table_data["snapshot_url"] = f"/assets/tables/{snap_name}"
-                        caps_tbl = page_table_caps.get(page_num + 1)
-                        if caps_tbl:
-                            ptrt = caption_ptr_tbl.get(page_num + 1, 0)
-                            if ptrt < len(caps_tbl):
-                                table_data["title"] = caps_tbl[ptrt]
-                                caption_ptr_tbl[page_num + 1] = ptrt + 1
-                        assets["tables"].append(table_data)
-                        tables_by_page[page_num + 1] += 1
-                        node = find_node_for_page(structured_data, page_num + 1)
-                        if node["subsection"] is not None:
-                            node["subsection"].setdefault("tables", []).append(table_data)
-                        elif node["section"] is not None:
-                            node["section"].setdefault("tables", []).append(table_data)
-                        elif node["chapter"] is not None:
-                            node["chapter"].setdefault("tables", []).append(table_data)
-            # Fallback: for pages with table captions but no table extracted, create a region snapshot only when regions exist
-            try:
-                with fitz.open(pdf_path) as doc2:
-                    zoom = 2.0
-                    mat = fitz.Matrix(zoom, zoom)
-                    for p in range(len(doc2)):
-                        caps_tbl = page_table_caps.get(p + 1, []) or []
-                        extracted_t = tables_by_page.get(p + 1, 0)
-                        if extracted_t < len(caps_tbl):
-                            page2 = doc2.load_page(p)
-                            regions = capture_regions.get(p + 1, [])
-                            if not regions:
-                                # try to guess regions from drawings if no manual regions
-                                try:
-                                    drs = page2.get_drawings()
-                                except Exception:
-                                    drs = []
-                                guess = []
-                                try:
-                                    pxw = float(page2.rect.width); pxh = float(page2.rect.height)
-                                    area_min = 0.05 * (pxw * pxh)
-                                    area_max = 0.80 * (pxw * pxh)
-                                    for d in drs or []:
-                                        r = d.get('rect')
-                                        if r is not None:
-                                            bb = fitz.Rect(r.x0, r.y0, r.x1, r.y1)
-                                        else:
-                                            items = d.get('items') or []
-                                            xs, ys = [], []
-                                            for it in items:
-                                                pts = it[1] if len(it) > 1 else []
-                                                for pt in pts:
-                                                    xs.append(pt[0]); ys.append(pt[1])
-                                            if xs and ys:
-                                                bb = fitz.Rect(min(xs), min(ys), max(xs), max(ys))
-                                            else:
-                                                continue
-                                        area = bb.width * bb.height
-                                        if area_min <= area <= area_max:
-                                            guess.append(bb)
-                                    # sort by area desc and deduplicate close boxes
-                                    guess.sort(key=lambda r: r.width * r.height, reverse=True)
-                                    uniq = []
-                                    for g in guess:
-                                        if not uniq:
-                                            uniq.append(g)
-                                            continue
-                                        iou = max(0, min(g.x1, uniq[-1].x1) - max(g.x0, uniq[-1].x0)) * max(0, min(g.y1, uniq[-1].y1) - max(g.y0, uniq[-1].y0))
-                                        uarea = g.width * g.height + uniq[-1].width * uniq[-1].height - iou
-                                        if uarea == 0 or (iou / uarea) < 0.5:
-                                            uniq.append(g)
-                                    regions = [{'y0': float(r.y0), 'y1': float(r.y1), 'x0': float(r.x0), 'x1': float(r.x1)} for r in uniq[:len(caps_tbl)]]
-                                except Exception:
-                                    regions = []
-                            if not regions:
-                                continue  # still nothing -> skip
-                            for k in range(extracted_t, len(caps_tbl)):
-                                idx = k - extracted_t
-                                if idx >= len(regions):
-                                    break
-                                r = regions[idx]
-                                rx0 = float(r.get('x0', 0.0))
-                                rx1 = float(r.get('x1', page2.rect.width))
-                                rect = fitz.Rect(rx0, float(r['y0']), rx1, float(r['y1']))
-                                pix2 = page2.get_pixmap(matrix=mat, alpha=False, clip=rect)
-                                snap_name = f"table_snapshot_p{p+1}_{k}.png"
-                                snap_path = os.path.join(tables_dir, snap_name)
-                                pix2.save(snap_path)
-                                node2 = find_node_for_page(structured_data, p + 1)
-                                table_data = {
-                                    "id": f"table_snap_{p+1}_{k}",
-                                    "page": p + 1,
-                                    "index": k,
-                                    "filename": snap_name,
-                                    "filepath": snap_path,
-                                    "url": f"/assets/tables/{snap_name}",
-                                    "rows": 0,
-                                    "columns": 0,
-                                    "title": caps_tbl[k],
-                                    "content": [],
-                                    "is_snapshot": True
-                                }
-                                assets["tables"].append(table_data)
-                                if node2["subsection"] is not None:
-                                    node2["subsection"].setdefault("tables", []).append(table_data)
-                                elif node2["section"] is not None:
-                                    node2["section"].setdefault("tables", []).append(table_data)
-                                elif node2["chapter"] is not None:
-                                    node2["chapter"].setdefault("tables", []).append(table_data)
-            except Exception:
-                pass
+                            if node2["subsection"] is not None:
+                                node2["subsection"].setdefault("tables", []).append(table_data)
+                            elif node2["section"] is not None:
+                                node2["section"].setdefault("tables", []).append(table_data)
+                            elif node2["chapter"] is not None:
+                                node2["chapter"].setdefault("tables", []).append(table_data)
+        except Exception:
+            pass
     except Exception as e:
         print(f"Erreur lors de l'extraction des tableaux : {str(e)}")
     # Force snapshots for typed regions (!!! image / !!! table), regardless of captions
@@ -1640,14 +2021,14 @@ def extract_assets(pdf_path, output_dir, structured_data):
             mat = fitz.Matrix(zoom, zoom)
             total = len(doc3)
             for p in range(total):
-                regions = [r for r in capture_regions.get(p + 1, []) if r.get('kind') in ('image', 'table')]
+                regions = [r for r in region_index.capture_regions(p + 1) if r.get('kind') in ('image', 'table')]
                 if not regions:
                     continue
                 page3 = doc3.load_page(p)
                 for idx, r in enumerate(regions):
                     rect = fitz.Rect(0, float(r['y0']), page3.rect.width, float(r['y1']))
                     pix3 = page3.get_pixmap(matrix=mat, alpha=False, clip=rect)
-                    node3 = find_node_for_page(structured_data, p + 1)
+                    node3 = node_index.find(p + 1)
                     if r.get('kind') == 'table':
                         rows_cnt = 0
                         cols_cnt = 0
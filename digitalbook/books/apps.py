@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class BooksConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'books'
+
+    def ready(self):
+        # Invalidation des snapshots de lecture (Book.content_version)
+        from .snapshots import connect_signals
+        connect_signals()
@@ -1,8 +1,6 @@
-from concurrent.futures import ThreadPoolExecutor
 from typing import Optional, List
 
-# Thread pool dédié aux tâches lourdes de création de livre (2 threads)
-_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="book-worker")
+from .jobs import get_job_backend
 
 
 def submit_process_book(
@@ -10,23 +8,24 @@ def submit_process_book(
     json_structure_file_rel: Optional[str] = None,
     generate_qcm: bool = True,
     nb_questions_per_chapter: Optional[int] = None,
+    reimport: bool = False,
 ) -> None:
-    """Soumet une tâche de traitement de livre au pool dédié.
+    """Soumet une tâche de traitement de livre au backend configuré (settings.BOOK_JOB_BACKEND).
 
     Args:
         book_id: ID du livre à traiter
         json_structure_file_rel: chemin RELATIF (depuis MEDIA_ROOT) vers un JSON de structure
         generate_qcm: si True, génère les QCM à la fin
         nb_questions_per_chapter: nombre de questions par chapitre (optionnel)
+        reimport: si True, met à jour la hiérarchie existante au lieu de la créer
     """
-    from .book_processing import process_book_sync
-
-    _executor.submit(
-        process_book_sync,
-        book_id,
-        json_structure_file_rel,
-        generate_qcm,
-        nb_questions_per_chapter,
+    get_job_backend().submit(
+        'process_book',
+        book_id=book_id,
+        json_structure_file_rel=json_structure_file_rel,
+        generate_qcm=generate_qcm,
+        nb_questions_per_chapter=nb_questions_per_chapter,
+        reimport=reimport,
     )
 
 
@@ -40,9 +39,5 @@ def submit_translate_book(
     """
     # Fonction de traduction désactivée temporairement.
     # from .translation import translate_book_sync
-    # _executor.submit(
-    #     translate_book_sync,
-    #     book_id,
-    #     target_langs,
-    # )
+    # (à enregistrer dans books.jobs.TASKS puis soumettre via get_job_backend())
     return None
@@ -6,9 +6,11 @@ from datetime import datetime
 from typing import Optional
 
 from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 
-from .models import Book
+from .checkpoints import BookCheckpoints, assets_present, file_sha256
+from .models import Book, ProcessingStage
 
 
 def _save_book_fields(book: Book, **kwargs):
@@ -54,11 +56,16 @@ def process_book_sync(
     json_structure_file_rel: Optional[str] = None,
     generate_qcm: bool = True,
     nb_questions_per_chapter: Optional[int] = None,
+    reimport: bool = False,
+    raise_errors: bool = False,
 ) -> None:
     """Traite un livre de manière synchrone dans un thread background.
     - Parse le PDF (ou importe un JSON fourni) pour créer la hiérarchie
-    - Génère les QCMs si demandé
+      (reimport=True : met à jour la hiérarchie existante par différence)
+    - Génère les QCMs si demandé (en ré-import, seulement pour les chapitres sans QCM)
     - Met à jour les champs de progression/statut sur le modèle Book
+    raise_errors=True : l'exception est relevée après le passage en 'failed' (books.jobs
+    décide alors de réessayer ou non)
     """
     print(f"[process_book_sync] Start for book_id={book_id}")
     book = Book.objects.get(id=book_id)
@@ -83,37 +90,24 @@ def process_book_sync(
 
         structured_data = None
         json_file_path = None
+        # Checkpoints par étape (clé : SHA-256 de la source + version du parseur)
+        checkpoints = None
         if json_structure_file_rel:
             json_file_path = os.path.join(settings.MEDIA_ROOT, json_structure_file_rel)
         print(f"[process_book_sync] json_structure_file_rel={json_structure_file_rel}")
         print(f"[process_book_sync] Resolved json_file_path={json_file_path}")
 
         if json_file_path and os.path.exists(json_file_path):
-            # Utiliser le JSON fourni par l'utilisateur
-            print(f"[process_book_sync] Loading JSON from {json_file_path}")
-            # Supporte les fichiers JSON avec BOM UTF-8 via 'utf-8-sig'
-            with open(json_file_path, 'r', encoding='utf-8-sig') as f:
-                structured_data = json.load(f)
-            # Normaliser la racine si c'est une liste (chapitres sans thématique)
-            if isinstance(structured_data, list):
-                print("[process_book_sync] JSON loaded. Root is a list; wrapping into 'chapters_sans_thematique'")
-                structured_data = {'chapters_sans_thematique': structured_data}
-            else:
-                try:
-                    print(f"[process_book_sync] JSON loaded. Root keys: {list(structured_data.keys())}")
-                except Exception:
-                    print("[process_book_sync] JSON loaded.")
-            # Option: mettre à jour le titre depuis le JSON
-            if isinstance(structured_data, dict) and structured_data.get('title'):
-                _save_book_fields(book, title=structured_data['title'])
-
-            # Créer la hiérarchie depuis le JSON fourni
+            # Utiliser le JSON fourni par l'utilisateur, lu en flux (hierarchy.create_book_hierarchy_from_json_file)
+            print(f"[process_book_sync] Streaming JSON from {json_file_path}")
             _save_book_fields(book, processing_progress=40)
 
-            # Import depuis un module dédié pour éviter les dépendances aux vues
-            from .hierarchy import create_book_hierarchy_from_provided_json
-            print("[process_book_sync] Creating hierarchy from provided JSON...")
-            create_book_hierarchy_from_provided_json(book, structured_data)
+            from .hierarchy import create_book_hierarchy_from_json_file
+            checkpoints = BookCheckpoints(book, file_sha256(json_file_path), 'json')
+            _create_hierarchy_once(
+                book, checkpoints, lambda: create_book_hierarchy_from_json_file(book, json_file_path, reimport=reimport),
+                reimport=reimport,
+            )
             print("[process_book_sync] Hierarchy creation done.")
         else:
             # Parser le PDF (aucun JSON fourni)
@@ -121,8 +115,7 @@ def process_book_sync(
                 raise FileNotFoundError(f"Fichier PDF introuvable: {pdf_file_path}")
 
             from .pdf_parser import parse_pdf_to_structured_json, create_book_hierarchy_from_json, extract_cover_from_pdf
-            from .hierarchy import create_book_hierarchy_from_provided_json
-            from .algo_balise import parse_marked_pdf, extract_assets
+            from .algo_balise import parse_marked_pdf, extract_assets, build_page_models, PARSER_VERSION
 
             _save_book_fields(book, processing_progress=35)
 
@@ -136,26 +129,50 @@ def process_book_sync(
 
             # Tenter d'utiliser le nouveau parseur basé sur les balises (scripts/algo_balise.py)
             try:
-                print("[process_book_sync] Parsing PDF with algo_balise.parse_marked_pdf ...")
-                structured_data = parse_marked_pdf(pdf_file_path)
-
-                # Extraire les assets (images, tableaux) dans un répertoire partagé 'extracted_assets'
-                try:
-                    # Un niveau au-dessus de BASE_DIR pour matcher le dossier racine 'extracted_assets'
-                    assets_root = os.path.join(getattr(settings, "BASE_DIR", os.getcwd()), "..", "extracted_assets")
-                    assets_root = os.path.abspath(assets_root)
-                    os.makedirs(assets_root, exist_ok=True)
-                    print(f"[process_book_sync] Extracting assets to {assets_root} ...")
-                    assets, structured_data = extract_assets(pdf_file_path, assets_root, structured_data)
+                checkpoints = BookCheckpoints(book, file_sha256(pdf_file_path), PARSER_VERSION)
+                # Un niveau au-dessus de BASE_DIR pour matcher le dossier racine 'extracted_assets'
+                assets_root = os.path.join(getattr(settings, "BASE_DIR", os.getcwd()), "..", "extracted_assets")
+                assets_root = os.path.abspath(assets_root)
+
+                saved_assets = checkpoints.load(ProcessingStage.ASSETS)
+                if saved_assets is not None and assets_present(saved_assets.get('assets', {}), assets_root):
+                    # Même PDF déjà parsé et ses assets toujours sur disque : reprise directe
+                    print("[process_book_sync] Checkpoint found: reusing parsed structure and assets")
+                    structured_data = saved_assets['structured_data']
+                else:
+                    # Les pages sont lues une seule fois puis partagées entre parsing et extraction d'assets
+                    extraction_workers = getattr(settings, 'PDF_EXTRACTION_WORKERS', 1)
+                    page_models = build_page_models(
+                        pdf_file_path,
+                        workers=extraction_workers,
+                        ocr_workers=getattr(settings, 'OCR_WORKERS', 1),
+                    )
+                    structured_data = checkpoints.load(ProcessingStage.STRUCTURE)
+                    if structured_data is not None:
+                        print("[process_book_sync] Checkpoint found: reusing parsed structure")
+                    else:
+                        print("[process_book_sync] Parsing PDF with algo_balise.parse_marked_pdf ...")
+                        structured_data = parse_marked_pdf(pdf_file_path, page_models=page_models)
+                        checkpoints.save(ProcessingStage.STRUCTURE, structured_data)
+
+                    # Extraire les assets (images, tableaux) dans un répertoire partagé 'extracted_assets'
                     try:
-                        print(
-                            f"[process_book_sync] Assets extracted: images={len(assets.get('images', []))}, "
-                            f"tables={len(assets.get('tables', []))}"
+                        os.makedirs(assets_root, exist_ok=True)
+                        print(f"[process_book_sync] Extracting assets to {assets_root} ...")
+                        assets, structured_data = extract_assets(
+                            pdf_file_path, assets_root, structured_data,
+                            page_models=page_models, workers=extraction_workers,
                         )
-                    except Exception:
-                        pass
-                except Exception as assets_err:
-                    print(f"[process_book_sync] Asset extraction failed, continuing without assets: {assets_err}")
+                        try:
+                            print(
+                                f"[process_book_sync] Assets extracted: images={len(assets.get('images', []))}, "
+                                f"tables={len(assets.get('tables', []))}"
+                            )
+                        except Exception:
+                            pass
+                        checkpoints.save(ProcessingStage.ASSETS, {'assets': assets, 'structured_data': structured_data})
+                    except Exception as assets_err:
+                        print(f"[process_book_sync] Asset extraction failed, continuing without assets: {assets_err}")
 
                 # Optionnel: écrire le JSON structuré sur disque (debug/dev)
                 try:
@@ -168,7 +185,9 @@ def process_book_sync(
                 # Créer la hiérarchie avec la nouvelle structure (thematiques / chapters_sans_thematique)
                 _save_book_fields(book, processing_progress=60)
                 print("[process_book_sync] Creating hierarchy from marked PDF JSON (algo_balise)...")
-                create_book_hierarchy_from_provided_json(book, structured_data)
+                from .hierarchy import create_book_hierarchy_from_provided_json, reimport_book_hierarchy_from_provided_json
+                create = reimport_book_hierarchy_from_provided_json if reimport else create_book_hierarchy_from_provided_json
+                _create_hierarchy_once(book, checkpoints, lambda: create(book, structured_data), reimport=reimport)
             except Exception as balise_err:
                 # Fallback: utiliser l'ancien parseur basé sur pdf_parser.parse_pdf_to_structured_json
                 print("[process_book_sync] algo_balise indisponible, fallback sur parse_pdf_to_structured_json ...")
@@ -184,10 +203,11 @@ def process_book_sync(
                 except Exception:
                     pass
 
-                # Créer la hiérarchie avec l'ancien format (chapters)
+                # Créer la hiérarchie avec l'ancien format (chapters) : pas de checkpoint pour ce parseur
+                checkpoints = None
                 _save_book_fields(book, processing_progress=60)
                 print("[process_book_sync] Creating hierarchy from parsed PDF JSON (fallback)...")
-                create_book_hierarchy_from_json(book, structured_data)
+                create_book_hierarchy_from_json(book, structured_data, reimport=reimport)
 
         # Étape: Détection de langue (après création de la hiérarchie)
         try:
@@ -205,11 +225,17 @@ def process_book_sync(
             nbq = int(nb_questions_per_chapter) if nb_questions_per_chapter else int(
                 os.environ.get('QCM_DEFAULT_QUESTIONS', getattr(settings, 'QCM_DEFAULT_QUESTIONS', 5))
             )
-            generate_qcms_for_book(
-                book=book,
-                nb_questions_per_chapter=nbq,
-                generate_for_all_chapters=True
-            )
+            # En ré-import, les QCM des nouveaux chapitres restent à générer
+            if not reimport and checkpoints is not None and checkpoints.load(ProcessingStage.QCM) is not None:
+                print("[process_book_sync] Checkpoint found: QCMs already generated")
+            else:
+                generate_qcms_for_book(
+                    book=book,
+                    nb_questions_per_chapter=nbq,
+                    generate_for_all_chapters=not reimport
+                )
+                if checkpoints is not None:
+                    checkpoints.save(ProcessingStage.QCM, {'nb_questions_per_chapter': nbq})
 
         # Finalisation
         print("[process_book_sync] Finalizing: status=completed")
@@ -229,7 +255,25 @@ def process_book_sync(
             processing_error=f"{str(e)}\n{tb}",
             processing_finished_at=timezone.now(),
         )
-        # Ne pas relancer: on est en background thread
+        # Ne pas relancer en background thread, sauf pour le worker qui classe l'erreur
+        if raise_errors:
+            raise
+
+
+def _create_hierarchy_once(book: Book, checkpoints: BookCheckpoints, create, reimport: bool = False) -> None:
+    """Crée la hiérarchie du livre avec create(), sauf si un essai précédent l'a déjà créée.
+
+    En ré-import, le checkpoint est ignoré : la source a pu déjà servir à ce livre
+    (v1 -> v2 -> v1, ou ré-import du PDF courant) alors que l'arbre en base a changé.
+    La hiérarchie et son checkpoint sont écrits dans la même transaction.
+    """
+    already_done = not reimport and checkpoints.load(ProcessingStage.HIERARCHY) is not None
+    if already_done and (book.chapters.exists() or book.thematiques.exists()):
+        print("[process_book_sync] Checkpoint found: hierarchy already created")
+        return
+    with transaction.atomic():
+        create()
+        checkpoints.save(ProcessingStage.HIERARCHY, {'chapters': book.chapters.count()})
 
 
 def _detect_language_for_book(book: Book) -> str:
@@ -0,0 +1,69 @@
+"""Checkpoints de traitement des livres (reprise après échec / ré-import du même PDF).
+
+Chaque étape de process_book_sync enregistre son résultat dans ProcessingCheckpoint,
+sous la clé SHA-256 du fichier source + version du parseur :
+
+    structure  structured_data issu de parse_marked_pdf     (contenu, tout livre)
+    assets     manifeste des assets + structured_data enrichi (contenu, tout livre)
+    hierarchy  hiérarchie créée en base                     (propre au livre)
+    qcm        QCM générés                                  (propre au livre)
+"""
+import hashlib
+import os
+from typing import Optional
+
+from .models import Book, ProcessingCheckpoint, ProcessingStage
+
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class BookCheckpoints:
+    """Accès aux checkpoints d'une source (PDF/JSON) pour un livre donné."""
+
+    def __init__(self, book: Book, source_sha256: str, parser_version: str):
+        self.book = book
+        self.source_sha256 = source_sha256
+        self.parser_version = parser_version
+
+    def _book_for(self, stage: str) -> Optional[Book]:
+        if stage in (ProcessingStage.STRUCTURE, ProcessingStage.ASSETS):
+            return None
+        return self.book
+
+    def load(self, stage: str):
+        """Payload de l'étape si elle a déjà été terminée, sinon None."""
+        cp = ProcessingCheckpoint.objects.filter(
+            source_sha256=self.source_sha256,
+            parser_version=self.parser_version,
+            stage=stage,
+            book=self._book_for(stage),
+        ).order_by('-updated_at').first()
+        return cp.payload if cp is not None else None
+
+    def save(self, stage: str, payload) -> None:
+        ProcessingCheckpoint.objects.update_or_create(
+            source_sha256=self.source_sha256,
+            parser_version=self.parser_version,
+            stage=stage,
+            book=self._book_for(stage),
+            defaults={'payload': payload},
+        )
+
+
+def assets_present(assets: dict, assets_root: str) -> bool:
+    """Vrai si tous les fichiers d'un manifeste d'assets existent encore sous assets_root."""
+    for kind in ('images', 'tables'):
+        for item in assets.get(kind, []) or []:
+            url = item.get('url') or ''
+            if '/assets/' not in url:
+                continue
+            rel = url.split('/assets/', 1)[1]
+            if not os.path.exists(os.path.join(assets_root, rel)):
+                return False
+    return True
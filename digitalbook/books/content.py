@@ -0,0 +1,299 @@
+"""Construction de la structure d'un livre (endpoints BookViewSet.content et export_structure).
+
+Nombre de requêtes constant quelle que soit la taille du livre : chapitres (avec leur
+thématique), sections et sous-sections sont chargés par prefetch_related, et chaque
+modèle de traduction par un Prefetch filtré sur la langue demandée. L'arbre est ensuite
+assemblé en mémoire. L'export peut aussi être produit en flux, par lots de chapitres
+(iter_book_export).
+"""
+from django.conf import settings
+from django.db.models import Prefetch
+from qcm.models import QCM, Question
+from rest_framework.renderers import JSONRenderer
+
+from .models import (
+    Chapter,
+    ChapterTranslation,
+    Section,
+    SectionTranslation,
+    Subsection,
+    SubsectionTranslation,
+    ThematiqueTranslation,
+)
+
+CONTENT_LANGS = ('fr', 'en', 'pt')
+
+
+def _translation(node, lang):
+    """Traduction préchargée (to_attr='lang_translations') du nœud, ou None."""
+    if not lang:
+        return None
+    translations = getattr(node, 'lang_translations', None)
+    return translations[0] if translations else None
+
+
+def _chapters_queryset(book, lang=None):
+    subsections = Subsection.objects.order_by('order', 'id')
+    sections = Section.objects.order_by('order', 'id')
+    prefetches = []
+    if lang:
+        subsections = subsections.prefetch_related(Prefetch(
+            'translations', queryset=SubsectionTranslation.objects.filter(lang=lang).defer('segments'),
+            to_attr='lang_translations'
+        ))
+        sections = sections.prefetch_related(Prefetch(
+            'translations', queryset=SectionTranslation.objects.filter(lang=lang).defer('segments'),
+            to_attr='lang_translations'
+        ))
+        prefetches = [
+            Prefetch('translations', queryset=ChapterTranslation.objects.filter(lang=lang), to_attr='lang_translations'),
+            Prefetch('thematique__translations', queryset=ThematiqueTranslation.objects.filter(lang=lang),
+                     to_attr='lang_translations'),
+        ]
+    sections = sections.prefetch_related(Prefetch('subsections', queryset=subsections, to_attr='ordered_subsections'))
+    return (
+        Chapter.objects.filter(book=book)
+        .select_related('thematique')
+        .order_by('order', 'id')
+        .prefetch_related(Prefetch('sections', queryset=sections, to_attr='ordered_sections'), *prefetches)
+    )
+
+
+def _thematique_data(thematique, lang):
+    data = {
+        'id': thematique.id,
+        'title': thematique.title,
+        'description': thematique.description,
+        'translation_status': None,
+    }
+    tr = _translation(thematique, lang)
+    if tr and (tr.title or tr.description):
+        data['title'] = tr.title or data['title']
+        data['description'] = tr.description or data['description']
+        data['translation_status'] = tr.status
+    return data
+
+
+def _leaf_data(node, lang):
+    """Champs communs section / sous-section, traduction appliquée si disponible."""
+    data = {
+        'id': node.id,
+        'title': node.title,
+        'content': node.content,
+        'order': node.order,
+        'images': node.images,
+        'tables': node.tables,
+        'translation_status': None,
+    }
+    tr = _translation(node, lang)
+    if tr and (tr.title or tr.content or tr.images or tr.tables):
+        data['title'] = tr.title or data['title']
+        data['content'] = tr.content or data['content']
+        data['images'] = tr.images if isinstance(tr.images, list) else data['images']
+        data['tables'] = tr.tables if isinstance(tr.tables, list) else data['tables']
+        data['translation_status'] = tr.status
+    return data
+
+
+def _chapter_data(chapter, lang):
+    data = {
+        'id': chapter.id,
+        'title': chapter.title,
+        'content': chapter.content,
+        'order': chapter.order,
+        'images': chapter.images,
+        'tables': chapter.tables,
+        'translation_status': None,
+    }
+    tr = _translation(chapter, lang)
+    if tr and (tr.title or tr.content):
+        data['title'] = tr.title or data['title']
+        data['content'] = tr.content or data['content']
+        data['translation_status'] = tr.status
+    return data
+
+
+def build_book_content(book, lang=None):
+    """Structure du livre (chapitres > sections > sous-sections) traduite dans `lang` si fournie.
+
+    Les champs absents d'une traduction retombent sur le texte source.
+    """
+    if lang not in CONTENT_LANGS:
+        lang = None
+
+    structure = {
+        'book': {
+            'id': book.id,
+            'title': book.title,
+            'url': book.url,
+            'pdf_url': book.pdf_url,
+            'cover_image': book.cover_image.url if book.cover_image else None,
+            'created_at': book.created_at.isoformat(),
+            'language': book.language,
+        },
+        'chapters': []
+    }
+
+    thematiques = {}
+    for chapter in _chapters_queryset(book, lang):
+        chapter_data = _chapter_data(chapter, lang)
+        chapter_data['thematique'] = None
+        chapter_data['sections'] = []
+
+        if chapter.thematique_id:
+            if chapter.thematique_id not in thematiques:
+                thematiques[chapter.thematique_id] = _thematique_data(chapter.thematique, lang)
+            # Copie : chaque chapitre garde son propre dict, comme avant
+            chapter_data['thematique'] = dict(thematiques[chapter.thematique_id])
+
+        for section in chapter.ordered_sections:
+            section_data = _leaf_data(section, lang)
+            section_data['subsections'] = [
+                _leaf_data(subsection, lang) for subsection in section.ordered_subsections
+            ]
+            chapter_data['sections'].append(section_data)
+
+        structure['chapters'].append(chapter_data)
+
+    return structure
+
+
+# Nœuds chargeables un par un : modèle, traductions, chemin vers le livre
+_NODES = {
+    'chapter': (Chapter, ChapterTranslation, 'book'),
+    'section': (Section, SectionTranslation, 'chapter__book'),
+    'subsection': (Subsection, SubsectionTranslation, 'section__chapter__book'),
+}
+
+
+def build_node_content(book, kind, node_id, lang=None):
+    """Contenu d'un seul nœud du livre (sans ses enfants), traduit dans `lang` si fournie.
+
+    Même forme que le nœud correspondant de build_book_content ; None si le nœud
+    n'appartient pas au livre.
+    """
+    if lang not in CONTENT_LANGS:
+        lang = None
+    model, translation_model, book_path = _NODES[kind]
+    qs = model.objects.filter(pk=node_id, **{book_path: book})
+    if lang:
+        qs = qs.prefetch_related(Prefetch(
+            'translations', queryset=translation_model.objects.filter(lang=lang), to_attr='lang_translations'
+        ))
+    node = qs.first()
+    if node is None:
+        return None
+    data = _chapter_data(node, lang) if kind == 'chapter' else _leaf_data(node, lang)
+    data['type'] = kind
+    return data
+
+
+def _qcm_data(qcm):
+    questions = qcm.ordered_questions
+    return {
+        "id": qcm.id,
+        "title": qcm.title,
+        "description": qcm.description,
+        "created_at": qcm.created_at.isoformat(),
+        "updated_at": qcm.updated_at.isoformat(),
+        "question_count": len(questions),
+        "questions": [
+            {
+                "id": question.id,
+                "text": question.text,
+                "order": question.order,
+                "responses": [
+                    {
+                        "id": response.id,
+                        "text": response.text,
+                        "is_correct": response.is_correct,
+                        "order": response.order
+                    }
+                    for response in question.reponses.all()
+                ]
+            }
+            for question in questions
+        ]
+    }
+
+
+def _export_chapters_queryset(book):
+    questions = Question.objects.order_by('order').prefetch_related('reponses')
+    qcms = QCM.objects.prefetch_related(Prefetch('questions', queryset=questions, to_attr='ordered_questions'))
+    return _chapters_queryset(book).prefetch_related(Prefetch('qcms', queryset=qcms, to_attr='chapter_qcms'))
+
+
+def _export_book_data(book):
+    return {
+        "id": book.id,
+        "title": book.title,
+        "url": book.url,
+        "pdf_url": book.pdf_url,
+        "cover_image": book.cover_image.url if book.cover_image else None,
+        "created_at": book.created_at.isoformat()
+    }
+
+
+def _export_chapter_data(chapter):
+    return {
+        "id": chapter.id,
+        "title": chapter.title,
+        "content": chapter.content,
+        "order": chapter.order,
+        "is_intro": chapter.is_intro,
+        "images": chapter.images,
+        "tables": chapter.tables,
+        "thematique": {
+            "id": chapter.thematique.id,
+            "title": chapter.thematique.title,
+            "description": chapter.thematique.description
+        } if chapter.thematique else None,
+        "sections": [
+            {
+                "id": section.id,
+                "title": section.title,
+                "content": section.content,
+                "order": section.order,
+                "images": section.images,
+                "tables": section.tables,
+                "subsections": [
+                    {
+                        "id": subsection.id,
+                        "title": subsection.title,
+                        "content": subsection.content,
+                        "order": subsection.order,
+                        "images": subsection.images,
+                        "tables": subsection.tables
+                    }
+                    for subsection in section.ordered_subsections
+                ]
+            }
+            for section in chapter.ordered_sections
+        ],
+        "qcm": [_qcm_data(qcm) for qcm in chapter.chapter_qcms]
+    }
+
+
+def build_book_export(book):
+    """Structure complète du livre (langue source) avec les QCM de chaque chapitre."""
+    return {
+        "book": _export_book_data(book),
+        "chapters": [_export_chapter_data(chapter) for chapter in _export_chapters_queryset(book)]
+    }
+
+
+def iter_book_export(book, chunk_size=None):
+    """JSON de build_book_export(), produit par morceaux (bytes) chapitre après chapitre.
+
+    Les chapitres sont chargés par lots de `chunk_size` (settings.BOOK_EXPORT_CHUNK_SIZE),
+    chaque lot avec ses prefetch : la mémoire ne dépend pas de la taille du livre et le
+    début du document est produit avant la lecture des derniers chapitres. Le résultat
+    concaténé est identique à JSONRenderer().render(build_book_export(book)).
+    """
+    render = JSONRenderer().render
+    chunk_size = chunk_size or getattr(settings, 'BOOK_EXPORT_CHUNK_SIZE', 20)
+    yield b'{"book":' + render(_export_book_data(book)) + b',"chapters":['
+    chapters = _export_chapters_queryset(book).iterator(chunk_size=chunk_size)
+    for i, chapter in enumerate(chapters):
+        yield (b',' if i else b'') + render(_export_chapter_data(chapter))
+    yield b']}'
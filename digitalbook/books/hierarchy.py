@@ -1,7 +1,200 @@
-from django.db import transaction
+import json
+
+from django.conf import settings
+from django.db import connection, transaction
 from .models import Book, Chapter, Section, Subsection, Thematique
 
 
+class HierarchyWriter:
+    """
+    Accumule la hiérarchie d'un livre en mémoire puis l'écrit niveau par niveau avec bulk_create
+
+    Chaque objet enfant référence son parent encore non sauvegardé : bulk_create renseigne les
+    clés primaires d'un niveau (thématiques, chapitres, sections) avant l'écriture du suivant.
+    Les objets sont insérés dans leur ordre d'ajout, donc les IDs suivent le même ordre que
+    la création ligne par ligne (parcours en profondeur). write() peut être appelé plusieurs
+    fois (import en flux) : seuls les objets ajoutés depuis l'écriture précédente sont insérés.
+    """
+
+    def __init__(self, book, batch_size=500):
+        self.book = book
+        self.batch_size = batch_size
+        self.thematiques = []
+        self.chapters = []
+        self.sections = []
+        self.subsections = []
+        self.written = {'thematiques': 0, 'chapters': 0, 'sections': 0, 'subsections': 0}
+
+    def add_thematique(self, **fields):
+        thematique = Thematique(book=self.book, **fields)
+        self.thematiques.append(thematique)
+        return thematique
+
+    def add_chapter(self, thematique=None, **fields):
+        chapter = Chapter(book=self.book, thematique=thematique, **fields)
+        self.chapters.append(chapter)
+        return chapter
+
+    def add_section(self, chapter, **fields):
+        section = Section(chapter=chapter, **fields)
+        self.sections.append(section)
+        return section
+
+    def add_subsection(self, section, **fields):
+        subsection = Subsection(section=section, **fields)
+        self.subsections.append(subsection)
+        return subsection
+
+    def _levels(self):
+        return (
+            ('thematiques', Thematique, self.thematiques),
+            ('chapters', Chapter, self.chapters),
+            ('sections', Section, self.sections),
+            ('subsections', Subsection, self.subsections),
+        )
+
+    def pending(self):
+        """Nombre d'objets ajoutés et pas encore écrits"""
+        return sum(len(objs) for _, _, objs in self._levels())
+
+    def counts(self):
+        return {key: self.written[key] + len(objs) for key, _, objs in self._levels()}
+
+    def write(self):
+        """Écrit les objets en attente dans une transaction et retourne le total d'objets écrits par niveau"""
+        levels = [(model, objs) for _, model, objs in self._levels()]
+        copied = False
+        if self._use_copy():
+            from .pg_copy import copy_insert_levels
+            try:
+                copy_insert_levels(levels, connection)
+                copied = True
+            except Exception as e:
+                print(f"[hierarchy] COPY indisponible, repli sur bulk_create: {e}")
+        if not copied:
+            with transaction.atomic():
+                for model, objs in levels:
+                    self._bulk_create(model, objs)
+        if any(objs for _, objs in levels):
+            from .snapshots import touch_book
+            touch_book(self.book.pk)
+        for key, _, objs in self._levels():
+            self.written[key] += len(objs)
+            objs.clear()
+        return dict(self.written)
+
+    def _use_copy(self):
+        # Chemin COPY (PostgreSQL) réservé aux grosses hiérarchies
+        if connection.vendor != 'postgresql' or not getattr(settings, 'HIERARCHY_COPY_ENABLED', True):
+            return False
+        return self.pending() >= getattr(settings, 'HIERARCHY_COPY_MIN_ROWS', 1000)
+
+    def _bulk_create(self, model, objs):
+        if not objs:
+            return
+        if connection.features.can_return_rows_from_bulk_insert:
+            model.objects.bulk_create(objs, batch_size=self.batch_size)
+        else:
+            # Sans RETURNING, bulk_create ne renseigne pas les IDs dont les enfants ont besoin
+            for obj in objs:
+                obj.save(force_insert=True)
+
+
+def _join_content(content):
+    if isinstance(content, list):
+        return " ".join(str(x) for x in content)
+    return content
+
+
+def _clip_title(title):
+    if not isinstance(title, str):
+        title = str(title)
+    if len(title) > 255:
+        title = title[:255]
+    return title
+
+
+def _node_order(node_data, index):
+    # Prioriser l'ordre fourni dans le JSON; sinon utiliser un ordre auto-incrémenté (index, 1-based)
+    json_order = node_data.get('order')
+    return json_order if json_order is not None else (index if index is not None else 0)
+
+
+def _chapter_fields(chapter_data, chapter_index=None):
+    return {
+        'title': _clip_title(chapter_data.get('title', 'Chapitre sans titre')),
+        'content': _join_content(chapter_data.get('content', '')),
+        'order': _node_order(chapter_data, chapter_index),
+        'is_intro': bool(chapter_data.get('is_intro', False)),
+    }
+
+
+def _section_fields(section_data, section_index=None):
+    # Adapter les noms de champs pour l'ancienne structure
+    return {
+        'title': _clip_title(section_data.get('title') or section_data.get('titre', 'Section sans titre')),
+        'content': _join_content(section_data.get('content') or section_data.get('contenu', '')),
+        'order': _node_order(section_data, section_index),
+        'images': section_data.get('images', []),
+        'tables': section_data.get('tables', []),
+    }
+
+
+def _subsection_fields(subsection_data, subsection_index=None):
+    # Adapter les noms de champs pour l'ancienne structure
+    return {
+        'title': _clip_title(subsection_data.get('title') or subsection_data.get('titre', 'Sous-section sans titre')),
+        'content': _join_content(subsection_data.get('content') or subsection_data.get('contenu', '')),
+        'order': _node_order(subsection_data, subsection_index),
+        'images': subsection_data.get('images', []),
+        'tables': subsection_data.get('tables', []),
+    }
+
+
+def _section_children(section_data):
+    return section_data.get('subsections') or section_data.get('sous_sections', [])
+
+
+def _adapt_chapter_sans_thematique(chapter_data):
+    return {
+        'title': chapter_data.get('titre', chapter_data.get('title', 'Chapitre sans titre')),
+        'content': chapter_data.get('contenu', chapter_data.get('content', '')),
+        'sections': chapter_data.get('sections', []),
+        'order': chapter_data.get('order')
+    }
+
+
+def _adapt_chapitre(chapitre_data):
+    # Ancienne structure ('chapitres' / 'titre_livre')
+    return {
+        'title': chapitre_data.get('titre', 'Chapitre sans titre'),
+        'content': chapitre_data.get('contenu', ''),
+        'sections': chapitre_data.get('sections', []),
+        'order': chapitre_data.get('order')
+    }
+
+
+def add_chapter_from_data(writer, chapter_data, thematique, chapter_index=None):
+    """
+    Ajoute au writer un chapitre et sa hiérarchie (sections, sous-sections), sans écrire en base
+
+    Args:
+        writer: HierarchyWriter du livre
+        chapter_data: Dictionnaire contenant les données du chapitre
+        thematique: Thématique parent (peut être None)
+        chapter_index: Index du chapitre dans le tableau (pour l'ordre)
+
+    Returns:
+        Chapter: L'instance du chapitre (non sauvegardée avant writer.write())
+    """
+    chapter = writer.add_chapter(thematique, **_chapter_fields(chapter_data, chapter_index))
+    for section_index, section_data in enumerate(chapter_data.get('sections', []), start=1):
+        section = writer.add_section(chapter, **_section_fields(section_data, section_index))
+        for subsection_index, subsection_data in enumerate(_section_children(section_data), start=1):
+            writer.add_subsection(section, **_subsection_fields(subsection_data, subsection_index))
+    return chapter
+
+
 def create_chapter_from_data(chapter_data, book, thematique, chapter_index=None):
     """
     Crée un chapitre et sa hiérarchie (sections, sous-sections) à partir des données
@@ -15,36 +208,10 @@ def create_chapter_from_data(chapter_data, book, thematique, chapter_index=None)
     Returns:
         Chapter: L'instance du chapitre créée
     """
-    print(f"  Création chapitre: {chapter_data.get('title', 'Sans titre')}")
-
-    # Prioriser l'ordre fourni dans le JSON; sinon utiliser un ordre auto-incrémenté (index, 1-based)
-    json_order = chapter_data.get('order')
-    order = json_order if json_order is not None else (chapter_index if chapter_index is not None else 0)
-
-    chapter_content = chapter_data.get('content', '')
-    if isinstance(chapter_content, list):
-        chapter_content = " ".join(str(x) for x in chapter_content)
-    chapter_title = chapter_data.get('title', 'Chapitre sans titre')
-    if not isinstance(chapter_title, str):
-        chapter_title = str(chapter_title)
-    if len(chapter_title) > 255:
-        chapter_title = chapter_title[:255]
-    chapter = Chapter.objects.create(
-        book=book,
-        thematique=thematique,
-        title=chapter_title,
-        content=chapter_content,
-        order=order,
-        is_intro=bool(chapter_data.get('is_intro', False)),
-    )
+    writer = HierarchyWriter(book)
+    chapter = add_chapter_from_data(writer, chapter_data, thematique, chapter_index)
+    writer.write()
     print(f"    ✓ Chapitre créé: {chapter.title} (ID: {chapter.id})")
-
-    # Créer les sections du chapitre
-    sections_data = chapter_data.get('sections', [])
-    print(f"    Nombre de sections à créer: {len(sections_data)}")
-    for section_index, section_data in enumerate(sections_data, start=1):
-        create_section_from_data(section_data, chapter, section_index)
-
     return chapter
 
 
@@ -60,38 +227,12 @@ def create_section_from_data(section_data, chapter, section_index=None):
     Returns:
         Section: L'instance de la section créée
     """
-    # Adapter les noms de champs pour l'ancienne structure
-    section_title = section_data.get('title') or section_data.get('titre', 'Section sans titre')
-    section_content = section_data.get('content') or section_data.get('contenu', '')
-    if isinstance(section_content, list):
-        section_content = " ".join(str(x) for x in section_content)
-    if not isinstance(section_title, str):
-        section_title = str(section_title)
-    if len(section_title) > 255:
-        section_title = section_title[:255]
-
-    print(f"    Création section: {section_title}")
-
-    # Prioriser l'ordre fourni dans le JSON; sinon utiliser un ordre auto-incrémenté (index, 1-based)
-    json_order = section_data.get('order')
-    order = json_order if json_order is not None else (section_index if section_index is not None else 0)
-
-    section = Section.objects.create(
-        chapter=chapter,
-        title=section_title,
-        content=section_content,
-        order=order,
-        images=section_data.get('images', []),
-        tables=section_data.get('tables', [])
-    )
+    writer = HierarchyWriter(chapter.book)
+    section = writer.add_section(chapter, **_section_fields(section_data, section_index))
+    for subsection_index, subsection_data in enumerate(_section_children(section_data), start=1):
+        writer.add_subsection(section, **_subsection_fields(subsection_data, subsection_index))
+    writer.write()
     print(f"      ✓ Section créée: {section.title} (ID: {section.id})")
-
-    # Créer les sous-sections de la section
-    subsections_data = section_data.get('subsections') or section_data.get('sous_sections', [])
-    print(f"      Nombre de sous-sections à créer: {len(subsections_data)}")
-    for subsection_index, subsection_data in enumerate(subsections_data, start=1):
-        create_subsection_from_data(subsection_data, section, subsection_index)
-
     return section
 
 
@@ -107,33 +248,62 @@ def create_subsection_from_data(subsection_data, section, subsection_index=None)
     Returns:
         Subsection: L'instance de la sous-section créée
     """
-    # Adapter les noms de champs pour l'ancienne structure
-    subsection_title = subsection_data.get('title') or subsection_data.get('titre', 'Sous-section sans titre')
-    subsection_content = subsection_data.get('content') or subsection_data.get('contenu', '')
-    if isinstance(subsection_content, list):
-        subsection_content = " ".join(str(x) for x in subsection_content)
-    if not isinstance(subsection_title, str):
-        subsection_title = str(subsection_title)
-    if len(subsection_title) > 255:
-        subsection_title = subsection_title[:255]
+    subsection = Subsection.objects.create(section=section, **_subsection_fields(subsection_data, subsection_index))
+    print(f"        ✓ Sous-section créée: {subsection.title} (ID: {subsection.id})")
+    return subsection
 
-    print(f"      Création sous-section: {subsection_title}")
 
-    # Prioriser l'ordre fourni dans le JSON; sinon utiliser un ordre auto-incrémenté (index, 1-based)
-    json_order = subsection_data.get('order')
-    order = json_order if json_order is not None else (subsection_index if subsection_index is not None else 0)
-
-    subsection = Subsection.objects.create(
-        section=section,
-        title=subsection_title,
-        content=subsection_content,
-        order=order,
-        images=subsection_data.get('images', []),
-        tables=subsection_data.get('tables', [])
-    )
-    print(f"        ✓ Sous-section créée: {subsection.title} (ID: {subsection.id})")
+def fill_writer_from_structure(writer, structured_data):
+    """
+    Ajoute au writer la hiérarchie décrite par un JSON structuré, sans l'écrire en base
+    (le titre du livre est mis à jour si le JSON en fournit un)
 
-    return subsection
+    Args:
+        writer: HierarchyWriter du livre
+        structured_data: Dictionnaire contenant la structure du livre
+    """
+    book = writer.book
+
+    # Nouvelle structure avec thematiques et/ou chapitres sans thématique
+    if 'thematiques' in structured_data or 'chapters_sans_thematique' in structured_data:
+        print("Utilisation de la structure 'thematiques' / 'chapters_sans_thematique'")
+
+        # Mettre à jour le titre du livre si présent
+        if 'titre_livre' in structured_data:
+            book.title = structured_data['titre_livre']
+            book.save(update_fields=['title'])
+            print(f"Titre du livre mis à jour: {book.title}")
+
+        # Thématiques
+        for thematique_data in structured_data.get('thematiques', []):
+            thematique = writer.add_thematique(
+                title=thematique_data.get('title', 'Thématique sans titre'),
+                description=thematique_data.get('description', '')
+            )
+
+            # Chapitres de la thématique
+            for chapter_index, chapter_data in enumerate(thematique_data.get('chapters', []), start=1):
+                add_chapter_from_data(writer, chapter_data, thematique, chapter_index)
+
+        # Chapitres sans thématique
+        for chapter_index, chapter_data in enumerate(structured_data.get('chapters_sans_thematique', []), start=1):
+            add_chapter_from_data(writer, _adapt_chapter_sans_thematique(chapter_data), None, chapter_index)
+
+    # Ancienne structure (chapitres directs)
+    elif 'chapitres' in structured_data or 'titre_livre' in structured_data:
+        print("Utilisation de la structure 'chapitres' / 'titre_livre'")
+
+        if 'titre_livre' in structured_data:
+            book.title = structured_data['titre_livre']
+            book.save(update_fields=['title'])
+            print(f"Titre du livre mis à jour: {book.title}")
+
+        for chapter_index, chapitre_data in enumerate(structured_data.get('chapitres', []), start=1):
+            add_chapter_from_data(writer, _adapt_chapitre(chapitre_data), None, chapter_index)
+
+    else:
+        print("Structure JSON non reconnue")
+        raise ValueError("Structure JSON non reconnue. Les clés attendues sont: 'thematiques'/'chapters_sans_thematique' ou 'chapitres'/'titre_livre'")
 
 
 def create_book_hierarchy_from_provided_json(book, structured_data):
@@ -153,68 +323,14 @@ def create_book_hierarchy_from_provided_json(book, structured_data):
     print(f"Clés racines reçues: {list(structured_data.keys())}")
 
     try:
+        writer = HierarchyWriter(book)
         with transaction.atomic():
-            # Nouvelle structure avec thematiques et/ou chapitres sans thématique
-            if 'thematiques' in structured_data or 'chapters_sans_thematique' in structured_data:
-                print("Utilisation de la structure 'thematiques' / 'chapters_sans_thematique'")
-
-                # Mettre à jour le titre du livre si présent
-                if 'titre_livre' in structured_data:
-                    book.title = structured_data['titre_livre']
-                    book.save(update_fields=['title'])
-                    print(f"Titre du livre mis à jour: {book.title}")
-
-                # Thématiques
-                for thematique_data in structured_data.get('thematiques', []):
-                    print(f"\n--- Création thématique: {thematique_data.get('title', 'Sans titre')} ---")
-                    thematique = Thematique.objects.create(
-                        book=book,
-                        title=thematique_data.get('title', 'Thématique sans titre'),
-                        description=thematique_data.get('description', '')
-                    )
-                    print(f"✓ Thématique créée: {thematique.title}")
-
-                    # Chapitres de la thématique
-                    for chapter_index, chapter_data in enumerate(thematique_data.get('chapters', []), start=1):
-                        create_chapter_from_data(chapter_data, book, thematique, chapter_index)
-
-                # Chapitres sans thématique
-                chapters_sans_thematique = structured_data.get('chapters_sans_thematique', [])
-                if chapters_sans_thematique:
-                    print(f"\n--- Création chapitres sans thématique ---")
-                    for chapter_index, chapter_data in enumerate(chapters_sans_thematique, start=1):
-                        chapter_data_adapted = {
-                            'title': chapter_data.get('titre', chapter_data.get('title', 'Chapitre sans titre')),
-                            'content': chapter_data.get('contenu', chapter_data.get('content', '')),
-                            'sections': chapter_data.get('sections', []),
-                            'order': chapter_data.get('order')
-                        }
-                        create_chapter_from_data(chapter_data_adapted, book, None, chapter_index)
-
-            # Ancienne structure (chapitres directs)
-            elif 'chapitres' in structured_data or 'titre_livre' in structured_data:
-                print("Utilisation de la structure 'chapitres' / 'titre_livre'")
-
-                if 'titre_livre' in structured_data:
-                    book.title = structured_data['titre_livre']
-                    book.save(update_fields=['title'])
-                    print(f"Titre du livre mis à jour: {book.title}")
-
-                chapitres_data = structured_data.get('chapitres', [])
-                print(f"Nombre de chapitres à créer: {len(chapitres_data)}")
-                for chapter_index, chapitre_data in enumerate(chapitres_data, start=1):
-                    chapter_data_adapted = {
-                        'title': chapitre_data.get('titre', 'Chapitre sans titre'),
-                        'content': chapitre_data.get('contenu', ''),
-                        'sections': chapitre_data.get('sections', []),
-                        'order': chapitre_data.get('order')
-                    }
-                    create_chapter_from_data(chapter_data_adapted, book, None, chapter_index)
-
-            else:
-                print("Structure JSON non reconnue")
-                raise ValueError("Structure JSON non reconnue. Les clés attendues sont: 'thematiques'/'chapters_sans_thematique' ou 'chapitres'/'titre_livre'")
-
+            fill_writer_from_structure(writer, structured_data)
+            counts = writer.write()
+            print(
+                f"Créés: {counts['thematiques']} thématique(s), {counts['chapters']} chapitre(s), "
+                f"{counts['sections']} section(s), {counts['subsections']} sous-section(s)"
+            )
             print(f"\n✓ HIÉRARCHIE CRÉÉE AVEC SUCCÈS (hierarchy.py) POUR LE LIVRE: {book.title}")
             return book
 
@@ -223,3 +339,161 @@ def create_book_hierarchy_from_provided_json(book, structured_data):
         print(f"✗ ERREUR LORS DE LA CRÉATION DE LA HIÉRARCHIE (hierarchy.py): {e}")
         print(f"Traceback: {traceback.format_exc()}")
         raise
+
+
+def reimport_book_hierarchy_from_provided_json(book, structured_data):
+    """
+    Ré-importe un JSON structuré dans un livre existant : seuls les nœuds ajoutés, modifiés ou
+    supprimés sont écrits (voir books/reimport.py), les autres gardent leurs QCM et traductions
+
+    Args:
+        book: Instance du modèle Book (hiérarchie existante)
+        structured_data: Dictionnaire contenant la nouvelle structure du livre
+
+    Returns:
+        dict: Nombre de nœuds créés / mis à jour / supprimés / inchangés par niveau
+    """
+    from .reimport import sync_hierarchy
+
+    print("\n=== RÉ-IMPORT HIÉRARCHIE (hierarchy.py) ===")
+    print(f"Livre: {book.title}")
+
+    writer = HierarchyWriter(book)
+    with transaction.atomic():
+        fill_writer_from_structure(writer, structured_data)
+        stats = sync_hierarchy(writer)
+    for key in ('created', 'updated', 'deleted', 'unchanged'):
+        print(f"{key}: {stats[key]}")
+    print(f"Traductions à mettre à jour: {stats['stale_translations']}")
+    return stats
+
+
+class _MixedStructure(Exception):
+    """Le fichier mêle 'chapitres' (déjà écrits) et 'thematiques'/'chapters_sans_thematique'."""
+
+
+def _load_structure_file(json_file_path):
+    # Supporte les fichiers JSON avec BOM UTF-8 via 'utf-8-sig'
+    with open(json_file_path, 'r', encoding='utf-8-sig') as f:
+        structured_data = json.load(f)
+    # Normaliser la racine si c'est une liste (chapitres sans thématique)
+    if isinstance(structured_data, list):
+        structured_data = {'chapters_sans_thematique': structured_data}
+    return structured_data
+
+
+def create_book_hierarchy_from_json_file(book, json_file_path, reimport=False):
+    """
+    Crée la hiérarchie d'un livre à partir d'un fichier JSON de structure, lu en flux
+
+    Les chapitres sont lus un par un (ijson) et écrits par lots de HIERARCHY_COPY_MIN_ROWS objets :
+    la mémoire reste bornée par le plus gros chapitre plutôt que par le livre entier.
+    Mêmes règles que create_book_hierarchy_from_provided_json, qui sert de repli sans ijson ;
+    la racine peut aussi être une liste de chapitres et une clé 'title' renomme le livre.
+    En ré-import (diff avec la hiérarchie existante), le fichier est chargé en entier.
+
+    Args:
+        book: Instance du modèle Book
+        json_file_path: Chemin absolu du fichier JSON
+        reimport: si True, met à jour la hiérarchie existante au lieu de la créer
+
+    Returns:
+        Book: L'instance du livre mise à jour avec sa hiérarchie
+    """
+    from .json_stream import ijson
+
+    if ijson is not None and not reimport:
+        try:
+            return _create_hierarchy_from_stream(book, json_file_path)
+        except _MixedStructure:
+            print("Structure mixte 'chapitres' + 'thematiques' : chargement complet du fichier")
+
+    structured_data = _load_structure_file(json_file_path)
+    with transaction.atomic():
+        if isinstance(structured_data, dict) and structured_data.get('title'):
+            book.title = structured_data['title']
+            book.save(update_fields=['title'])
+        if reimport:
+            reimport_book_hierarchy_from_provided_json(book, structured_data)
+            return book
+        return create_book_hierarchy_from_provided_json(book, structured_data)
+
+
+def _create_hierarchy_from_stream(book, json_file_path):
+    from .json_stream import iter_structure
+
+    print("\n=== CRÉATION HIÉRARCHIE EN FLUX (hierarchy.py) ===")
+    print(f"Livre: {book.title}")
+    print(f"Fichier: {json_file_path}")
+
+    writer = HierarchyWriter(book)
+    flush_rows = max(1, getattr(settings, 'HIERARCHY_COPY_MIN_ROWS', 1000))
+    new_format = legacy_format = legacy_written = False
+    root_values = {}
+    thematique = None
+    chapter_indexes = {}
+
+    with transaction.atomic():
+        for kind, value in iter_structure(json_file_path):
+            if kind == 'root_list':
+                new_format = True
+            elif kind == 'root_key':
+                if value in ('thematiques', 'chapters_sans_thematique'):
+                    if legacy_written:
+                        raise _MixedStructure()
+                    new_format = True
+                elif value in ('chapitres', 'titre_livre'):
+                    legacy_format = True
+            elif kind == 'root_value':
+                root_values[value[0]] = value[1]
+            elif kind == 'thematique_start':
+                thematique = writer.add_thematique(title='Thématique sans titre', description='')
+                chapter_indexes['thematiques'] = 0
+            elif kind == 'thematique_value':
+                if value[0] in ('title', 'description'):
+                    setattr(thematique, value[0], value[1])
+            elif kind == 'thematique_end':
+                if thematique.pk is not None:
+                    # Déjà écrite avec un lot de chapitres : son titre peut être lu après eux
+                    Thematique.objects.filter(pk=thematique.pk).update(
+                        title=thematique.title, description=thematique.description
+                    )
+                thematique = None
+            elif kind == 'chapter':
+                container, chapter_data = value
+                if container == 'chapitres':
+                    # Ancienne structure, ignorée si la nouvelle est présente
+                    if new_format:
+                        continue
+                    legacy_written = True
+                    chapter_data, parent = _adapt_chapitre(chapter_data), None
+                elif container == 'thematiques':
+                    parent = thematique
+                else:
+                    chapter_data, parent = _adapt_chapter_sans_thematique(chapter_data), None
+                chapter_indexes[container] = chapter_indexes.get(container, 0) + 1
+                add_chapter_from_data(writer, chapter_data, parent, chapter_indexes[container])
+                if writer.pending() >= flush_rows:
+                    writer.write()
+
+        if not (new_format or legacy_format):
+            raise ValueError("Structure JSON non reconnue. Les clés attendues sont: 'thematiques'/'chapters_sans_thematique' ou 'chapitres'/'titre_livre'")
+
+        # 'titre_livre' l'emporte sur 'title'
+        title = book.title
+        if root_values.get('title'):
+            title = root_values['title']
+        if 'titre_livre' in root_values:
+            title = root_values['titre_livre']
+        if title != book.title:
+            book.title = title
+            book.save(update_fields=['title'])
+            print(f"Titre du livre mis à jour: {book.title}")
+
+        counts = writer.write()
+        print(
+            f"Créés: {counts['thematiques']} thématique(s), {counts['chapters']} chapitre(s), "
+            f"{counts['sections']} section(s), {counts['subsections']} sous-section(s)"
+        )
+        print(f"\n✓ HIÉRARCHIE CRÉÉE AVEC SUCCÈS (hierarchy.py) POUR LE LIVRE: {book.title}")
+        return book
@@ -0,0 +1,126 @@
+"""Réponses conditionnelles (ETag / If-None-Match) et Cache-Control des endpoints de lecture.
+
+L'ETag d'une réponse est calculé sans la construire, à partir :
+    - de la ligne Book concernée, dont content_version (incrémenté à chaque modification
+      du contenu, voir books/snapshots.py), published, created_by et les champs de
+      traitement
+    - de l'utilisateur et de son rôle (les droits de lecture en dépendent)
+    - de la requête (chemin, paramètres, format demandé)
+Si le client renvoie cet ETag (If-None-Match), la réponse est un 304 sans corps : ni
+sérialisation de l'arbre du livre ni transfert.
+
+Cache-Control : settings.BOOK_READ_CACHE_CONTROL ('private, no-cache' par défaut : le
+navigateur / l'application garde la réponse et la revalide à chaque ouverture).
+"""
+import hashlib
+import re
+
+from django.conf import settings
+from django.http import HttpResponseNotModified, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from django.utils.text import compress_sequence
+from rest_framework.response import Response
+
+from .models import Book
+
+_BOOK_COLUMNS = tuple(f.attname for f in Book._meta.concrete_fields)
+
+accepts_gzip = re.compile(r"\bgzip\b")
+
+
+def _role(user):
+    return getattr(getattr(user, 'profile', user), 'role_name', None) or getattr(user, 'role_name', None)
+
+
+def book_etag(request, books, *extra) -> str:
+    """ETag (faible) d'une réponse qui ne dépend que des livres `books` (instances ou dicts)."""
+    h = hashlib.sha1()
+    for book in books:
+        if isinstance(book, dict):
+            values = tuple(book[c] for c in _BOOK_COLUMNS)
+        else:
+            values = tuple(getattr(book, c) for c in _BOOK_COLUMNS)
+        h.update(repr(values).encode('utf-8'))
+    user = request.user
+    h.update(repr((
+        user.pk, _role(user), request.get_full_path(), request.META.get('HTTP_ACCEPT', ''), extra,
+    )).encode('utf-8'))
+    return f'W/"{h.hexdigest()[:24]}"'
+
+
+def not_modified(request, etag) -> bool:
+    return etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+
+
+def patch_read_cache(response, vary=('Accept', 'Authorization')):
+    """En-têtes de cache des endpoints de lecture (réponses 200 / 304)."""
+    response['Cache-Control'] = getattr(settings, 'BOOK_READ_CACHE_CONTROL', 'private, no-cache')
+    patch_vary_headers(response, vary)
+    return response
+
+
+def stream_json_response(request, chunks):
+    """Réponse JSON produite au fil de `chunks` (bytes), compressée en gzip si le client l'accepte."""
+    if accepts_gzip.search(request.META.get('HTTP_ACCEPT_ENCODING', '')):
+        response = StreamingHttpResponse(compress_sequence(chunks), content_type='application/json')
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = StreamingHttpResponse(chunks, content_type='application/json')
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+def conditional_response(request, etag, build):
+    """304 si le client a déjà la version `etag`, sinon la réponse de build() avec son ETag."""
+    if not_modified(request, etag):
+        response = HttpResponseNotModified()
+    else:
+        response = build()
+    if response.status_code in (200, 304):
+        response['ETag'] = etag
+        patch_read_cache(response)
+    return response
+
+
+class ConditionalReadMixin:
+    """list / retrieve conditionnels pour les viewsets imbriqués sous /books/<book_pk>/.
+
+    Permissions, droits sur le livre parent et existence de l'objet sont vérifiés avant
+    de comparer l'ETag : un 304 n'est jamais renvoyé à la place d'un 403 / 404.
+    """
+
+    def get_etag_book_id(self):
+        return self.kwargs.get('book_pk') or self.kwargs.get('book_id')
+
+    def get_etag_book_queryset(self):
+        """Livres dont l'utilisateur peut lire l'arbre (mêmes règles que get_queryset des viewsets)."""
+        user = self.request.user
+        qs = Book.objects.all()
+        if _role(user) not in ('admin', 'manager'):
+            qs = qs.filter(created_by=user)
+        return qs
+
+    def get_etag_book(self):
+        """Colonnes du livre parent visible par l'utilisateur, ou None."""
+        book_id = self.get_etag_book_id()
+        if not str(book_id or '').isdigit():
+            return None
+        return self.get_etag_book_queryset().filter(pk=book_id).values(*_BOOK_COLUMNS).first()
+
+    def list(self, request, *args, **kwargs):
+        build = lambda: super(ConditionalReadMixin, self).list(request, *args, **kwargs)
+        self.check_permissions(request)
+        book = self.get_etag_book()
+        if book is None:
+            return build()
+        return conditional_response(request, book_etag(request, [book], 'list'), build)
+
+    def retrieve(self, request, *args, **kwargs):
+        # get_object() : 404 / permissions objet avant tout 304
+        instance = self.get_object()
+        build = lambda: Response(self.get_serializer(instance).data)
+        book = self.get_etag_book()
+        if book is None:
+            return build()
+        return conditional_response(request, book_etag(request, [book], 'retrieve'), build)
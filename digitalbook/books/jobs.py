@@ -0,0 +1,249 @@
+"""Exécution des tâches de fond (traitement des livres) derrière un backend configurable.
+
+BOOK_JOB_BACKEND (settings) :
+    'thread'  pool de threads du processus web (historique, non durable)
+    'db'      file durable en base (BookJob), consommée par `manage.py run_book_worker`
+    'celery'  tâche Celery books.tasks.process_book_task
+
+submit(..., unique=True) ne crée pas de nouvelle tâche si la même (tâche, livre) attend
+déjà son exécution (ex: reconstruction des snapshots après une rafale de modifications).
+"""
+import os
+import socket
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Optional
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .json_stream import ijson
+from .models import BookJob, JobStatus
+
+# Source introuvable ou illisible, JSON invalide ou de structure inconnue : un nouvel
+# essai échouerait de la même façon
+NON_RETRYABLE_ERRORS = (FileNotFoundError, ValueError, KeyError, TypeError) + (
+    (ijson.JSONError,) if ijson is not None else ()
+)
+
+
+class JobFailed(Exception):
+    """Échec définitif d'une tâche : elle n'est pas remise en file."""
+
+
+def _process_book(book_id, json_structure_file_rel=None, generate_qcm=True, nb_questions_per_chapter=None,
+                  reimport=False):
+    from .book_processing import process_book_sync
+
+    try:
+        process_book_sync(
+            book_id, json_structure_file_rel, generate_qcm, nb_questions_per_chapter, reimport,
+            raise_errors=True,
+        )
+    except NON_RETRYABLE_ERRORS as e:
+        # Le livre est déjà marqué 'failed' par process_book_sync
+        raise JobFailed(f"{e.__class__.__name__}: {e}") from e
+
+
+def _build_book_snapshots(book_id):
+    from .snapshots import rebuild_book_snapshots
+
+    rebuild_book_snapshots(book_id)
+
+
+# Tâches connues : nom -> (fonction, file par défaut)
+TASKS = {
+    'process_book': (_process_book, 'import'),
+    'build_book_snapshots': (_build_book_snapshots, 'snapshots'),
+}
+
+
+def run_task(task: str, **kwargs):
+    func, _queue = TASKS[task]
+    return func(**kwargs)
+
+
+def queue_concurrency(queue: str) -> int:
+    """Nombre de tâches simultanées pour une file (settings.BOOK_JOB_QUEUES, défaut 1)."""
+    try:
+        return max(1, int(getattr(settings, 'BOOK_JOB_QUEUES', {}).get(queue, 1)))
+    except (TypeError, ValueError):
+        return 1
+
+
+class ThreadJobBackend:
+    """Pools de threads dans le processus web (un par file) : les tâches sont perdues au redémarrage."""
+
+    def __init__(self):
+        self._executors = {}
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def _executor(self, queue: str) -> ThreadPoolExecutor:
+        # Un pool par file, dimensionné comme run_book_worker : une reconstruction de
+        # snapshots n'attend pas derrière les imports de PDF
+        with self._lock:
+            executor = self._executors.get(queue)
+            if executor is None:
+                executor = ThreadPoolExecutor(
+                    max_workers=queue_concurrency(queue), thread_name_prefix=f"book-worker-{queue}",
+                )
+                self._executors[queue] = executor
+            return executor
+
+    def submit(self, task: str, book_id: Optional[int] = None, queue: Optional[str] = None,
+               unique: bool = False, **kwargs) -> None:
+        key = (task, book_id) if unique else None
+        if key is not None:
+            with self._lock:
+                if key in self._pending:
+                    return
+                self._pending.add(key)
+        if book_id is not None:
+            kwargs['book_id'] = book_id
+        self._executor(queue or TASKS[task][1]).submit(self._run_logged, task, kwargs, key)
+
+    def _run_logged(self, task, kwargs, key):
+        if key is not None:
+            # Les demandes arrivées pendant l'exécution relancent une tâche
+            with self._lock:
+                self._pending.discard(key)
+        try:
+            run_task(task, **kwargs)
+        except Exception as e:
+            print(f"[jobs] {task} failed: {e}")
+
+
+class DatabaseJobBackend:
+    """File durable : une ligne BookJob par tâche, traitée par run_book_worker."""
+
+    def submit(self, task: str, book_id: Optional[int] = None, queue: Optional[str] = None,
+               unique: bool = False, **kwargs) -> BookJob:
+        if unique:
+            waiting = BookJob.objects.filter(task=task, book_id=book_id, status=JobStatus.QUEUED).first()
+            if waiting is not None:
+                return waiting
+        if book_id is not None:
+            kwargs['book_id'] = book_id
+        return BookJob.objects.create(
+            queue=queue or TASKS[task][1],
+            task=task,
+            book_id=book_id,
+            kwargs=kwargs,
+            max_attempts=getattr(settings, 'BOOK_JOB_MAX_ATTEMPTS', 3),
+        )
+
+
+class CeleryJobBackend:
+    def submit(self, task: str, book_id: Optional[int] = None, unique: bool = False, **kwargs) -> None:
+        # unique : sans effet, Celery ne permet pas de consulter simplement la file
+        from .tasks import process_book_task, run_book_job
+
+        if task not in TASKS:
+            raise ValueError(f"Tâche Celery inconnue: {task}")
+        if task == 'process_book':
+            process_book_task.delay(book_id, **kwargs)
+        else:
+            if book_id is not None:
+                kwargs['book_id'] = book_id
+            run_book_job.delay(task, kwargs)
+
+
+_BACKENDS = {
+    'thread': ThreadJobBackend,
+    'db': DatabaseJobBackend,
+    'celery': CeleryJobBackend,
+}
+_backend = None
+
+
+def get_job_backend():
+    global _backend
+    if _backend is None:
+        name = getattr(settings, 'BOOK_JOB_BACKEND', 'thread')
+        if name not in _BACKENDS:
+            raise ValueError(f"BOOK_JOB_BACKEND inconnu: {name}")
+        _backend = _BACKENDS[name]()
+    return _backend
+
+
+# --- Côté worker (file en base) -------------------------------------------------
+
+def worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def claim_job(queue: str, locked_by: str) -> Optional[BookJob]:
+    """Réserve la prochaine tâche prête de la file, ou None.
+
+    SELECT ... FOR UPDATE SKIP LOCKED sur PostgreSQL ; la mise à jour conditionnelle
+    sur le statut garantit aussi qu'un seul worker l'obtient sur les bases sans verrous.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        job = (
+            BookJob.objects.select_for_update(skip_locked=True)
+            .filter(queue=queue, status=JobStatus.QUEUED, run_after__lte=now)
+            .order_by('run_after', 'id')
+            .first()
+        )
+        if job is None:
+            return None
+        claimed = BookJob.objects.filter(id=job.id, status=JobStatus.QUEUED).update(
+            status=JobStatus.RUNNING,
+            locked_by=locked_by,
+            locked_at=now,
+            attempts=job.attempts + 1,
+        )
+    if not claimed:
+        return None
+    job.refresh_from_db()
+    return job
+
+
+def execute_job(job: BookJob) -> None:
+    """Exécute une tâche réservée puis la marque terminée, à réessayer ou en échec."""
+    try:
+        run_task(job.task, **(job.kwargs or {}))
+    except Exception as e:
+        error = f"{e}\n{traceback.format_exc()}"
+        if job.attempts < job.max_attempts and not isinstance(e, JobFailed):
+            # Réessai avec délai croissant ; les checkpoints évitent de tout refaire
+            delay = timedelta(seconds=30 * (2 ** (job.attempts - 1)))
+            BookJob.objects.filter(id=job.id).update(
+                status=JobStatus.QUEUED, run_after=timezone.now() + delay,
+                locked_by=None, locked_at=None, last_error=error,
+            )
+            print(f"[jobs] {job} failed (attempt {job.attempts}/{job.max_attempts}), retry in {delay}: {e}")
+        else:
+            BookJob.objects.filter(id=job.id).update(
+                status=JobStatus.FAILED, finished_at=timezone.now(), last_error=error,
+            )
+            print(f"[jobs] {job} failed permanently: {e}")
+        return
+    BookJob.objects.filter(id=job.id).update(status=JobStatus.DONE, finished_at=timezone.now())
+
+
+def heartbeat(job_ids) -> None:
+    if job_ids:
+        BookJob.objects.filter(id__in=list(job_ids), status=JobStatus.RUNNING).update(locked_at=timezone.now())
+
+
+def requeue_stale_jobs(queue: str, stale_after: timedelta) -> int:
+    """Remet en file les tâches 'running' dont le worker ne donne plus signe de vie.
+
+    Une tâche qui a déjà épuisé ses essais passe en échec au lieu d'être relancée.
+    """
+    stale = BookJob.objects.filter(
+        queue=queue, status=JobStatus.RUNNING, locked_at__lt=timezone.now() - stale_after,
+    )
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status=JobStatus.FAILED, finished_at=timezone.now(), last_error='worker lost',
+    )
+    return stale.filter(attempts__lt=F('max_attempts')).update(
+        status=JobStatus.QUEUED, locked_by=None, locked_at=None,
+    )
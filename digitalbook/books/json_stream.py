@@ -0,0 +1,81 @@
+"""Lecture en flux du JSON de structure d'un livre (fichier json_structure_file).
+
+iter_structure() parcourt le fichier avec ijson sans le charger en entier : seuls le
+chapitre en cours et les valeurs scalaires de la racine / de la thématique courante
+sont en mémoire. Événements produits, dans l'ordre du fichier :
+
+    ('root_list', None)                  la racine est une liste de chapitres
+    ('root_key', key)                    clé de la racine
+    ('root_value', (key, value))         valeur scalaire de la racine (titre_livre, title...)
+    ('thematique_start', None)
+    ('thematique_value', (key, value))   valeur scalaire de la thématique (title, description)
+    ('chapter', (container, chapter))    chapitre complet ; container : 'thematiques',
+                                         'chapters_sans_thematique', 'chapitres' ou 'item'
+                                         (racine liste)
+    ('thematique_end', None)
+"""
+import codecs
+
+try:
+    import ijson
+except ImportError:  # dépendance optionnelle : hierarchy.py se replie sur json.load
+    ijson = None
+
+_CHAPTER_PREFIXES = {
+    'thematiques.item.chapters.item': 'thematiques',
+    'chapters_sans_thematique.item': 'chapters_sans_thematique',
+    'chapitres.item': 'chapitres',
+}
+_SCALARS = frozenset(('null', 'boolean', 'integer', 'double', 'number', 'string'))
+_STARTS = ('start_map', 'start_array')
+_ENDS = ('end_map', 'end_array')
+
+
+def _build(event, value, events):
+    """Reconstruit la valeur (objet/liste) qui commence par l'événement courant."""
+    builder = ijson.ObjectBuilder()
+    builder.event(event, value)
+    depth = 1
+    for _prefix, event, value in events:
+        builder.event(event, value)
+        if event in _STARTS:
+            depth += 1
+        elif event in _ENDS:
+            depth -= 1
+            if depth == 0:
+                break
+    return builder.value
+
+
+def iter_structure(path):
+    with open(path, 'rb') as f:
+        # Supporte les fichiers JSON avec BOM UTF-8
+        if f.read(len(codecs.BOM_UTF8)) != codecs.BOM_UTF8:
+            f.seek(0)
+        events = ijson.parse(f, use_float=True)
+        root_list = False
+        for prefix, event, value in events:
+            if prefix == '':
+                if event == 'start_array':
+                    root_list = True
+                    yield ('root_list', None)
+                elif event == 'map_key':
+                    yield ('root_key', value)
+                continue
+
+            container = 'item' if (root_list and prefix == 'item') else _CHAPTER_PREFIXES.get(prefix)
+            if container is not None:
+                if event in _STARTS:
+                    yield ('chapter', (container, _build(event, value, events)))
+                elif event in _SCALARS:
+                    yield ('chapter', (container, value))
+            elif prefix == 'thematiques.item':
+                if event == 'start_map':
+                    yield ('thematique_start', None)
+                elif event == 'end_map':
+                    yield ('thematique_end', None)
+            elif event in _SCALARS and not root_list:
+                if '.' not in prefix:
+                    yield ('root_value', (prefix, value))
+                elif prefix.startswith('thematiques.item.') and prefix.count('.') == 2:
+                    yield ('thematique_value', (prefix.rsplit('.', 1)[1], value))
@@ -0,0 +1,144 @@
+import contextlib
+import io
+import json
+import os
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from books.hierarchy import create_book_hierarchy_from_provided_json
+from books.models import Book
+from books.translation import (
+    TRANSLATION_BACKENDS,
+    FakeTranslationBackend,
+    LibreTranslateClient,
+    translate_book_sync,
+)
+from books.translation_memory import TranslationMemory, clear_cache
+
+
+class Command(BaseCommand):
+    help = (
+        "Mesure le débit de translate_book_sync sur un livre de test importé depuis un JSON "
+        "(scripts/*.json) : segments/s, requêtes au moteur, taux de réussite de la mémoire de "
+        "traduction, requêtes SQL. Tout est annulé à la fin sauf --keep."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--json-path",
+            type=str,
+            default=str(Path(settings.BASE_DIR).parent / "scripts" / "nsl_rigging_lifting_handbook.json"),
+            help="Structure JSON du livre de test (format thematiques / chapters_sans_thematique)",
+        )
+        parser.add_argument(
+            "--engine",
+            choices=sorted(TRANSLATION_BACKENDS),
+            default="fake",
+            help="Moteur de traduction (défaut: fake, sans réseau)",
+        )
+        parser.add_argument("--latency", type=float, default=0.05, help="fake : durée (s) de chaque requête")
+        parser.add_argument("--error-rate", type=float, default=0.0, help="fake : probabilité d'échec d'une requête")
+        parser.add_argument("--concurrency", type=int, default=None, help="Requêtes simultanées au moteur")
+        parser.add_argument("--batch-nodes", type=int, default=None, help="Nœuds par lot (BOOK_TRANSLATION_BATCH_NODES)")
+        parser.add_argument("--batch-segments", type=int, default=None, help="Segments par requête au moteur")
+        parser.add_argument("--source", type=str, default="fr", help="Langue source du livre de test")
+        parser.add_argument("--targets", type=str, default="en,pt", help="Langues cibles, séparées par des virgules")
+        parser.add_argument(
+            "--runs",
+            type=int,
+            default=2,
+            help="Nombre d'exécutions, chacune sur un nouveau livre (les suivantes profitent de la mémoire)",
+        )
+        parser.add_argument(
+            "--keep",
+            action="store_true",
+            help="Conserver les livres, traductions et entrées de mémoire créés",
+        )
+
+    def _backend(self, options):
+        if options["engine"] == "fake":
+            kwargs = {}
+            if options["concurrency"]:
+                kwargs["max_concurrency"] = options["concurrency"]
+            backend = FakeTranslationBackend(latency=options["latency"], error_rate=options["error_rate"], **kwargs)
+        elif options["engine"] == "libretranslate":
+            backend = LibreTranslateClient(
+                os.getenv("LIBRETRANSLATE_URL", "http://localhost:5000"),
+                max_concurrency=options["concurrency"],
+            )
+        else:
+            backend = TRANSLATION_BACKENDS[options["engine"]]()
+        if options["batch_segments"]:
+            backend.max_segments = options["batch_segments"]
+        return backend
+
+    def handle(self, *args, **options):
+        json_path = Path(options["json_path"]).expanduser()
+        if not json_path.exists():
+            raise CommandError(f"Fichier JSON introuvable: {json_path}")
+        try:
+            data = json.loads(json_path.read_text(encoding="utf-8-sig"))
+        except Exception as e:
+            raise CommandError(f"Erreur de lecture JSON: {e}")
+        targets = [t.strip() for t in options["targets"].split(",") if t.strip()]
+
+        backend = self._backend(options)
+        memory = TranslationMemory(backend.engine)
+        # Le cache LRU du processus ne doit pas fausser la première exécution
+        clear_cache()
+        self.stdout.write(
+            f"Moteur: {backend.engine} (concurrence {backend.max_concurrency}, "
+            f"{backend.max_segments} segments/requête) ; fichier: {json_path.name}"
+        )
+
+        with transaction.atomic():
+            for run in range(1, options["runs"] + 1):
+                book = Book.objects.create(
+                    title=f"Benchmark traduction {run}",
+                    url=f"benchmark-traduction-{int(time.time())}-{run}",
+                    language=options["source"],
+                )
+                # Sortie de l'import (print) masquée
+                with contextlib.redirect_stdout(io.StringIO()):
+                    create_book_hierarchy_from_provided_json(book, data)
+                self._run(run, book, backend, memory, targets, options)
+
+            if not options["keep"]:
+                transaction.set_rollback(True)
+                self.stdout.write("Livres et traductions de test annulés (--keep pour les conserver).")
+
+    def _run(self, run, book, backend, memory, targets, options):
+        before = (backend.requests_sent, backend.segments_sent, backend.segments_failed)
+        hits_before = (memory.cache_hits, memory.db_hits, memory.misses)
+        stats = {}
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            saved = translate_book_sync(
+                book.id, targets, backend=backend, memory=memory,
+                batch_nodes=options["batch_nodes"], stats=stats,
+            )
+            elapsed = time.perf_counter() - start
+
+        requests_sent = backend.requests_sent - before[0]
+        segments_sent = backend.segments_sent - before[1]
+        failed = backend.segments_failed - before[2]
+        cache_hits = memory.cache_hits - hits_before[0]
+        db_hits = memory.db_hits - hits_before[1]
+        misses = memory.misses - hits_before[2]
+        lookups = cache_hits + db_hits + misses
+        segments = stats.get("segments", 0)
+
+        self.stdout.write(self.style.SUCCESS(f"Exécution {run} : {saved} traduction(s) en {elapsed:.2f} s"))
+        self.stdout.write(f"  segments        : {segments} ({segments / elapsed if elapsed else 0:.1f}/s), "
+                          f"{stats.get('reused_segments', 0)} repris du nœud")
+        self.stdout.write(f"  requêtes moteur : {requests_sent} ({segments_sent} segments envoyés, {failed} en échec)")
+        self.stdout.write(
+            f"  mémoire         : {(cache_hits + db_hits) / lookups if lookups else 0:.1%} "
+            f"(cache {cache_hits}, base {db_hits}, absents {misses})"
+        )
+        self.stdout.write(f"  requêtes SQL    : {len(queries)}")
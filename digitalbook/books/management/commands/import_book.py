@@ -5,7 +5,9 @@ from django.core.management.base import BaseCommand, CommandError
 from django.contrib.auth import get_user_model
 from django.utils.text import slugify
 
-from books.models import Book, Chapter, Section, Subsection
+from books.hierarchy import HierarchyWriter
+from books.models import Book
+from books.reimport import sync_hierarchy
 
 
 class Command(BaseCommand):
@@ -41,6 +43,12 @@ class Command(BaseCommand):
             action="store_true",
             help="Remplacer (supprimer) un livre existant avec le même slug/titre avant import",
         )
+        parser.add_argument(
+            "--update",
+            action="store_true",
+            help="Mettre à jour le livre existant (même slug/titre) par différence, en conservant "
+                 "les nœuds inchangés, leurs QCM et traductions",
+        )
         parser.add_argument(
             "--dry-run",
             action="store_true",
@@ -61,7 +69,10 @@ class Command(BaseCommand):
         title = options["title"].strip()
         slug = options["url"].strip() if options["url"] else slugify(title)
         replace = options["replace"]
+        update = options["update"]
         dry_run = options["dry_run"]
+        if replace and update:
+            raise CommandError("--replace et --update sont incompatibles.")
 
         # Résolution du créateur (optionnel)
         created_by = None
@@ -75,8 +86,13 @@ class Command(BaseCommand):
 
         # Stratégie de remplacement
         existing_qs = Book.objects.filter(title=title) | Book.objects.filter(url=slug)
+        existing_book = None
         if existing_qs.exists():
-            if replace:
+            if update:
+                if existing_qs.count() > 1:
+                    raise CommandError("Plusieurs livres correspondent à ce titre/url : précisez --url.")
+                existing_book = existing_qs.get()
+            elif replace:
                 if dry_run:
                     self.stdout.write(self.style.WARNING(f"[Dry-run] Suppression de {existing_qs.count()} livre(s) existant(s)"))
                 else:
@@ -84,11 +100,15 @@ class Command(BaseCommand):
                     self.stdout.write(self.style.SUCCESS("Livre(s) existant(s) supprimé(s)"))
             else:
                 raise CommandError(
-                    "Un livre avec ce titre/url existe déjà. Utilisez --replace pour le remplacer, ou --url pour un slug différent."
+                    "Un livre avec ce titre/url existe déjà. Utilisez --replace pour le remplacer, "
+                    "--update pour le mettre à jour, ou --url pour un slug différent."
                 )
 
         # Création du Book
-        if dry_run:
+        if existing_book is not None:
+            book = existing_book
+            self.stdout.write(f"Mise à jour du livre existant: {book.title} ({book.url})")
+        elif dry_run:
             self.stdout.write(f"[Dry-run] Création du livre: title='{title}', url='{slug}'")
             book = None  # placeholder
         else:
@@ -101,6 +121,8 @@ class Command(BaseCommand):
         total_subsections = 0
 
         chapters = data.get("chapters", [])
+        # Les objets sont accumulés puis écrits niveau par niveau (bulk_create) à la fin
+        writer = None if dry_run else HierarchyWriter(book)
 
         def create_section(chapter_obj, section_payload, order_idx):
             nonlocal total_sections, total_subsections
@@ -113,8 +135,8 @@ class Command(BaseCommand):
                 self.stdout.write(f"[Dry-run]  - Section[{order_idx}] '{sec_title}' (images={len(sec_images)}, tables={len(sec_tables)})")
                 section = None
             else:
-                section = Section.objects.create(
-                    chapter=chapter_obj,
+                section = writer.add_section(
+                    chapter_obj,
                     title=sec_title,
                     content=sec_content,
                     order=order_idx,
@@ -133,8 +155,8 @@ class Command(BaseCommand):
                 if dry_run:
                     self.stdout.write(f"[Dry-run]     * Subsection[{sub_idx}] '{sub_title}' (images={len(sub_images)}, tables={len(sub_tables)})")
                 else:
-                    Subsection.objects.create(
-                        section=section,
+                    writer.add_subsection(
+                        section,
                         title=sub_title,
                         content=sub_content,
                         order=sub_idx,
@@ -151,8 +173,7 @@ class Command(BaseCommand):
                 self.stdout.write(f"[Dry-run] Chapitre[{chap_idx}] '{chap_title}'")
                 chapter_obj = None
             else:
-                chapter_obj = Chapter.objects.create(
-                    book=book,
+                chapter_obj = writer.add_chapter(
                     title=chap_title,
                     content=chap_content,
                     order=chap_idx,
@@ -166,6 +187,14 @@ class Command(BaseCommand):
             # Certains fichiers peuvent placer des sections directement au même niveau (au cas où)
             # Si chap contient des clés de type section (rare), on peut les traiter ici si nécessaire.
 
+        if writer is not None and existing_book is not None:
+            stats = sync_hierarchy(writer)
+            for key in ("created", "updated", "deleted", "unchanged"):
+                self.stdout.write(f"{key}: {stats[key]}")
+            self.stdout.write(f"Traductions à mettre à jour: {stats['stale_translations']}")
+        elif writer is not None:
+            writer.write()
+
         self.stdout.write(self.style.SUCCESS(
             f"Import terminé: {total_chapters} chapitre(s), {total_sections} section(s), {total_subsections} sous-section(s)."
         ))
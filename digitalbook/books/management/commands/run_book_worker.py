@@ -0,0 +1,103 @@
+import signal
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from books.jobs import (
+    claim_job,
+    execute_job,
+    heartbeat,
+    queue_concurrency,
+    requeue_stale_jobs,
+    worker_id,
+)
+
+
+def _execute_in_thread(job):
+    # Chaque thread a sa propre connexion : on la ferme pour ne pas en accumuler
+    try:
+        execute_job(job)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = "Consomme la file durable des traitements de livres (BOOK_JOB_BACKEND='db')."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--queue", type=str, default="import", help="File à consommer")
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=None,
+            help="Traitements simultanés (défaut: settings.BOOK_JOB_QUEUES[queue])",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=2.0,
+            help="Délai (s) entre deux recherches de tâches quand la file est vide",
+        )
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Traite les tâches prêtes puis s'arrête",
+        )
+
+    def handle(self, *args, **options):
+        queue = options["queue"]
+        concurrency = options["concurrency"] or queue_concurrency(queue)
+        poll = max(0.1, options["poll_interval"])
+        stale_after = timedelta(seconds=getattr(settings, "BOOK_JOB_STALE_SECONDS", 600))
+        me = worker_id()
+
+        stopping = False
+
+        def _stop(signum, frame):
+            nonlocal stopping
+            stopping = True
+            self.stdout.write("Arrêt demandé : fin des traitements en cours...")
+
+        signal.signal(signal.SIGTERM, _stop)
+
+        self.stdout.write(f"Worker {me} : file '{queue}', {concurrency} traitement(s) simultané(s)")
+        running = {}
+        last_maintenance = 0.0
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="book-job") as executor:
+            try:
+                while True:
+                    close_old_connections()
+                    now = time.monotonic()
+                    if now - last_maintenance >= stale_after.total_seconds() / 4:
+                        heartbeat(running.values())
+                        requeued = requeue_stale_jobs(queue, stale_after)
+                        if requeued:
+                            self.stdout.write(f"{requeued} tâche(s) abandonnée(s) remise(s) en file")
+                        last_maintenance = now
+
+                    claimed = False
+                    while not stopping and len(running) < concurrency:
+                        job = claim_job(queue, me)
+                        if job is None:
+                            break
+                        claimed = True
+                        self.stdout.write(f"Début {job}")
+                        running[executor.submit(_execute_in_thread, job)] = job.id
+
+                    if not running:
+                        if stopping or (options["once"] and not claimed):
+                            break
+                        time.sleep(poll)
+                        continue
+
+                    done, _ = wait(list(running), timeout=poll, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        job_id = running.pop(fut)
+                        self.stdout.write(f"Fin de la tâche #{job_id}")
+            except KeyboardInterrupt:
+                self.stdout.write("Interruption : attente des traitements en cours...")
+                heartbeat(running.values())
@@ -0,0 +1,143 @@
+"""Grammaire des balises du PDF balisé (algo_balise), compilée une seule fois.
+
+classify_line() range une ligne dans un type de marqueur en une passe : le
+premier caractère significatif choisit les quelques motifs qui peuvent
+s'appliquer, au lieu d'essayer toute la liste de re.match à chaque ligne.
+Les motifs sont ceux historiquement utilisés par parse_marked_pdf.
+
+    !! ... / !!/          zone ignorée (début / fin), puces autorisées devant
+    !!! ... / !!!/        zone de capture
+    ! Titre / !/          thématique (début / fin)
+    # / ## / ###          chapitre / section / sous-section
+    ##                    seul sur sa ligne (OCR) : la ligne suivante est une section
+    <table> <img> ...     régions typées (ouvrantes / fermantes)
+"""
+import re
+from typing import NamedTuple, Optional
+
+IGNORE_END = "ignore_end"
+IGNORE_START = "ignore_start"
+REGION = "region"
+TAG_OPEN = "tag_open"
+TAG_CLOSE = "tag_close"
+# "< /table>" (espace avant "/") : balise retirée du texte, mais qui n'ouvre ni ne ferme
+# de région de capture (seuls "<table>" et "</table>" le font)
+TAG_SPACED = "tag_spaced"
+THEME_END = "theme_end"
+THEME = "theme"
+CHAPTER = "chapter"
+SECTION = "section"
+SUBSECTION = "subsection"
+HASH_ONLY = "hash_only"
+TEXT = "text"
+
+_BANGS = str.maketrans({'！': '!', '﹗': '!', '︕': '!'})
+# Premiers caractères possibles d'une balise "!" (puces autorisées devant "!!")
+_BANG_HEADS = "-\u2022•▪·»!"
+
+_IGNORE_END_RE = re.compile(r'^\s*[\-\u2022•▪·»]*\s*!!\s*/\s*$')
+_IGNORE_START_RE = re.compile(r'^\s*[\-\u2022•▪·»]*\s*!!(?!/).*$')
+_REGION_END_RE = re.compile(r'^\s*!!!\s*/\s*$')
+_REGION_START_RE = re.compile(r'^\s*!!!(?!/).*$')
+_THEME_END_RE = re.compile(r'^\s*!\s*/\s*$')
+_THEME_RE = re.compile(r'^\s*!\s*(.+)$')
+_THEME_STRICT_RE = re.compile(r'^\s*!\s*[^!].*$')
+_TAG_RE = re.compile(r'^\s*<(?:(/)|\s*(/)?)\s*(table|img)\s*>\s*$', flags=re.IGNORECASE)
+_SUB_RE = re.compile(r'^\s*#{3,}\s*(.+)$')
+_SEC_RE = re.compile(r'^\s*##(?!#)\s*(.+)$')
+_CH_RE = re.compile(r'^\s*#(?!#)\s*(.+)$')
+_HASH_ONLY_RE = re.compile(r'^\s*##\s*$')
+_CH_NUM_RE = re.compile(r'^\s*\d{1,2}\s*[\.)]\s*(.+)$')
+_SEC_NUM_RE = re.compile(r'^\s*\d{1,2}\.\d+\s+(.+)$')
+_KEYWORD_RE = re.compile(r'^\s*(Appendix\s+[A-Z]|Glossary|Further\s+Reading)\b', flags=re.IGNORECASE)
+_WHOLE_LINE_RE = re.compile(r'^(.*)$')
+_FIG_CAPTION_RE = re.compile(r"^(?:fig(?:ure)?\.?)[\s\u00A0]*\d*\s*[:.-]?\s*.+$", flags=re.IGNORECASE)
+_TABLE_CAPTION_RE = re.compile(r"^(?:tableau|table)\s*\d*\s*[:.-]?\s*.+$", flags=re.IGNORECASE)
+_EMPHASIS_RE = re.compile(r"\*(.+?)\*")
+
+
+class LineToken(NamedTuple):
+    kind: str
+    # Titre brut (groupe capturé) pour THEME / CHAPTER / SECTION / SUBSECTION, ou nom du tag
+    title: Optional[str] = None
+    # Pour les lignes TEXT : titres candidats selon la position dans la page
+    ch_num: Optional[str] = None
+    sec_num: Optional[str] = None
+    keyword: Optional[str] = None
+    caption: bool = False
+    emphasis: bool = False
+
+
+def normalize_bangs(s: str) -> str:
+    """Ramène les points d'exclamation pleine chasse / petits au '!' ASCII."""
+    return s.translate(_BANGS)
+
+
+def classify_line(line: str) -> LineToken:
+    """Type de marqueur d'une ligne (déjà passée par normalize_ws)."""
+    marker = normalize_bangs(line)
+    head = marker.lstrip()
+    c = head[:1]
+    if c and c in _BANG_HEADS:
+        if _IGNORE_END_RE.match(marker):
+            return LineToken(IGNORE_END)
+        if _IGNORE_START_RE.match(marker):
+            return LineToken(IGNORE_START)
+        if c == '!':
+            if _REGION_END_RE.match(marker) or _REGION_START_RE.match(marker):
+                return LineToken(REGION)
+            if _THEME_END_RE.match(marker):
+                return LineToken(THEME_END)
+            m = _THEME_RE.match(marker)
+            if m:
+                return LineToken(THEME, m.group(1))
+    elif c == '<':
+        m = _TAG_RE.match(marker)
+        if m:
+            kind = TAG_CLOSE if m.group(1) else TAG_SPACED if m.group(2) else TAG_OPEN
+            return LineToken(kind, m.group(3).lower())
+    elif c == '#':
+        m = _SUB_RE.match(line)
+        if m:
+            return LineToken(SUBSECTION, m.group(1))
+        m = _SEC_RE.match(line)
+        if m:
+            return LineToken(SECTION, m.group(1))
+        m = _CH_RE.match(line)
+        if m:
+            return LineToken(CHAPTER, m.group(1))
+        if _HASH_ONLY_RE.fullmatch(line):
+            return LineToken(HASH_ONLY)
+    return _text_token(line, c)
+
+
+def _text_token(line: str, c: str) -> LineToken:
+    ch_num = sec_num = keyword = None
+    if c.isdigit():
+        m = _CH_NUM_RE.match(line)
+        ch_num = m.group(1) if m else None
+        m = _SEC_NUM_RE.match(line)
+        sec_num = m.group(1) if m else None
+    elif c.lower() in ('a', 'g', 'f') and _KEYWORD_RE.match(line):
+        m = _WHOLE_LINE_RE.match(line)
+        keyword = m.group(1) if m else None
+    first = line[:1].lower()
+    caption = bool(
+        (first == 'f' and _FIG_CAPTION_RE.match(line))
+        or (first == 't' and _TABLE_CAPTION_RE.match(line))
+    )
+    emphasis = '*' in line and _EMPHASIS_RE.search(line) is not None
+    return LineToken(TEXT, None, ch_num, sec_num, keyword, caption, emphasis)
+
+
+_STRUCTURAL_KINDS = frozenset((IGNORE_END, IGNORE_START, REGION, TAG_OPEN, TAG_CLOSE, TAG_SPACED))
+
+
+def is_structural_marker(text: str) -> bool:
+    """Vrai si le texte est une balise de structure (zones, thématique, tags typés)."""
+    marker = normalize_bangs(text).strip()
+    tok = classify_line(marker)
+    if tok.kind in _STRUCTURAL_KINDS:
+        return True
+    # Une thématique dont le titre commence directement par '!' n'est pas une balise
+    return tok.kind in (THEME, THEME_END) and _THEME_STRICT_RE.match(marker) is not None
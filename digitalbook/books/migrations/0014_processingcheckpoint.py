@@ -0,0 +1,31 @@
+# Generated by Django 5.1.15 on 2026-10-17 17:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0013_chapter_images_chapter_tables'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProcessingCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_sha256', models.CharField(db_index=True, max_length=64)),
+                ('parser_version', models.CharField(max_length=32)),
+                ('stage', models.CharField(choices=[('structure', 'Structure parsée'), ('assets', 'Assets extraits'), ('hierarchy', 'Hiérarchie créée'), ('qcm', 'QCM générés')], max_length=16)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('book', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='processing_checkpoints', to='books.book')),
+            ],
+            options={
+                'verbose_name': 'Checkpoint de traitement',
+                'verbose_name_plural': 'Checkpoints de traitement',
+                'unique_together': {('source_sha256', 'parser_version', 'stage', 'book')},
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.15 on 2026-10-17 18:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0015_bookjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='content_version',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Version du contenu'),
+        ),
+        migrations.CreateModel(
+            name='BookSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('content', 'Contenu (lecture)'), ('export', 'Export de structure')], max_length=16)),
+                ('lang', models.CharField(blank=True, default='', max_length=8)),
+                ('version', models.PositiveIntegerField()),
+                ('data', models.BinaryField()),
+                ('size', models.PositiveIntegerField(default=0, verbose_name='Taille non compressée')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='books.book')),
+            ],
+            options={
+                'verbose_name': 'Snapshot de livre',
+                'verbose_name_plural': 'Snapshots de livres',
+                'unique_together': {('book', 'kind', 'lang')},
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1.15 on 2026-10-17 18:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0016_book_content_version_booksnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TranslationMemoryEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_hash', models.CharField(max_length=64)),
+                ('source_lang', models.CharField(max_length=8)),
+                ('target_lang', models.CharField(max_length=8)),
+                ('engine', models.CharField(max_length=64)),
+                ('translated_text', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Entrée de mémoire de traduction',
+                'verbose_name_plural': 'Mémoire de traduction',
+                'unique_together': {('source_hash', 'source_lang', 'target_lang', 'engine')},
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.15 on 2026-10-17 18:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0017_translationmemoryentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sectiontranslation',
+            name='segments',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='subsectiontranslation',
+            name='segments',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
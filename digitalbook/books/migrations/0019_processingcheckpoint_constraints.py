@@ -0,0 +1,39 @@
+# Generated by Django 5.1.15 on 2026-10-17 18:32
+
+from django.db import migrations, models
+
+
+def drop_duplicate_content_checkpoints(apps, schema_editor):
+    # Doublons structure/assets (book vide) insérés par des imports concurrents :
+    # seul le plus récent est conservé
+    ProcessingCheckpoint = apps.get_model('books', 'ProcessingCheckpoint')
+    seen = set()
+    for cp in ProcessingCheckpoint.objects.filter(book__isnull=True).order_by('-updated_at', '-id'):
+        key = (cp.source_sha256, cp.parser_version, cp.stage)
+        if key in seen:
+            cp.delete()
+        else:
+            seen.add(key)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('books', '0018_translation_segments'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_content_checkpoints, migrations.RunPython.noop),
+        migrations.AlterUniqueTogether(
+            name='processingcheckpoint',
+            unique_together=set(),
+        ),
+        migrations.AddConstraint(
+            model_name='processingcheckpoint',
+            constraint=models.UniqueConstraint(condition=models.Q(('book__isnull', True)), fields=('source_sha256', 'parser_version', 'stage'), name='unique_content_checkpoint'),
+        ),
+        migrations.AddConstraint(
+            model_name='processingcheckpoint',
+            constraint=models.UniqueConstraint(condition=models.Q(('book__isnull', False)), fields=('source_sha256', 'parser_version', 'stage', 'book'), name='unique_book_checkpoint'),
+        ),
+    ]
@@ -43,6 +43,8 @@ class Book(models.Model):
     processing_error = models.TextField(null=True, blank=True, verbose_name="Erreur de traitement")
     processing_started_at = models.DateTimeField(null=True, blank=True, verbose_name="Début de traitement")
     processing_finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Fin de traitement")
+    # Incrémenté à chaque modification du contenu (books/snapshots.py) : version des snapshots / ETag
+    content_version = models.PositiveIntegerField(default=0, editable=False, verbose_name="Version du contenu")
     
     class Meta:
         verbose_name = "Livre"
@@ -52,6 +54,16 @@ class Book(models.Model):
     def __str__(self):
         return self.title
 
+    def changed_fields(self, names):
+        """Colonnes de `names` à passer à save(update_fields=...).
+
+        Pour les écritures d'une instance chargée plus tôt (API, admin) : content_version,
+        incrémenté en base par touch_book (UPDATE ... F()), n'est pas réécrit avec une valeur
+        périmée.
+        """
+        columns = {f.name for f in self._meta.concrete_fields if not f.primary_key}
+        return [name for name in names if name in columns and name != 'content_version']
+
 class Thematique(models.Model):
     """Modèle représentant une thématique qui peut contenir un ou plusieurs chapitres."""
     book = models.ForeignKey(
@@ -212,6 +224,8 @@ class SectionTranslation(models.Model):
     tables = models.JSONField(default=list, blank=True)
     status = models.CharField(max_length=16, choices=TranslationStatus.choices, default=TranslationStatus.PENDING)
     source_hash = models.CharField(max_length=64, blank=True, null=True)
+    # Traduction de chaque segment source (paragraphe, légende, cellule) par hash normalisé
+    segments = models.JSONField(default=dict, blank=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
@@ -227,7 +241,130 @@ class SubsectionTranslation(models.Model):
     tables = models.JSONField(default=list, blank=True)
     status = models.CharField(max_length=16, choices=TranslationStatus.choices, default=TranslationStatus.PENDING)
     source_hash = models.CharField(max_length=64, blank=True, null=True)
+    # Traduction de chaque segment source (paragraphe, légende, cellule) par hash normalisé
+    segments = models.JSONField(default=dict, blank=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ('subsection', 'lang')
+
+
+class ProcessingStage(models.TextChoices):
+    STRUCTURE = 'structure', 'Structure parsée'
+    ASSETS = 'assets', 'Assets extraits'
+    HIERARCHY = 'hierarchy', 'Hiérarchie créée'
+    QCM = 'qcm', 'QCM générés'
+
+
+class ProcessingCheckpoint(models.Model):
+    """Résultat d'une étape du traitement d'un livre, pour reprendre sans tout refaire.
+
+    Clé de contenu : SHA-256 du fichier source (PDF ou JSON) + version du parseur.
+    Les étapes structure/assets ne dépendent que du contenu (book vide, réutilisables
+    par tout livre importé du même PDF) ; hiérarchie/QCM sont propres à un livre.
+    """
+    source_sha256 = models.CharField(max_length=64, db_index=True)
+    parser_version = models.CharField(max_length=32)
+    stage = models.CharField(max_length=16, choices=ProcessingStage.choices)
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, null=True, blank=True, related_name='processing_checkpoints')
+    payload = models.JSONField(default=dict, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # Deux contraintes : book vide (structure/assets) ne compterait pas comme doublon
+        # dans une contrainte unique sous PostgreSQL (NULL distincts)
+        constraints = [
+            models.UniqueConstraint(
+                fields=['source_sha256', 'parser_version', 'stage'],
+                condition=models.Q(book__isnull=True),
+                name='unique_content_checkpoint',
+            ),
+            models.UniqueConstraint(
+                fields=['source_sha256', 'parser_version', 'stage', 'book'],
+                condition=models.Q(book__isnull=False),
+                name='unique_book_checkpoint',
+            ),
+        ]
+        verbose_name = "Checkpoint de traitement"
+        verbose_name_plural = "Checkpoints de traitement"
+
+    def __str__(self):
+        return f"{self.stage} {self.source_sha256[:12]} ({self.parser_version})"
+
+
+class JobStatus(models.TextChoices):
+    QUEUED = 'queued', 'Queued'
+    RUNNING = 'running', 'Running'
+    DONE = 'done', 'Done'
+    FAILED = 'failed', 'Failed'
+
+
+class BookJob(models.Model):
+    """Tâche de fond durable (file en base), consommée par `manage.py run_book_worker`."""
+    queue = models.CharField(max_length=32, default='import')
+    task = models.CharField(max_length=64)
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, null=True, blank=True, related_name='jobs')
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=16, choices=JobStatus.choices, default=JobStatus.QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=128, null=True, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['run_after', 'id']
+        indexes = [models.Index(fields=['queue', 'status', 'run_after'])]
+        verbose_name = "Tâche de fond"
+        verbose_name_plural = "Tâches de fond"
+
+    def __str__(self):
+        return f"{self.task} #{self.id} ({self.queue}, {self.status})"
+
+
+class SnapshotKind(models.TextChoices):
+    CONTENT = 'content', 'Contenu (lecture)'
+    EXPORT = 'export', 'Export de structure'
+
+
+class BookSnapshot(models.Model):
+    """JSON précalculé (gzip) d'un endpoint de lecture pour une langue et une version du livre."""
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='snapshots')
+    kind = models.CharField(max_length=16, choices=SnapshotKind.choices)
+    lang = models.CharField(max_length=8, blank=True, default='')
+    version = models.PositiveIntegerField()
+    data = models.BinaryField()
+    size = models.PositiveIntegerField(default=0, verbose_name="Taille non compressée")
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('book', 'kind', 'lang')
+        verbose_name = "Snapshot de livre"
+        verbose_name_plural = "Snapshots de livres"
+
+    def __str__(self):
+        return f"{self.book_id} {self.kind} {self.lang or '-'} v{self.version}"
+
+
+class TranslationMemoryEntry(models.Model):
+    """Segment déjà traduit, réutilisé d'un livre à l'autre (books/translation_memory.py).
+
+    source_hash : SHA-256 du segment source normalisé (espaces, placeholders masqués).
+    """
+    source_hash = models.CharField(max_length=64)
+    source_lang = models.CharField(max_length=8)
+    target_lang = models.CharField(max_length=8)
+    engine = models.CharField(max_length=64)
+    translated_text = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('source_hash', 'source_lang', 'target_lang', 'engine')
+        verbose_name = "Entrée de mémoire de traduction"
+        verbose_name_plural = "Mémoire de traduction"
+
+    def __str__(self):
+        return f"{self.source_lang}>{self.target_lang} {self.source_hash[:12]} ({self.engine})"
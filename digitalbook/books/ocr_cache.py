@@ -0,0 +1,154 @@
+"""Cache disque des résultats OCR (pytesseract), partagé entre traitements de livres.
+
+Clé : SHA-256 de l'image rendue de la page + langue + version de tesseract.
+Stockage : une base SQLite ; éviction LRU dès que la taille des textes dépasse
+OCR_CACHE_MAX_MB. La taille totale est tenue à jour dans une table d'une ligne
+(ocr_meta) et les dates de dernière lecture sont écrites par lots : ni put() ni get()
+ne parcourent la table. Le module ne dépend pas de Django : il est aussi utilisé
+depuis les processus d'extraction de algo_balise.
+
+Variables d'environnement :
+    OCR_CACHE_ENABLED  'false' pour désactiver le cache (défaut: true)
+    OCR_CACHE_PATH     chemin du fichier SQLite
+    OCR_CACHE_MAX_MB   taille maximale avant éviction (défaut: 256)
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+_DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".cache", "digitalbook", "ocr_cache.sqlite3")
+# Surcoût approximatif d'une ligne (clé + métadonnées), compté dans la taille du cache
+_ROW_OVERHEAD = 128
+# Lectures (last_used) mises en attente avant écriture : nombre max / délai max (s)
+_TOUCH_BATCH = 64
+_TOUCH_INTERVAL = 30.0
+
+
+def ocr_cache_key(pil_img, lang: str, engine_version: str) -> str:
+    """Clé de cache pour une image PIL rendue, une langue et une version de moteur."""
+    h = hashlib.sha256()
+    h.update(f"{pil_img.mode}|{pil_img.width}x{pil_img.height}|".encode("utf-8"))
+    h.update(pil_img.tobytes())
+    h.update(f"|{lang}|{engine_version}".encode("utf-8"))
+    return h.hexdigest()
+
+
+class OcrCache:
+    """Cache clé -> texte OCR dans SQLite, avec éviction des entrées les moins récemment lues."""
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Une connexion par thread et par processus (les workers d'extraction sont des processus)
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and getattr(self._local, "pid", None) == os.getpid():
+            return conn
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS ocr_results ("
+            " key TEXT PRIMARY KEY,"
+            " text TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ocr_results_last_used ON ocr_results (last_used)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS ocr_meta ("
+            " id INTEGER PRIMARY KEY CHECK (id = 1),"
+            " total_size INTEGER NOT NULL)"
+        )
+        # Cache créé par une version précédente : total calculé une seule fois
+        conn.execute(
+            "INSERT INTO ocr_meta (id, total_size)"
+            " SELECT 1, COALESCE(SUM(size), 0) FROM ocr_results"
+            " WHERE NOT EXISTS (SELECT 1 FROM ocr_meta)"
+        )
+        conn.commit()
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        self._local.touched = {}
+        self._local.last_flush = time.monotonic()
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        conn = self._connect()
+        row = conn.execute("SELECT text FROM ocr_results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        touched = self._local.touched
+        touched[key] = time.time()
+        if len(touched) >= _TOUCH_BATCH or time.monotonic() - self._local.last_flush >= _TOUCH_INTERVAL:
+            self._flush_touched(conn)
+        return row[0]
+
+    def _flush_touched(self, conn: sqlite3.Connection) -> None:
+        """Écrit les dates de lecture en attente (une transaction)."""
+        touched = self._local.touched
+        if touched:
+            conn.executemany(
+                "UPDATE ocr_results SET last_used = ? WHERE key = ?",
+                [(used, key) for key, used in touched.items()],
+            )
+            conn.commit()
+            touched.clear()
+        self._local.last_flush = time.monotonic()
+
+    def put(self, key: str, text: str) -> None:
+        conn = self._connect()
+        # Ordre LRU à jour avant une éventuelle éviction
+        self._flush_touched(conn)
+        size = len(text.encode("utf-8")) + _ROW_OVERHEAD
+        # Total ajusté avant le remplacement (ancienne taille de la clé), dans la même transaction
+        conn.execute(
+            "UPDATE ocr_meta SET total_size = total_size + ?"
+            " - COALESCE((SELECT size FROM ocr_results WHERE key = ?), 0) WHERE id = 1",
+            (size, key),
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO ocr_results (key, text, size, last_used) VALUES (?, ?, ?, ?)",
+            (key, text, size, time.time()),
+        )
+        self._evict(conn)
+        conn.commit()
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        total = conn.execute("SELECT total_size FROM ocr_meta WHERE id = 1").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        freed = 0
+        stale = []
+        for key, size in conn.execute("SELECT key, size FROM ocr_results ORDER BY last_used ASC"):
+            stale.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        conn.executemany("DELETE FROM ocr_results WHERE key = ?", stale)
+        conn.execute("UPDATE ocr_meta SET total_size = total_size - ? WHERE id = 1", (freed,))
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_ocr_cache() -> Optional[OcrCache]:
+    """Retourne le cache OCR du processus (None si désactivé)."""
+    global _cache
+    if os.getenv("OCR_CACHE_ENABLED", "true").lower() != "true":
+        return None
+    with _cache_lock:
+        if _cache is None:
+            try:
+                max_mb = float(os.getenv("OCR_CACHE_MAX_MB", "256"))
+            except ValueError:
+                max_mb = 256.0
+            _cache = OcrCache(os.getenv("OCR_CACHE_PATH", _DEFAULT_PATH), int(max_mb * 1024 * 1024))
+        return _cache
@@ -312,7 +312,7 @@ def parse_pdf_to_structured_json(pdf_path):
     
     return document
 
-def create_book_hierarchy_from_json(book, json_data):
+def create_book_hierarchy_from_json(book, json_data, reimport=False):
     """
     Crée la hiérarchie complète (chapitres, sections, sous-sections) à partir des données JSON
     et les relie au livre.
@@ -320,75 +320,49 @@ def create_book_hierarchy_from_json(book, json_data):
     Args:
         book: Instance du modèle Book
         json_data: Données structurées du PDF
+        reimport: si True, met à jour la hiérarchie existante par différence (books/reimport.py)
     
     Returns:
         Le livre avec sa hiérarchie complète
     """
-    from .models import Chapter, Section, Subsection
+    from .hierarchy import HierarchyWriter
     
     print(f"\n=== DÉBUT CRÉATION HIÉRARCHIE POUR LIVRE: {book.title} ===")
     print(f"Nombre de chapitres trouvés: {len(json_data.get('chapters', []))}")
     
-    total_chapters = 0
-    total_sections = 0
-    total_subsections = 0
-    
-    for i, chapter_data in enumerate(json_data.get('chapters', [])):
-        total_chapters += 1
-        print(f"\n--- Création Chapitre {i+1}: {chapter_data.get('title', 'Sans titre')} ---")
-        
-        # Créer le chapitre
-        try:
-            chapter = Chapter.objects.create(
-                book=book,
-                title=chapter_data.get('title', ''),
-                content=chapter_data.get('content', ''),
-                order=chapter_data.get('order', 0)
+    # Les titres sont tronqués à la taille du champ : une ligne en erreur ferait échouer tout le lot
+    writer = HierarchyWriter(book)
+    for chapter_data in json_data.get('chapters', []):
+        chapter = writer.add_chapter(
+            title=(chapter_data.get('title', '') or '')[:255],
+            content=chapter_data.get('content', ''),
+            order=chapter_data.get('order', 0)
+        )
+        for section_data in chapter_data.get('sections', []):
+            section = writer.add_section(
+                chapter,
+                title=(section_data.get('title', '') or '')[:255],
+                content=section_data.get('content', ''),
+                order=section_data.get('order', 0)
             )
-            print(f"✓ Chapitre créé avec ID: {chapter.id}")
-        except Exception as e:
-            print(f"✗ Erreur création chapitre: {e}")
-            continue
-        
-        # Créer les sections du chapitre
-        sections_count = len(chapter_data.get('sections', []))
-        print(f"Nombre de sections dans ce chapitre: {sections_count}")
-        
-        for j, section_data in enumerate(chapter_data.get('sections', [])):
-            total_sections += 1
-            print(f"  - Création Section {j+1}: {section_data.get('title', 'Sans titre')}")
-            
-            try:
-                section = Section.objects.create(
-                    chapter=chapter,
-                    title=section_data.get('title', ''),
-                    content=section_data.get('content', ''),
-                    order=section_data.get('order', 0)
+            for subsection_data in section_data.get('subsections', []):
+                writer.add_subsection(
+                    section,
+                    title=(subsection_data.get('title', '') or '')[:255],
+                    content=subsection_data.get('content', ''),
+                    order=subsection_data.get('order', 0)
                 )
-                print(f"    ✓ Section créée avec ID: {section.id}")
-            except Exception as e:
-                print(f"    ✗ Erreur création section: {e}")
-                continue
-            
-            # Créer les sous-sections de la section
-            subsections_count = len(section_data.get('subsections', []))
-            print(f"    Nombre de sous-sections dans cette section: {subsections_count}")
-            
-            for k, subsection_data in enumerate(section_data.get('subsections', [])):
-                total_subsections += 1
-                print(f"      * Création Sous-section {k+1}: {subsection_data.get('title', 'Sans titre')}")
-                
-                try:
-                    subsection = Subsection.objects.create(
-                        section=section,
-                        title=subsection_data.get('title', ''),
-                        content=subsection_data.get('content', ''),
-                        order=subsection_data.get('order', 0)
-                    )
-                    print(f"        ✓ Sous-section créée avec ID: {subsection.id}")
-                except Exception as e:
-                    print(f"        ✗ Erreur création sous-section: {e}")
-                    continue
+    
+    if reimport:
+        from .reimport import sync_hierarchy
+        stats = sync_hierarchy(writer)
+        print(f"Ré-import: {stats}")
+        return book
+
+    counts = writer.write()
+    total_chapters = counts['chapters']
+    total_sections = counts['sections']
+    total_subsections = counts['subsections']
     
     print(f"\n=== RÉSUMÉ CRÉATION HIÉRARCHIE ===")
     print(f"Livre: {book.title}")
@@ -0,0 +1,110 @@
+"""Insertion massive via COPY pour PostgreSQL (utilisée par hierarchy.HierarchyWriter).
+
+Pour chaque niveau de la hiérarchie (parents avant enfants) :
+    1. réserve les IDs dans la séquence de la table, en une requête
+       (les lignes enfants référencent ainsi leurs parents avant toute insertion)
+    2. envoie les lignes par COPY ... FROM STDIN (format texte) dans une table temporaire sans index
+    3. insère la table temporaire dans la table réelle en une seule requête INSERT ... SELECT
+
+Les objets ne reçoivent leurs IDs qu'une fois tout inséré : en cas d'erreur ils restent
+intacts et l'appelant peut se replier sur bulk_create.
+"""
+import io
+import json
+from datetime import date, datetime
+
+from django.db import models, transaction
+
+
+def _copy(cursor, sql, buf):
+    if hasattr(cursor, 'copy_expert'):
+        # psycopg2
+        cursor.copy_expert(sql, buf)
+    else:
+        # psycopg 3
+        with cursor.copy(sql) as copy:
+            copy.write(buf.getvalue())
+
+
+def reserve_ids(cursor, model, count):
+    """Réserve `count` IDs dans la séquence de la clé primaire, en ordre croissant."""
+    cursor.execute(
+        "SELECT nextval(pg_get_serial_sequence(%s, %s)) FROM generate_series(1, %s)",
+        [model._meta.db_table, model._meta.pk.column, count],
+    )
+    return sorted(r[0] for r in cursor.fetchall())
+
+
+_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+def _text(value) -> str:
+    """Valeur au format texte de COPY (\\N pour NULL)."""
+    if value is None:
+        return '\\N'
+    return str(value).translate(_ESCAPES)
+
+
+def _row(model, obj, reserved):
+    row = []
+    for field in model._meta.concrete_fields:
+        if field.primary_key:
+            value = reserved[id(obj)]
+        elif field.is_relation:
+            parent = field.get_cached_value(obj) if field.is_cached(obj) else None
+            if parent is None:
+                value = getattr(obj, field.attname)
+            else:
+                value = reserved.get(id(parent), parent.pk)
+        else:
+            value = field.pre_save(obj, add=True)
+            if isinstance(field, models.JSONField):
+                value = json.dumps(value, cls=field.encoder)
+            elif isinstance(value, (datetime, date)):
+                value = value.isoformat()
+        row.append(_text(value))
+    return '\t'.join(row) + '\n'
+
+
+def _copy_level(cursor, connection, model, objs, reserved):
+    qn = connection.ops.quote_name
+    table = qn(model._meta.db_table)
+    stage = qn(f"_copy_{model._meta.db_table}")
+    columns = ", ".join(qn(f.column) for f in model._meta.concrete_fields)
+
+    for obj, pk in zip(objs, reserve_ids(cursor, model, len(objs))):
+        reserved[id(obj)] = pk
+
+    buf = io.StringIO()
+    for obj in objs:
+        buf.write(_row(model, obj, reserved))
+    buf.seek(0)
+
+    cursor.execute(f"DROP TABLE IF EXISTS {stage}")
+    cursor.execute(f"CREATE TEMP TABLE {stage} (LIKE {table} INCLUDING DEFAULTS)")
+    _copy(cursor, f"COPY {stage} ({columns}) FROM STDIN", buf)
+    cursor.execute(
+        f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {stage} "
+        f"ORDER BY {qn(model._meta.pk.column)}"
+    )
+    cursor.execute(f"DROP TABLE {stage}")
+
+
+def copy_insert_levels(levels, connection) -> None:
+    """Insère [(model, objs), ...] niveau par niveau ; les parents doivent précéder leurs enfants."""
+    reserved = {}
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        for model, objs in levels:
+            if objs:
+                _copy_level(cursor, connection, model, objs, reserved)
+
+    # Tout est inséré : on renseigne IDs et clés étrangères des objets, comme bulk_create
+    for model, objs in levels:
+        relations = [f for f in model._meta.concrete_fields if f.is_relation]
+        for obj in objs:
+            obj.pk = reserved[id(obj)]
+            for field in relations:
+                if field.is_cached(obj):
+                    setattr(obj, field.name, field.get_cached_value(obj))
+            obj._state.adding = False
+            obj._state.db = connection.alias
@@ -0,0 +1,127 @@
+"""Projection des réponses de l'arbre d'un livre : ?fields= et ?depth=.
+
+    ?fields=id,title,order   champs conservés à chaque niveau (id toujours inclus)
+    ?depth=N                 niveaux imbriqués renvoyés sous la ressource demandée
+                             (livre > chapitres > sections > sous-sections ; 0 = aucun)
+
+Ex: /api/books/12/?fields=id,title,order&depth=3 renvoie la table des matières sans le
+texte. Les colonnes non demandées (content, images, tables...) ne sont pas lues en base
+(.only()) et chaque niveau renvoyé est préchargé en une requête. Le contenu d'un nœud
+se charge ensuite à la demande : /api/books/<id>/nodes/<type>/<node_id>/.
+"""
+from django.db.models import Prefetch
+from rest_framework.exceptions import ValidationError
+from rest_framework.serializers import ListSerializer
+
+from .models import Book, Chapter, Section, Subsection
+
+# Niveaux de l'arbre : modèle, relation vers le niveau suivant
+_TREE = (
+    (Book, 'chapters'),
+    (Chapter, 'sections'),
+    (Section, 'subsections'),
+    (Subsection, None),
+)
+_CHILD_RELATION = dict(_TREE)
+_PARENT_FK = {Chapter: 'book', Section: 'chapter', Subsection: 'section'}
+
+
+def get_projection(request):
+    """{'fields': set | None, 'depth': int | None} d'après la requête, ou None sans projection."""
+    if request is None or request.method not in ('GET', 'HEAD'):
+        return None
+    params = request.query_params
+    fields, depth = params.get('fields'), params.get('depth')
+    if not fields and depth in (None, ''):
+        return None
+    if depth not in (None, ''):
+        try:
+            depth = max(0, int(depth))
+        except ValueError:
+            raise ValidationError({'depth': "Un entier est attendu."})
+    else:
+        depth = None
+    return {
+        'fields': {f.strip() for f in fields.split(',') if f.strip()} if fields else None,
+        'depth': depth,
+    }
+
+
+def _nesting_level(serializer):
+    level = 0
+    parent = serializer.parent
+    while parent is not None:
+        if not isinstance(parent, ListSerializer):
+            level += 1
+        parent = parent.parent
+    return level
+
+
+def prune_fields(serializer, fields):
+    """Retire des champs d'un serializer de l'arbre ceux que la projection exclut."""
+    projection = serializer.context.get('projection')
+    if not projection:
+        return fields
+    keep, depth = projection['fields'], projection['depth']
+    relation = _CHILD_RELATION.get(serializer.Meta.model)
+    level = _nesting_level(serializer)
+    for name in list(fields):
+        if name == relation:
+            if depth is not None and level >= depth:
+                fields.pop(name)
+        elif keep is not None and name != 'id' and name not in keep:
+            fields.pop(name)
+    return fields
+
+
+def _only(qs, model, fields):
+    # Les colonnes du livre restent chargées (ETag calculé sur la ligne complète)
+    if fields is None or model is Book:
+        return qs
+    columns = {'id'} | (fields & {f.name for f in model._meta.concrete_fields})
+    if model in _PARENT_FK:
+        # Nécessaire au rattachement des objets préchargés
+        columns.add(_PARENT_FK[model])
+    return qs.only(*columns)
+
+
+def project_queryset(qs, projection=None):
+    """Applique .only() et précharge les niveaux imbriqués renvoyés (un niveau = une requête)."""
+    fields = projection['fields'] if projection else None
+    depth = projection['depth'] if projection else None
+    models = [model for model, _ in _TREE]
+    start = models.index(qs.model)
+    levels = _TREE[start + 1:]
+    if depth is not None:
+        levels = levels[:depth]
+
+    # Construction depuis le niveau le plus profond
+    prefetch = None
+    for index in range(len(levels) - 1, -1, -1):
+        model = levels[index][0]
+        relation = _TREE[start + index][1]
+        child_qs = _only(model.objects.order_by('order'), model, fields)
+        if prefetch is not None:
+            child_qs = child_qs.prefetch_related(prefetch)
+        prefetch = Prefetch(relation, queryset=child_qs)
+
+    qs = _only(qs, qs.model, fields)
+    return qs.prefetch_related(prefetch) if prefetch is not None else qs
+
+
+class ProjectionMixin:
+    """?fields= / ?depth= pour les actions de lecture d'un viewset de l'arbre."""
+    projection_actions = ('list', 'retrieve')
+
+    def filter_queryset(self, queryset):
+        # filter_queryset plutôt que get_queryset, que chaque viewset redéfinit
+        queryset = super().filter_queryset(queryset)
+        if self.action in self.projection_actions:
+            queryset = project_queryset(queryset, get_projection(self.request))
+        return queryset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action in self.projection_actions:
+            context['projection'] = get_projection(self.request)
+        return context
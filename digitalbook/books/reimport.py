@@ -0,0 +1,195 @@
+"""Ré-import d'une structure dans un livre existant, par différence avec la hiérarchie en base.
+
+La nouvelle structure est d'abord construite en mémoire dans un HierarchyWriter (objets non
+sauvegardés, mêmes règles que l'import). Chaque nouveau nœud est ensuite associé à un nœud
+existant du même parent, par passes successives :
+
+    1. contenu identique (titre, contenu, images, tableaux... hors ordre)
+    2. même titre
+    3. même ordre et même contenu hors titre (titre corrigé)
+
+puis les nœuds restants sont rapprochés sur tout le livre (passes 1 et 2) pour suivre
+les déplacements d'un parent à l'autre. Les nœuds associés gardent leur ID (QCM,
+progression de lecture et traductions restent rattachés) et ne sont mis à jour que
+si un champ change ; les autres sont créés ou supprimés. Les traductions d'un nœud
+modifié dont le source_hash ne correspond plus passent en 'stale'.
+"""
+import json
+from collections import defaultdict, deque
+
+from django.db import transaction
+
+from .models import (
+    Chapter,
+    ChapterTranslation,
+    Section,
+    SectionTranslation,
+    Subsection,
+    SubsectionTranslation,
+    Thematique,
+    ThematiqueTranslation,
+    TranslationStatus,
+)
+from .snapshots import touch_book
+
+# Champs fournis par l'import, comparés lors du ré-import (les autres ne sont pas touchés)
+_FIELDS = {
+    Thematique: ('title', 'description'),
+    Chapter: ('title', 'content', 'order', 'is_intro'),
+    Section: ('title', 'content', 'order', 'images', 'tables'),
+    Subsection: ('title', 'content', 'order', 'images', 'tables'),
+}
+
+_TRANSLATIONS = {
+    Thematique: (ThematiqueTranslation, 'thematique'),
+    Chapter: (ChapterTranslation, 'chapter'),
+    Section: (SectionTranslation, 'section'),
+    Subsection: (SubsectionTranslation, 'subsection'),
+}
+
+
+def _key(value):
+    return json.dumps(value, ensure_ascii=False, sort_keys=True, default=str)
+
+
+def _signature(node, fields):
+    return tuple(_key(getattr(node, f)) for f in fields)
+
+
+def _match(new_nodes, old_nodes, key_fns, matched, used):
+    """Associe new_nodes à old_nodes (ordonnés) : une passe par fonction de clé."""
+    for key_fn in key_fns:
+        index = defaultdict(deque)
+        for old in old_nodes:
+            if old.pk not in used:
+                index[key_fn(old)].append(old)
+        if not index:
+            return
+        for new in new_nodes:
+            if id(new) in matched:
+                continue
+            bucket = index.get(key_fn(new))
+            if bucket:
+                old = bucket.popleft()
+                used.add(old.pk)
+                matched[id(new)] = old
+
+
+def _parent(node, parent_field):
+    if parent_field is None:
+        return None
+    return node._meta.get_field(parent_field).get_cached_value(node, None)
+
+
+def sync_hierarchy(writer):
+    """Applique à writer.book la hiérarchie en attente dans writer, par différence.
+
+    Returns:
+        dict: {'created'|'updated'|'deleted'|'unchanged': {niveau: nombre}, 'stale_translations': n}
+    """
+    book = writer.book
+    levels = (
+        ('thematiques', Thematique, list(writer.thematiques), None,
+         Thematique.objects.filter(book=book).order_by('id')),
+        ('chapters', Chapter, list(writer.chapters), 'thematique',
+         Chapter.objects.filter(book=book).order_by('order', 'id')),
+        ('sections', Section, list(writer.sections), 'chapter',
+         Section.objects.filter(chapter__book=book).order_by('order', 'id')),
+        ('subsections', Subsection, list(writer.subsections), 'section',
+         Subsection.objects.filter(section__chapter__book=book).order_by('order', 'id')),
+    )
+    stats = {k: {name: 0 for name, *_ in levels} for k in ('created', 'updated', 'deleted', 'unchanged')}
+    stats['stale_translations'] = 0
+
+    for name, *_ in levels:
+        getattr(writer, name).clear()
+
+    with transaction.atomic():
+        deletions = []
+        for name, model, new_nodes, parent_field, old_qs in levels:
+            fields = _FIELDS[model]
+            body = tuple(f for f in fields if f != 'order')
+            untitled = tuple(f for f in body if f != 'title')
+            old_nodes = list(old_qs)
+            parent_attname = f"{parent_field}_id" if parent_field else None
+
+            # Regroupement par parent : les parents déjà associés portent l'ID existant
+            new_groups = defaultdict(list)
+            for node in new_nodes:
+                parent = _parent(node, parent_field)
+                key = None if parent is None else (parent.pk if parent.pk is not None else ('new', id(parent)))
+                new_groups[key].append(node)
+            old_groups = defaultdict(list)
+            for node in old_nodes:
+                old_groups[getattr(node, parent_attname) if parent_attname else None].append(node)
+
+            matched, used = {}, set()
+            key_fns = [
+                lambda n: _signature(n, body),
+                lambda n: n.title,
+            ]
+            if 'order' in fields:
+                key_fns.append(lambda n: (_key(n.order), _signature(n, untitled)))
+            for key, group in new_groups.items():
+                _match(group, old_groups.get(key, ()), key_fns, matched, used)
+            # Déplacements d'un parent à l'autre
+            _match(new_nodes, old_nodes, key_fns[:2], matched, used)
+
+            updates, update_fields = [], set()
+            for node in new_nodes:
+                old = matched.get(id(node))
+                if old is None:
+                    continue
+                node.pk = old.pk
+                node._state.adding = False
+                node._state.db = old._state.db
+                changed = [f for f in fields if _key(getattr(node, f)) != _key(getattr(old, f))]
+                parent = _parent(node, parent_field)
+                if parent is not None:
+                    # Resynchronise <parent>_id sur le parent (éventuellement associé entre-temps)
+                    setattr(node, parent_field, parent)
+                if parent_attname and getattr(node, parent_attname) != getattr(old, parent_attname):
+                    changed.append(parent_field)
+                if not changed:
+                    stats['unchanged'][name] += 1
+                    continue
+                updates.append(node)
+                update_fields.update(changed)
+                stats['updated'][name] += 1
+                if any(f in body for f in changed):
+                    stats['stale_translations'] += _mark_stale(model, node)
+
+            if updates:
+                model.objects.bulk_update(updates, sorted(update_fields), batch_size=writer.batch_size)
+            # Créations du niveau (bulk_create / COPY via le writer) : les enfants
+            # traités au niveau suivant trouvent ainsi tous leurs parents avec un ID
+            inserts = [node for node in new_nodes if id(node) not in matched]
+            getattr(writer, name)[:] = inserts
+            writer.write()
+            stats['created'][name] = len(inserts)
+            removed = [node.pk for node in old_nodes if node.pk not in used]
+            stats['deleted'][name] = len(removed)
+            deletions.append((model, removed))
+
+        # Suppressions : enfants d'abord (les parents supprimés entraînent le reste en cascade)
+        for model, removed in reversed(deletions):
+            if removed:
+                model.objects.filter(pk__in=removed).delete()
+
+        # bulk_update / update ne déclenchent pas les signaux des snapshots
+        if any(stats['updated'].values()) or stats['stale_translations']:
+            touch_book(book.pk)
+
+    return stats
+
+
+def _mark_stale(model, node):
+    """Passe en 'stale' les traductions du nœud dont le source_hash ne correspond plus."""
+    from .translation import node_source_hash
+
+    translation_model, fk = _TRANSLATIONS[model]
+    return (
+        translation_model.objects.filter(**{fk: node.pk})
+        .exclude(source_hash=node_source_hash(node))
+        .update(status=TranslationStatus.STALE)
+    )
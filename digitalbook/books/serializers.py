@@ -1,14 +1,29 @@
 from rest_framework import serializers
-from django.db.models import Count
 from .models import Book, Chapter, Section, Subsection, ReadingProgress
+from .projection import prune_fields
 
-class SubsectionSerializer(serializers.ModelSerializer):
+class TreeProjectionMixin:
+    """Champs restreints selon context['projection'] (?fields= / ?depth=, voir books/projection.py)."""
+
+    def get_fields(self):
+        return prune_fields(self, super().get_fields())
+
+class BookFieldsUpdateMixin:
+    """update() qui n'enregistre que les champs reçus (voir Book.changed_fields)."""
+
+    def update(self, instance, validated_data):
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=instance.changed_fields(validated_data))
+        return instance
+
+class SubsectionSerializer(TreeProjectionMixin, serializers.ModelSerializer):
     class Meta:
         model = Subsection
         fields = ['id', 'title', 'content', 'order', 'images', 'tables']
         read_only_fields = ['id']
 
-class SectionSerializer(serializers.ModelSerializer):
+class SectionSerializer(TreeProjectionMixin, serializers.ModelSerializer):
     subsections = SubsectionSerializer(many=True, read_only=True)
     
     class Meta:
@@ -16,7 +31,7 @@ class SectionSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'content', 'order', 'images', 'tables', 'subsections']
         read_only_fields = ['id']
 
-class ChapterSerializer(serializers.ModelSerializer):
+class ChapterSerializer(TreeProjectionMixin, serializers.ModelSerializer):
     sections = SectionSerializer(many=True, read_only=True)
     
     class Meta:
@@ -24,7 +39,7 @@ class ChapterSerializer(serializers.ModelSerializer):
         fields = ['id', 'title', 'content', 'order', 'is_intro', 'images', 'tables', 'sections']
         read_only_fields = ['id']
 
-class BookSerializer(serializers.ModelSerializer):
+class BookSerializer(BookFieldsUpdateMixin, TreeProjectionMixin, serializers.ModelSerializer):
     chapters = ChapterSerializer(many=True, read_only=True)
     created_by = serializers.StringRelatedField(read_only=True)
     pdf_file = serializers.FileField(required=False, allow_null=True, write_only=True)
@@ -58,7 +73,7 @@ class BookSerializer(serializers.ModelSerializer):
         )
         return book
 
-class BookUpdateSerializer(serializers.ModelSerializer):
+class BookUpdateSerializer(BookFieldsUpdateMixin, serializers.ModelSerializer):
     """Serializer pour la mise à jour du titre d'un livre"""
     class Meta:
         model = Book
@@ -96,12 +111,14 @@ class BookListSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'created_by']
     
     def get_chapters_count(self, obj):
-        """Retourne le nombre de chapitres pour ce livre"""
-        return obj.chapters.count()
+        """Retourne le nombre de chapitres pour ce livre (annoté par views.with_structure_counts)"""
+        count = getattr(obj, 'chapters_count', None)
+        return count if count is not None else obj.chapters.count()
     
     def get_sections_count(self, obj):
-        """Retourne le nombre total de sections pour ce livre"""
-        return Section.objects.filter(chapter__book=obj).count()
+        """Retourne le nombre total de sections pour ce livre (annoté par views.with_structure_counts)"""
+        count = getattr(obj, 'sections_count', None)
+        return count if count is not None else Section.objects.filter(chapter__book=obj).count()
 
 
 class ReadingProgressSerializer(serializers.ModelSerializer):
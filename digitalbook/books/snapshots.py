@@ -0,0 +1,280 @@
+"""Snapshots précalculés des endpoints de lecture (content, export_structure).
+
+Chaque modification du contenu d'un livre (livre, thématiques, chapitres, sections,
+sous-sections, traductions, QCM) incrémente Book.content_version via touch_book(). Les
+snapshots (BookSnapshot : JSON compressé gzip par livre / type / langue) construits pour
+une version antérieure sont alors périmés : ils sont reconstruits en tâche de fond
+(books.jobs, tâche 'build_book_snapshots') pour les livres publiés, et à la première
+lecture sinon. Les lectures servent le JSON compressé tel quel, avec un ETag dérivé de
+la version. L'export, volumineux, n'est pas reconstruit avant de répondre : il est
+envoyé en flux et enregistré comme snapshot une fois produit en entier.
+
+Les enregistrements unitaires (save / delete) sont suivis par signaux ; les écritures
+en masse (bulk_create, bulk_update, update, delete sur un queryset) doivent appeler
+touch_book() elles-mêmes (HierarchyWriter, reimport.sync_hierarchy).
+"""
+import gzip
+import io
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Model, QuerySet
+from django.db.models.signals import post_delete, post_save
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import parse_etags
+from rest_framework.renderers import JSONRenderer
+
+from qcm.models import QCM, Question, Reponse
+
+from .content import CONTENT_LANGS, build_book_content, iter_book_export
+from .http_cache import accepts_gzip, patch_read_cache
+from .models import (
+    Book,
+    BookSnapshot,
+    Chapter,
+    ChapterTranslation,
+    Section,
+    SectionTranslation,
+    SnapshotKind,
+    Subsection,
+    SubsectionTranslation,
+    Thematique,
+    ThematiqueTranslation,
+)
+
+# Chemin (relations) de chaque modèle suivi jusqu'à son livre
+_BOOK_PATHS = {
+    Thematique: (),
+    Chapter: (),
+    Section: ('chapter',),
+    Subsection: ('section', 'chapter'),
+    ThematiqueTranslation: ('thematique',),
+    ChapterTranslation: ('chapter',),
+    SectionTranslation: ('section', 'chapter'),
+    SubsectionTranslation: ('subsection', 'section', 'chapter'),
+    QCM: (),
+    Question: ('qcm',),
+    Reponse: ('question', 'qcm'),
+}
+
+# Champs de Book repris dans les snapshots (les champs de traitement n'en font pas partie)
+_BOOK_FIELDS = frozenset(('title', 'url', 'pdf_url', 'cover_image', 'created_at', 'language'))
+
+# JSON de chaque type de snapshot, en morceaux (bytes)
+_BUILDERS = {
+    SnapshotKind.CONTENT: lambda book, lang: [JSONRenderer().render(build_book_content(book, lang or None))],
+    SnapshotKind.EXPORT: lambda book, lang: iter_book_export(book),
+}
+# Types servis en flux quand leur snapshot est périmé, plutôt que reconstruits avant de répondre
+_STREAMED_KINDS = frozenset((SnapshotKind.EXPORT,))
+
+
+def snapshots_enabled() -> bool:
+    return getattr(settings, 'BOOK_SNAPSHOTS_ENABLED', True)
+
+
+class _RebuildSnapshots:
+    """Callback on_commit de touch_book (book_id sert aussi à dédoublonner par transaction)."""
+
+    def __init__(self, book_id):
+        self.book_id = book_id
+
+    def __call__(self):
+        if not snapshots_enabled():
+            return
+        if not Book.objects.filter(pk=self.book_id, published=True).exists():
+            # Livre non publié (souvent en cours de traitement) : reconstruit à la première lecture
+            return
+        from .jobs import get_job_backend
+
+        try:
+            get_job_backend().submit('build_book_snapshots', book_id=self.book_id, unique=True)
+        except Exception as e:
+            print(f"[snapshots] Impossible de planifier la reconstruction du livre {self.book_id}: {e}")
+
+
+def touch_book(book_id) -> None:
+    """Marque le contenu du livre comme modifié (une seule fois par transaction)."""
+    if not book_id:
+        return
+    connection = transaction.get_connection()
+    for entry in connection.run_on_commit:
+        if isinstance(entry[1], _RebuildSnapshots) and entry[1].book_id == book_id:
+            return
+    # Dans la transaction de la modification : annulé avec elle en cas d'erreur
+    Book.objects.filter(pk=book_id).update(content_version=F('content_version') + 1)
+    transaction.on_commit(_RebuildSnapshots(book_id))
+
+
+def _book_id(instance):
+    obj = instance
+    path = _BOOK_PATHS[type(obj)]
+    for i, name in enumerate(path):
+        field = obj._meta.get_field(name)
+        if field.is_cached(obj):
+            obj = field.get_cached_value(obj)
+            continue
+        # Parent non chargé : une requête sur le parent (l'objet lui-même peut être supprimé)
+        lookup = '__'.join(path[i + 1:] + ('book',))
+        return (
+            field.related_model.objects.filter(pk=getattr(obj, field.attname))
+            .values_list(lookup, flat=True).first()
+        )
+    return obj.book_id
+
+
+def _on_book_saved(sender, instance, created, update_fields=None, **kwargs):
+    if created:
+        return
+    if update_fields is not None and not (_BOOK_FIELDS & set(update_fields)):
+        return
+    touch_book(instance.pk)
+
+
+def _on_node_changed(sender, instance, origin=None, **kwargs):
+    # Suppression en cascade depuis un livre : il n'y a plus rien à invalider
+    if isinstance(origin, Book) or (isinstance(origin, QuerySet) and origin.model is Book):
+        return
+    # Cascade depuis un nœud : son livre évite une requête par objet supprimé
+    if isinstance(origin, Model) and type(origin) in _BOOK_PATHS:
+        instance = origin
+    touch_book(_book_id(instance))
+
+
+def connect_signals() -> None:
+    post_save.connect(_on_book_saved, sender=Book, dispatch_uid='books.snapshots.book')
+    for model in _BOOK_PATHS:
+        uid = f'books.snapshots.{model._meta.label_lower}'
+        post_save.connect(_on_node_changed, sender=model, dispatch_uid=uid)
+        post_delete.connect(_on_node_changed, sender=model, dispatch_uid=uid)
+
+
+class _GzipTee:
+    """Compresse en gzip un flux de morceaux JSON au fil de l'eau.
+
+    Itérer produit les morceaux compressés (gzip=True) ou les morceaux d'origine ; dans
+    les deux cas la version compressée complète est disponible ensuite dans `data`.
+    """
+
+    def __init__(self, chunks, gzip=True):
+        self.chunks = chunks
+        self.gzip = gzip
+        self.size = 0
+        self.parts = []
+
+    def _take(self, buf):
+        part = buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+        self.parts.append(part)
+        return part
+
+    def __iter__(self):
+        buf = io.BytesIO()
+        with gzip.GzipFile(mode='wb', compresslevel=6, fileobj=buf, mtime=0) as zfile:
+            for chunk in self.chunks:
+                self.size += len(chunk)
+                zfile.write(chunk)
+                if not self.gzip:
+                    yield chunk
+                elif buf.tell():
+                    yield self._take(buf)
+        tail = self._take(buf)
+        if self.gzip and tail:
+            yield tail
+
+    @property
+    def data(self):
+        return b''.join(self.parts)
+
+
+def _store_snapshot(book, kind, lang, version, data, size) -> BookSnapshot:
+    snapshot = BookSnapshot(book=book, kind=kind, lang=lang, version=version, data=data, size=size)
+    # Ne jamais remplacer un snapshot construit pour une version plus récente
+    updated = BookSnapshot.objects.filter(book=book, kind=kind, lang=lang, version__lte=version).update(
+        version=version, data=data, size=size,
+    )
+    if not updated:
+        try:
+            with transaction.atomic():
+                snapshot.save(force_insert=True)
+        except IntegrityError:
+            pass
+    return snapshot
+
+
+def build_snapshot(book, kind, lang='') -> BookSnapshot:
+    """Construit et enregistre le snapshot (kind, lang) du livre pour sa version courante."""
+    version = Book.objects.filter(pk=book.pk).values_list('content_version', flat=True).first()
+    tee = _GzipTee(_BUILDERS[kind](book, lang))
+    for _ in tee:
+        pass
+    return _store_snapshot(book, kind, lang, version, tee.data, tee.size)
+
+
+def rebuild_book_snapshots(book_id) -> int:
+    """Reconstruit les snapshots périmés du livre (contenu source + ceux déjà demandés)."""
+    book = Book.objects.filter(pk=book_id).first()
+    if book is None:
+        return 0
+    existing = dict(
+        ((kind, lang), version)
+        for kind, lang, version in book.snapshots.values_list('kind', 'lang', 'version')
+    )
+    existing.setdefault((SnapshotKind.CONTENT, ''), None)
+    built = 0
+    for (kind, lang), version in existing.items():
+        if version != book.content_version:
+            build_snapshot(book, kind, lang)
+            built += 1
+    return built
+
+
+def snapshot_etag(book, kind, lang, version=None) -> str:
+    version = book.content_version if version is None else version
+    return f'W/"{book.pk}.{version}.{kind}.{lang or "src"}"'
+
+
+def snapshot_response(request, book, kind, lang=None):
+    """Réponse HTTP servie depuis le snapshot (kind, lang) du livre, avec ETag / If-None-Match."""
+    lang = lang if lang in CONTENT_LANGS else ''
+    if snapshot_etag(book, kind, lang) in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        response = HttpResponseNotModified()
+        response['ETag'] = snapshot_etag(book, kind, lang)
+        return patch_read_cache(response, vary=('Accept-Encoding', 'Authorization'))
+
+    snapshot = (
+        BookSnapshot.objects.filter(book=book, kind=kind, lang=lang)
+        .only('version', 'data').first()
+    )
+    gzip_ok = bool(accepts_gzip.search(request.META.get('HTTP_ACCEPT_ENCODING', '')))
+    if snapshot is None or snapshot.version != book.content_version:
+        if kind in _STREAMED_KINDS:
+            return _streamed_snapshot_response(book, kind, lang, gzip_ok)
+        snapshot = build_snapshot(book, kind, lang)
+
+    data = bytes(snapshot.data)
+    if gzip_ok:
+        response = HttpResponse(data, content_type='application/json')
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(gzip.decompress(data), content_type='application/json')
+    response['ETag'] = snapshot_etag(book, kind, lang, snapshot.version)
+    return patch_read_cache(response, vary=('Accept-Encoding', 'Authorization'))
+
+
+def _streamed_snapshot_response(book, kind, lang, gzip_ok):
+    """Envoie le document au fil de sa construction et l'enregistre comme snapshot à la fin."""
+    version = book.content_version
+    tee = _GzipTee(_BUILDERS[kind](book, lang), gzip=gzip_ok)
+
+    def stream():
+        yield from tee
+        # Atteint seulement si le document a été produit en entier
+        _store_snapshot(book, kind, lang, version, tee.data, tee.size)
+
+    response = StreamingHttpResponse(stream(), content_type='application/json')
+    if gzip_ok:
+        response['Content-Encoding'] = 'gzip'
+    response['ETag'] = snapshot_etag(book, kind, lang, version)
+    return patch_read_cache(response, vary=('Accept-Encoding', 'Authorization'))
@@ -4,6 +4,9 @@ from typing import Optional, List, Any
 import os
 import re
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from django.db import transaction
 from .models import (
     Book,
@@ -17,6 +20,14 @@ from .models import (
     SubsectionTranslation,
     TranslationStatus,
 )
+from .translation_memory import TranslationMemory, segment_hash
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+except Exception:
+    requests = None
 
 
 def _norm(obj) -> str:
@@ -35,6 +46,15 @@ def _hash_text(*parts: str) -> str:
     return h.hexdigest()
 
 
+def node_source_hash(node) -> str:
+    """Empreinte du contenu source d'un nœud (comparée au source_hash de ses traductions)."""
+    if isinstance(node, Thematique):
+        return _hash_text(node.title or "", node.description or "")
+    if isinstance(node, Chapter):
+        return _hash_text(node.title or "", node.content or "")
+    return _hash_text(node.title or "", node.content or "", _norm(node.images), _norm(node.tables))
+
+
 def _targets_for(source: str, provided: Optional[List[str]] = None) -> List[str]:
     if provided:
         return [t for t in provided if t in ("fr", "en", "pt") and t != source]
@@ -42,108 +62,364 @@ def _targets_for(source: str, provided: Optional[List[str]] = None) -> List[str]
     return [l for l in langs if l != source]
 
 
-def translate_book_sync(book_id: int, target_langs: Optional[List[str]] = None) -> None:
+# Niveaux traduits : modèle, modèle de traduction, champ du nœud dans la traduction,
+# chemin vers le livre, champs texte, traduction de images / tables
+_LEVELS = (
+    (Thematique, ThematiqueTranslation, "thematique", "book", ("title", "description"), False),
+    (Chapter, ChapterTranslation, "chapter", "book", ("title", "content"), False),
+    (Section, SectionTranslation, "section", "chapter__book", ("title", "content"), True),
+    (Subsection, SubsectionTranslation, "subsection", "section__chapter__book", ("title", "content"), True),
+)
+
+
+def _needs_translation(tr, source_hash: str, text_fields) -> bool:
+    # Thématique : titre seul exigé ; autres nœuds : titre et contenu
+    return tr.source_hash != source_hash or not tr.title or ("content" in text_fields and not tr.content)
+
+
+class _TranslationUnit:
+    """Petit lot de nœuds d'un niveau à traduire vers une langue.
+
+    translate() ne fait qu'appeler le service de traduction (dans un thread du pool, hors
+    transaction) ; save() enregistre ensuite le lot dans sa propre transaction.
+    """
+
+    def __init__(self, level, target: str):
+        self.level = level
+        self.target = target
+        self.batch = _SegmentBatch()
+        self.items = []
+        # Segments repris de la traduction précédente des nœuds
+        self.reused = 0
+
+    def add(self, node, tr) -> None:
+        text_fields, with_media = self.level[4], self.level[5]
+        segments = None
+        if hasattr(tr, "segments"):
+            # Sections / sous-sections : seuls les segments modifiés depuis la dernière
+            # traduction partent au service, le contenu est découpé en paragraphes
+            segments = _NodeSegments(self.batch, tr.segments)
+            refs = {
+                f: segments.add_paragraphs(getattr(node, f)) if f == "content" else segments.add(getattr(node, f))
+                for f in text_fields
+            }
+            add = segments.add
+        else:
+            refs = {f: self.batch.add(getattr(node, f)) for f in text_fields}
+            add = self.batch.add
+        if with_media:
+            refs["images"] = _translate_images(add, node.images)
+            refs["tables"] = _translate_tables(add, node.tables)
+        if segments is not None:
+            self.reused += sum(1 for value in segments.used.values() if not isinstance(value, _Ref))
+        self.items.append((tr, refs, segments))
+
+    def recall(self, memory, source: str) -> None:
+        self.batch.recall(memory, source, self.target)
+
+    def translate(self, backend, source: str) -> '_TranslationUnit':
+        self.batch.translate(backend, source, self.target)
+        return self
+
+    def save(self, memory=None, source: Optional[str] = None) -> int:
+        text_fields, with_media = self.level[4], self.level[5]
+        with transaction.atomic():
+            if memory is not None:
+                self.batch.remember(memory, source, self.target)
+            for tr, refs, segments in self.items:
+                for f in text_fields:
+                    setattr(tr, f, self.batch.translated(refs[f]) or getattr(tr, f))
+                if with_media:
+                    tr.images = self.batch.resolve(refs["images"])
+                    tr.tables = self.batch.resolve(refs["tables"])
+                if segments is not None:
+                    tr.segments = segments.translations()
+                filled = any(getattr(tr, f) for f in text_fields) or (with_media and (tr.images or tr.tables))
+                tr.status = TranslationStatus.READY if filled else TranslationStatus.PENDING
+                tr.save()
+        return len(self.items)
+
+
+def _plan_level(nodes, level, target: str, batch_nodes: int) -> List[_TranslationUnit]:
+    """Lots des nœuds d'un niveau dont la traduction vers `target` est absente ou périmée."""
+    _, tr_model, fk, _, text_fields, _ = level
+    existing = {
+        getattr(tr, f"{fk}_id"): tr
+        for tr in tr_model.objects.filter(**{f"{fk}__in": nodes, "lang": target})
+    }
+    units = []
+    for node in nodes:
+        sh = node_source_hash(node)
+        tr = existing.get(node.pk) or tr_model(**{fk: node, "lang": target})
+        if tr.pk and not _needs_translation(tr, sh, text_fields):
+            continue
+        tr.source_hash = sh
+        if not units or len(units[-1].items) >= batch_nodes:
+            units.append(_TranslationUnit(level, target))
+        units[-1].add(node, tr)
+    return units
+
+
+def translate_book_sync(
+    book_id: int,
+    target_langs: Optional[List[str]] = None,
+    backend: Optional['TranslationBackend'] = None,
+    memory: Optional[TranslationMemory] = None,
+    batch_nodes: Optional[int] = None,
+    stats: Optional[dict] = None,
+) -> int:
+    """Traduit les nœuds du livre dont la traduction est absente ou périmée.
+
+    Les segments sont d'abord cherchés dans la mémoire de traduction
+    (books/translation_memory.py). Les lots (BOOK_TRANSLATION_BATCH_NODES nœuds d'un
+    niveau, une langue cible) sont ensuite traduits en parallèle dans la limite de
+    concurrence du moteur (TRANSLATION_BACKEND, voir get_translation_backend), puis
+    enregistrés chacun dans une courte transaction dès qu'ils sont prêts.
+    `stats`, si fourni, reçoit le nombre de lots et de segments traités.
+    Retourne le nombre de traductions enregistrées.
+    """
     book = Book.objects.get(id=book_id)
     source_lang = book.language or "fr"
     targets = _targets_for(source_lang, target_langs)
-    client = LibreTranslateClient(os.getenv("LIBRETRANSLATE_URL", "http://localhost:5000"))
-
-    with transaction.atomic():
-        # Thematique
-        for th in Thematique.objects.filter(book=book).all():
-            sh = _hash_text(th.title or "", th.description or "")
-            for tgt in targets:
-                tr, _ = ThematiqueTranslation.objects.get_or_create(thematique=th, lang=tgt)
-                if tr.source_hash != sh or not tr.title:
-                    tr.source_hash = sh
-                    # Traduire
-                    title = _translate_safe(client, th.title, source_lang, tgt)
-                    desc = _translate_safe(client, th.description, source_lang, tgt)
-                    tr.title = title if title else tr.title
-                    tr.description = desc if desc else tr.description
-                    tr.status = TranslationStatus.READY if (tr.title or tr.description) else TranslationStatus.PENDING
-                    tr.save()
-
-        # Chapter
-        for ch in Chapter.objects.filter(book=book).all():
-            sh = _hash_text(ch.title or "", ch.content or "")
-            for tgt in targets:
-                tr, _ = ChapterTranslation.objects.get_or_create(chapter=ch, lang=tgt)
-                if tr.source_hash != sh or not tr.title or not tr.content:
-                    tr.source_hash = sh
-                    tr.title = _translate_safe(client, ch.title, source_lang, tgt) or tr.title
-                    tr.content = _translate_safe(client, ch.content, source_lang, tgt) or tr.content
-                    tr.status = TranslationStatus.READY if (tr.title or tr.content) else TranslationStatus.PENDING
-                    tr.save()
-
-        # Section
-        for se in Section.objects.filter(chapter__book=book).all():
-            sh = _hash_text(se.title or "", se.content or "", _norm(se.images), _norm(se.tables))
-            for tgt in targets:
-                tr, _ = SectionTranslation.objects.get_or_create(section=se, lang=tgt)
-                if tr.source_hash != sh or not tr.title or not tr.content:
-                    tr.source_hash = sh
-                    tr.title = _translate_safe(client, se.title, source_lang, tgt) or tr.title
-                    tr.content = _translate_safe(client, se.content, source_lang, tgt) or tr.content
-                    tr.images = _translate_images(client, se.images, source_lang, tgt)
-                    tr.tables = _translate_tables(client, se.tables, source_lang, tgt)
-                    tr.status = TranslationStatus.READY if (tr.title or tr.content or tr.images or tr.tables) else TranslationStatus.PENDING
-                    tr.save()
-
-        # Subsection
-        for su in Subsection.objects.filter(section__chapter__book=book).all():
-            sh = _hash_text(su.title or "", su.content or "", _norm(su.images), _norm(su.tables))
-            for tgt in targets:
-                tr, _ = SubsectionTranslation.objects.get_or_create(subsection=su, lang=tgt)
-                if tr.source_hash != sh or not tr.title or not tr.content:
-                    tr.source_hash = sh
-                    tr.title = _translate_safe(client, su.title, source_lang, tgt) or tr.title
-                    tr.content = _translate_safe(client, su.content, source_lang, tgt) or tr.content
-                    tr.images = _translate_images(client, su.images, source_lang, tgt)
-                    tr.tables = _translate_tables(client, su.tables, source_lang, tgt)
-                    tr.status = TranslationStatus.READY if (tr.title or tr.content or tr.images or tr.tables) else TranslationStatus.PENDING
-                    tr.save()
-
-
-class LibreTranslateClient:
-    def __init__(self, base_url: str):
-        self.base_url = base_url.rstrip('/')
-        self.api_key = os.getenv('LIBRETRANSLATE_API_KEY')
+    backend = backend or get_translation_backend()
+    memory = memory or TranslationMemory(backend.engine)
+    batch_nodes = max(1, batch_nodes or int(os.getenv("BOOK_TRANSLATION_BATCH_NODES", "20")))
+
+    units = []
+    for level in _LEVELS:
+        model, book_path = level[0], level[3]
+        nodes = list(model.objects.filter(**{book_path: book}))
+        for tgt in targets:
+            units.extend(_plan_level(nodes, level, tgt, batch_nodes))
+    if stats is not None:
+        stats["units"] = stats.get("units", 0) + len(units)
+        stats["segments"] = stats.get("segments", 0) + sum(len(u.batch.texts) for u in units)
+        stats["reused_segments"] = stats.get("reused_segments", 0) + sum(u.reused for u in units)
+    if not units:
+        return 0
+    # Segments déjà connus de la mémoire de traduction : pas d'appel au moteur
+    for unit in units:
+        unit.recall(memory, source_lang)
+
+    saved = 0
+    workers = max(1, min(backend.max_concurrency, len(units)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="translate") as pool:
+        futures = [pool.submit(unit.translate, backend, source_lang) for unit in units]
+        # Enregistrement dans ce thread : les workers n'accèdent pas à la base
+        for future in as_completed(futures):
+            try:
+                saved += future.result().save(memory, source_lang)
+            except Exception as e:
+                logging.warning("Translation batch failed for book %s: %s", book_id, e)
+    return saved
+
+
+def _split_batches(texts: List[str], max_segments: int, max_chars: int):
+    """Découpe en lots d'au plus max_segments textes / max_chars caractères (indices)."""
+    batch, size = [], 0
+    for i, text in enumerate(texts):
+        if batch and (len(batch) >= max_segments or size + len(text) > max_chars):
+            yield batch
+            batch, size = [], 0
+        batch.append(i)
+        size += len(text)
+    if batch:
+        yield batch
+
+
+class BatchRejected(Exception):
+    """Lot refusé par le moteur (trop volumineux) : à renvoyer en lots plus petits."""
+
+
+class TranslationBackend:
+    """Moteur de traduction utilisé par translate_book_sync.
+
+    Une implémentation définit `engine` (clé de la mémoire de traduction) et _send(), qui
+    traduit en une requête un lot de textes non vides. Le découpage en lots
+    (max_segments / max_chars), la limite de requêtes simultanées (max_concurrency) et
+    les compteurs sont communs à tous les moteurs.
+    """
+    engine = ''
+
+    def __init__(self, max_concurrency: int = 1, max_segments: int = 50, max_chars: int = 20000):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_segments = max_segments
+        self.max_chars = max_chars
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        self._stats_lock = threading.Lock()
+        self.requests_sent = 0
+        self.segments_sent = 0
+        self.segments_failed = 0
 
     def translate(self, text: str, source: str, target: str) -> Optional[str]:
         if not text or source == target:
             return text
+        return self.translate_batch([text], source, target)[0]
+
+    def translate_batch(self, texts: List[str], source: str, target: str) -> List[Optional[str]]:
+        """Traductions de `texts` dans l'ordre (None pour un texte non traduit)."""
+        if source == target:
+            return list(texts)
+        results: List[Optional[str]] = [t if not t else None for t in texts]
+        pending = [i for i, t in enumerate(texts) if t]
+        for chunk in _split_batches([texts[i] for i in pending], self.max_segments, self.max_chars):
+            indices = [pending[i] for i in chunk]
+            for i, out in zip(indices, self._request([texts[i] for i in indices], source, target)):
+                results[i] = out
+        return results
+
+    def _request(self, texts: List[str], source: str, target: str) -> List[Optional[str]]:
         try:
-            # Use requests if available
-            try:
-                import requests
-            except Exception:
-                logging.warning("requests not available; skipping translation")
-                return None
-            payload = {
-                'q': text,
-                'source': source,
-                'target': target,
-                'format': 'text',
-            }
-            if self.api_key:
-                payload['api_key'] = self.api_key
-            resp = requests.post(f"{self.base_url}/translate", data=payload, timeout=30)
+            with self._slots:
+                with self._stats_lock:
+                    self.requests_sent += 1
+                    self.segments_sent += len(texts)
+                out = self._send(texts, source, target)
+        except BatchRejected:
+            if len(texts) == 1:
+                out = [None]
+            else:
+                # Réessai par moitiés, hors du créneau de concurrence
+                half = len(texts) // 2
+                return self._request(texts[:half], source, target) + self._request(texts[half:], source, target)
+        failed = sum(1 for t in out if t is None)
+        if failed:
+            with self._stats_lock:
+                self.segments_failed += failed
+        return out
+
+    def _send(self, texts: List[str], source: str, target: str) -> List[Optional[str]]:
+        raise NotImplementedError
+
+
+class LibreTranslateClient(TranslationBackend):
+    """Client LibreTranslate : session HTTP persistante (keep-alive, pool de connexions),
+    requêtes groupées (`q` en tableau, découpé selon LIBRETRANSLATE_BATCH_SEGMENTS /
+    LIBRETRANSLATE_BATCH_CHARS) et au plus LIBRETRANSLATE_CONCURRENCY requêtes en cours."""
+    engine = 'libretranslate'
+
+    def __init__(self, base_url: str, timeout: int = 30, max_concurrency: Optional[int] = None):
+        super().__init__(
+            max_concurrency=max_concurrency or int(os.getenv('LIBRETRANSLATE_CONCURRENCY', '4')),
+            max_segments=int(os.getenv('LIBRETRANSLATE_BATCH_SEGMENTS', '50')),
+            max_chars=int(os.getenv('LIBRETRANSLATE_BATCH_CHARS', '20000')),
+        )
+        self.base_url = base_url.rstrip('/')
+        self.api_key = os.getenv('LIBRETRANSLATE_API_KEY')
+        self.timeout = timeout
+        self.session = self._make_session()
+
+    def _make_session(self):
+        if requests is None:
+            logging.warning("requests not available; translation disabled")
+            return None
+        pool = max(int(os.getenv('LIBRETRANSLATE_POOL_SIZE', '10')), self.max_concurrency)
+        retry = Retry(
+            total=2, backoff_factor=0.5, status_forcelist=(429, 502, 503, 504),
+            allowed_methods=frozenset(['POST']),
+        )
+        session = requests.Session()
+        session.mount(self.base_url, HTTPAdapter(pool_connections=pool, pool_maxsize=pool, max_retries=retry))
+        return session
+
+    def _send(self, texts: List[str], source: str, target: str) -> List[Optional[str]]:
+        if self.session is None:
+            return [None] * len(texts)
+        payload = {
+            'q': texts,
+            'source': source,
+            'target': target,
+            'format': 'text',
+        }
+        if self.api_key:
+            payload['api_key'] = self.api_key
+        try:
+            resp = self.session.post(f"{self.base_url}/translate", json=payload, timeout=self.timeout)
             if resp.status_code == 200:
                 data = resp.json()
-                # LibreTranslate returns {"translatedText": "..."}
-                if isinstance(data, dict) and 'translatedText' in data:
-                    return data['translatedText']
-                # Some variants may return string
-                if isinstance(data, str):
-                    return data
+                # LibreTranslate returns {"translatedText": [...]} for an array q
+                out = data.get('translatedText') if isinstance(data, dict) else None
+                if isinstance(out, list) and len(out) == len(texts):
+                    return out
+                if isinstance(out, str) and len(texts) == 1:
+                    return [out]
             logging.warning("LibreTranslate HTTP %s: %s", resp.status_code, resp.text[:200])
+            if resp.status_code == 400 and len(texts) > 1:
+                # Lot refusé (ex: char_limit du serveur)
+                raise BatchRejected(resp.text[:200])
+        except BatchRejected:
+            raise
         except Exception as e:
             logging.warning("LibreTranslate error: %s", e)
-        return None
+        return [None] * len(texts)
+
+
+class FakeTranslationBackend(TranslationBackend):
+    """Moteur local déterministe, sans réseau (CI, benchmark).
+
+    Traduit en préfixant chaque texte de la langue cible ("[en] ..."). Chaque requête
+    dure `latency` secondes et échoue (aucun texte traduit) avec la probabilité
+    `error_rate`, tirée d'après le contenu du lot et `seed` : mêmes entrées, mêmes échecs.
+    """
+    engine = 'fake'
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, seed: int = 0, **kwargs):
+        kwargs.setdefault('max_concurrency', 4)
+        super().__init__(**kwargs)
+        self.latency = latency
+        self.error_rate = error_rate
+        self.seed = seed
+
+    def _fails(self, texts: List[str], target: str) -> bool:
+        if self.error_rate <= 0:
+            return False
+        digest = hashlib.sha256(_hash_text(str(self.seed), target, *texts).encode("utf-8")).digest()
+        return int.from_bytes(digest[:8], "big") / 2 ** 64 < self.error_rate
+
+    def _send(self, texts: List[str], source: str, target: str) -> List[Optional[str]]:
+        if self.latency:
+            time.sleep(self.latency)
+        if self._fails(texts, target):
+            return [None] * len(texts)
+        return [f"[{target}] {text}" for text in texts]
+
+
+def _libretranslate_backend() -> TranslationBackend:
+    return LibreTranslateClient(os.getenv("LIBRETRANSLATE_URL", "http://localhost:5000"))
+
+
+def _fake_backend() -> TranslationBackend:
+    return FakeTranslationBackend(
+        latency=float(os.getenv("FAKE_TRANSLATION_LATENCY", "0")),
+        error_rate=float(os.getenv("FAKE_TRANSLATION_ERROR_RATE", "0")),
+    )
+
+
+# Moteurs disponibles (TRANSLATION_BACKEND)
+TRANSLATION_BACKENDS = {
+    'libretranslate': _libretranslate_backend,
+    'fake': _fake_backend,
+}
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def get_translation_backend(name: Optional[str] = None) -> TranslationBackend:
+    """Moteur partagé du processus (pour LibreTranslate : une session et son pool par URL)."""
+    name = name or os.getenv("TRANSLATION_BACKEND", "libretranslate")
+    if name not in TRANSLATION_BACKENDS:
+        raise ValueError(f"Moteur de traduction inconnu: {name}")
+    key = (name, os.getenv("LIBRETRANSLATE_URL", "http://localhost:5000") if name == 'libretranslate' else None)
+    with _backends_lock:
+        if key not in _backends:
+            _backends[key] = TRANSLATION_BACKENDS[name]()
+        return _backends[key]
 
 
 PLACEHOLDER_RE = re.compile(r"\{\{[^}]+\}\}")
+# Découpage du contenu en paragraphes (séparateurs conservés)
+PARAGRAPH_SPLIT_RE = re.compile(r"(\n+)")
 
 
 def _mask_placeholders(text: str):
@@ -167,46 +443,141 @@ def _unmask_placeholders(text: str, mapping: dict):
     return text
 
 
-def _translate_safe(client: 'LibreTranslateClient', text: Optional[str], source: str, target: str) -> Optional[str]:
-    if not text:
-        return text
-    masked, mapping = _mask_placeholders(text)
-    out = client.translate(masked, source, target)
-    return _unmask_placeholders(out, mapping) if out is not None else None
+class _Ref:
+    """Emplacement d'un texte en attente de traduction dans un _SegmentBatch."""
+    __slots__ = ('index', 'text')
 
+    def __init__(self, index: int, text: str):
+        self.index = index
+        self.text = text
 
-def _translate_images(client: 'LibreTranslateClient', images: Any, source: str, target: str) -> Any:
-    # images expected as list of dicts with optional 'caption'
-    try:
-        if not isinstance(images, list):
-            return images
-        out = []
-        for img in images:
-            if isinstance(img, dict):
-                new = dict(img)
-                if 'caption' in new and isinstance(new['caption'], str):
-                    tr = _translate_safe(client, new['caption'], source, target)
-                    if tr:
-                        new['caption'] = tr
-                out.append(new)
-            else:
-                out.append(img)
+
+class _SegmentBatch:
+    """Textes à traduire d'un lot de nœuds : collectés (add), traduits ensemble, remis en place (resolve)."""
+
+    def __init__(self):
+        self.texts: List[str] = []
+        self.masks: List[dict] = []
+        self.results: List[Optional[str]] = []
+        self.fresh: List[int] = []
+        self._index = {}
+
+    def add(self, text: Optional[str]):
+        if not text:
+            return text
+        masked, mapping = _mask_placeholders(text)
+        # Un texte répété dans le lot n'est envoyé qu'une fois
+        if text not in self._index:
+            self._index[text] = len(self.texts)
+            self.texts.append(masked)
+            self.masks.append(mapping)
+        return _Ref(self._index[text], text)
+
+    def recall(self, memory: TranslationMemory, source: str, target: str) -> None:
+        """Reprend les traductions déjà présentes dans la mémoire de traduction."""
+        self.results = [None] * len(self.texts)
+        for i, text in memory.lookup(self.texts, source, target).items():
+            self.results[i] = text
+
+    def translate(self, backend: 'TranslationBackend', source: str, target: str) -> None:
+        """Traduit les textes que recall() n'a pas trouvés."""
+        if len(self.results) != len(self.texts):
+            self.results = [None] * len(self.texts)
+        missing = [i for i, out in enumerate(self.results) if out is None]
+        if not missing:
+            return
+        outputs = backend.translate_batch([self.texts[i] for i in missing], source, target)
+        for i, out in zip(missing, outputs):
+            self.results[i] = out
+            if out is not None:
+                self.fresh.append(i)
+
+    def remember(self, memory: TranslationMemory, source: str, target: str) -> None:
+        """Enregistre dans la mémoire de traduction les textes traduits par translate()."""
+        memory.store({self.texts[i]: self.results[i] for i in self.fresh}, source, target)
+
+    def translated(self, value: Any) -> Optional[str]:
+        """Traduction d'un texte ajouté par add() (None si non traduit, vide tel quel).
+
+        Un contenu découpé en paragraphes est réassemblé (None si un paragraphe manque).
+        """
+        if isinstance(value, _Paragraphs):
+            parts = [self.translated(p) for p in value]
+            return None if any(p is None for p in parts) else "".join(parts)
+        if not isinstance(value, _Ref):
+            return value
+        out = self.results[value.index] if value.index < len(self.results) else None
+        return _unmask_placeholders(out, self.masks[value.index]) if out is not None else None
+
+    def resolve(self, value: Any) -> Any:
+        """Remplace les _Ref de `value` par leur traduction (le texte source à défaut)."""
+        if isinstance(value, _Ref):
+            return self.translated(value) or value.text
+        if isinstance(value, list):
+            return [self.resolve(v) for v in value]
+        if isinstance(value, dict):
+            return {k: self.resolve(v) for k, v in value.items()}
+        return value
+
+
+class _Paragraphs(list):
+    """Contenu découpé : paragraphes (_Ref ou texte repris) et séparateurs, en alternance."""
+
+
+class _NodeSegments:
+    """Segments d'un nœud, comparés à ceux de sa traduction précédente (tr.segments).
+
+    Un segment dont le hash normalisé est connu reprend sa traduction précédente ; les
+    autres sont ajoutés au lot. translations() donne la table à enregistrer pour la
+    prochaine fois (segments actuels seulement).
+    """
+
+    def __init__(self, batch: '_SegmentBatch', known: Any):
+        self.batch = batch
+        self.known = known if isinstance(known, dict) else {}
+        self.used = {}
+
+    def add(self, text: Optional[str]):
+        if not text or not text.strip():
+            return text
+        h = segment_hash(text)
+        value = self.known[h] if h in self.known else self.batch.add(text)
+        self.used[h] = value
+        return value
+
+    def add_paragraphs(self, text: Optional[str]):
+        if not text:
+            return text
+        parts = PARAGRAPH_SPLIT_RE.split(text)
+        return _Paragraphs(self.add(p) if i % 2 == 0 else p for i, p in enumerate(parts))
+
+    def translations(self) -> dict:
+        out = {}
+        for h, value in self.used.items():
+            translated = self.batch.translated(value)
+            if translated is not None:
+                out[h] = translated
         return out
-    except Exception:
+
+
+def _translate_images(add, images: Any) -> Any:
+    # images expected as list of dicts with optional 'caption'
+    if not isinstance(images, list):
         return images
+    out = []
+    for img in images:
+        if isinstance(img, dict) and isinstance(img.get('caption'), str):
+            img = dict(img, caption=add(img['caption']))
+        out.append(img)
+    return out
 
 
-def _translate_tables(client: 'LibreTranslateClient', tables: Any, source: str, target: str) -> Any:
-    # Recursively translate string leaves inside table JSON (could be list/dict)
-    def rec(x):
-        if isinstance(x, str):
-            return _translate_safe(client, x, source, target) or x
-        if isinstance(x, list):
-            return [rec(v) for v in x]
-        if isinstance(x, dict):
-            return {k: rec(v) for k, v in x.items()}
-        return x
-    try:
-        return rec(tables)
-    except Exception:
-        return tables
+def _translate_tables(add, tables: Any) -> Any:
+    # Recursively register string leaves inside table JSON (could be list/dict)
+    if isinstance(tables, str):
+        return add(tables)
+    if isinstance(tables, list):
+        return [_translate_tables(add, v) for v in tables]
+    if isinstance(tables, dict):
+        return {k: _translate_tables(add, v) for k, v in tables.items()}
+    return tables
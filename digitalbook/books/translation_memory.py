@@ -0,0 +1,133 @@
+"""Mémoire de traduction partagée entre les livres.
+
+Chaque segment traduit (titre, paragraphe, légende, cellule de tableau, placeholders
+masqués) est enregistré sous la clé (SHA-256 du segment normalisé, langue source, langue
+cible, moteur) dans TranslationMemoryEntry. Avant tout appel au service de traduction,
+les segments sont cherchés dans un cache LRU du processus
+(TRANSLATION_MEMORY_CACHE_SIZE entrées) puis en base : en-têtes, avertissements et
+libellés communs aux manuels ne sont traduits qu'une fois.
+
+Normalisation : Unicode NFC, espaces (insécables compris) et tabulations consécutifs
+réduits à un seul,
+lignes et texte débarrassés des espaces de début / fin (les sauts de ligne comptent).
+"""
+import hashlib
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List
+
+from .models import TranslationMemoryEntry
+
+_SPACES_RE = re.compile("[ \t\u00a0]+")
+
+# Nombre de hashs par requête IN
+_LOOKUP_CHUNK = 500
+
+
+def normalize_segment(text: str) -> str:
+    text = unicodedata.normalize("NFC", text)
+    lines = (_SPACES_RE.sub(" ", line).strip() for line in text.split("\n"))
+    return "\n".join(lines).strip()
+
+
+def segment_hash(text: str) -> str:
+    return hashlib.sha256(normalize_segment(text).encode("utf-8")).hexdigest()
+
+
+class _LRUCache:
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+_cache = _LRUCache(int(os.getenv("TRANSLATION_MEMORY_CACHE_SIZE", "10000")))
+
+
+class TranslationMemory:
+    """Accès à la mémoire de traduction pour un moteur donné.
+
+    Les statistiques (hits du cache / de la base, segments enregistrés) servent au suivi
+    et au benchmark des traductions.
+    """
+
+    def __init__(self, engine: str):
+        self.engine = engine
+        self.cache_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.stored = 0
+
+    def _key(self, source_hash: str, source: str, target: str):
+        return (source_hash, source, target, self.engine)
+
+    def lookup(self, texts: List[str], source: str, target: str) -> Dict[int, str]:
+        """Traductions connues de `texts`, par indice (cache LRU, puis une requête par lot de hashs)."""
+        found = {}
+        missing = {}
+        for i, text in enumerate(texts):
+            h = segment_hash(text)
+            value = _cache.get(self._key(h, source, target))
+            if value is not None:
+                found[i] = value
+                self.cache_hits += 1
+            else:
+                missing.setdefault(h, []).append(i)
+
+        hashes = list(missing)
+        for start in range(0, len(hashes), _LOOKUP_CHUNK):
+            rows = TranslationMemoryEntry.objects.filter(
+                source_hash__in=hashes[start:start + _LOOKUP_CHUNK],
+                source_lang=source, target_lang=target, engine=self.engine,
+            ).values_list("source_hash", "translated_text")
+            for h, value in rows:
+                _cache.put(self._key(h, source, target), value)
+                for i in missing.pop(h, ()):
+                    found[i] = value
+                    self.db_hits += 1
+        self.misses += sum(len(indices) for indices in missing.values())
+        return found
+
+    def store(self, pairs: Dict[str, str], source: str, target: str) -> None:
+        """Enregistre {segment source: traduction} (les entrées existantes sont conservées)."""
+        entries = {}
+        for text, translated in pairs.items():
+            if not text or translated is None:
+                continue
+            h = segment_hash(text)
+            _cache.put(self._key(h, source, target), translated)
+            entries[h] = TranslationMemoryEntry(
+                source_hash=h, source_lang=source, target_lang=target,
+                engine=self.engine, translated_text=translated,
+            )
+        if entries:
+            TranslationMemoryEntry.objects.bulk_create(list(entries.values()), ignore_conflicts=True)
+            self.stored += len(entries)
+
+
+def clear_cache() -> None:
+    """Vide le cache LRU du processus (la base n'est pas modifiée)."""
+    _cache.clear()
@@ -11,18 +11,36 @@ from django.conf import settings
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 from django.db import transaction
-from django.db.models import F, Max
+from django.db.models import Count, F, IntegerField, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
 import json
-from .models import (
-    Book, Chapter, Section, Subsection, Thematique, ReadingProgress,
-    ThematiqueTranslation, ChapterTranslation, SectionTranslation, SubsectionTranslation,
-)
+from .models import Book, Chapter, Section, Subsection, ReadingProgress, SnapshotKind
 from .background import submit_process_book
+from .content import build_book_content, build_node_content, iter_book_export
+from .snapshots import snapshot_response, snapshots_enabled
+from .http_cache import ConditionalReadMixin, book_etag, conditional_response, stream_json_response
+from .projection import ProjectionMixin
 from qcm.models import QCM, Question, Reponse
 from .serializers import BookSerializer, BookListSerializer, BookUpdateSerializer, ChapterSerializer, SectionSerializer, SubsectionSerializer, ReadingProgressSerializer
 from authentication.custom_auth import CsrfExemptSessionAuthentication
 from rest_framework_simplejwt.authentication import JWTAuthentication
 
+def with_structure_counts(qs):
+    """Annote chapters_count / sections_count (une sous-requête chacun, sans jointure multipliée)."""
+    chapters = (
+        Chapter.objects.filter(book=OuterRef('pk')).order_by()
+        .values('book').annotate(n=Count('pk')).values('n')
+    )
+    sections = (
+        Section.objects.filter(chapter__book=OuterRef('pk')).order_by()
+        .values('chapter__book').annotate(n=Count('pk')).values('n')
+    )
+    return qs.annotate(
+        chapters_count=Coalesce(Subquery(chapters, output_field=IntegerField()), Value(0)),
+        sections_count=Coalesce(Subquery(sections, output_field=IntegerField()), Value(0)),
+    )
+
+
 class BookPagination(PageNumberPagination):
     """Pagination personnalisée pour les livres - 12 livres par page"""
     page_size = 12
@@ -30,7 +48,7 @@ class BookPagination(PageNumberPagination):
     max_page_size = 100
 
 @method_decorator(csrf_exempt, name='dispatch')
-class BookViewSet(viewsets.ModelViewSet):
+class BookViewSet(ProjectionMixin, viewsets.ModelViewSet):
     queryset = Book.objects.all()
     serializer_class = BookSerializer
     permission_classes = [IsAuthenticated]
@@ -38,6 +56,8 @@ class BookViewSet(viewsets.ModelViewSet):
     lookup_field = 'id'
     lookup_url_kwarg = 'id'
     pagination_class = BookPagination
+    # ?fields= / ?depth= : le détail seulement (la liste n'embarque pas l'arbre)
+    projection_actions = ('retrieve',)
     
     def get_serializer_class(self):
         """Retourne le serializer approprié selon l'action"""
@@ -54,6 +74,9 @@ class BookViewSet(viewsets.ModelViewSet):
         user = self.request.user
         role = getattr(getattr(user, 'profile', user), 'role_name', None) or getattr(user, 'role_name', None)
         qs = Book.objects.all()
+        if self.action in ['list', 'search', 'recent']:
+            # Compteurs et auteur de BookListSerializer chargés dans la requête de la liste
+            qs = with_structure_counts(qs).select_related('created_by')
         if role == 'admin':
             return qs
         return qs.filter(published=True)
@@ -61,6 +84,14 @@ class BookViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(created_by=self.request.user)
 
+    def retrieve(self, request, *args, **kwargs):
+        """Détail du livre (avec ses chapitres), 304 si le client a déjà cette version."""
+        book = self.get_object()
+        return conditional_response(
+            request, book_etag(request, [book]),
+            lambda: Response(self.get_serializer(book).data),
+        )
+
     def perform_update(self, serializer):
         """Empêche les non-admin de modifier le champ published."""
         user = self.request.user
@@ -265,106 +296,13 @@ class BookViewSet(viewsets.ModelViewSet):
     def export_structure(self, request, id=None):
         """Exporter la structure complète d'un livre en JSON"""
         book = self.get_object()
-        
-        # Construire la structure JSON
-        structure = {
-            "book": {
-                "id": book.id,
-                "title": book.title,
-                "url": book.url,
-                "pdf_url": book.pdf_url,
-                "cover_image": book.cover_image.url if book.cover_image else None,
-                "created_at": book.created_at.isoformat()
-            },
-            "chapters": []
-        }
-        
-        # Récupérer tous les chapitres du livre avec leurs sections et sous-sections
-        for chapter in book.chapters.all().order_by('order'):
-            # Récupérer les QCMs associés à ce chapitre
-            qcms = chapter.qcms.all()
-            qcm_data = []
-            
-            for qcm in qcms:
-                qcm_info = {
-                    "id": qcm.id,
-                    "title": qcm.title,
-                    "description": qcm.description,
-                    "created_at": qcm.created_at.isoformat(),
-                    "updated_at": qcm.updated_at.isoformat(),
-                    "question_count": qcm.questions.count(),
-                    "questions": []
-                }
-                
-                # Ajouter les questions et réponses pour chaque QCM
-                for question in qcm.questions.all().order_by('order'):
-                    question_info = {
-                        "id": question.id,
-                        "text": question.text,
-                        "order": question.order,
-                        "responses": []
-                    }
-                    
-                    # Ajouter les réponses pour chaque question
-                    for response in question.reponses.all().order_by('order'):
-                        response_info = {
-                            "id": response.id,
-                            "text": response.text,
-                            "is_correct": response.is_correct,
-                            "order": response.order
-                        }
-                        question_info["responses"].append(response_info)
-                    
-                    qcm_info["questions"].append(question_info)
-                
-                qcm_data.append(qcm_info)
-            
-            chapter_data = {
-                "id": chapter.id,
-                "title": chapter.title,
-                "content": chapter.content,
-                "order": chapter.order,
-                "is_intro": getattr(chapter, 'is_intro', False),
-                "images": getattr(chapter, 'images', []),
-                "tables": getattr(chapter, 'tables', []),
-                "thematique": {
-                    "id": chapter.thematique.id,
-                    "title": chapter.thematique.title,
-                    "description": chapter.thematique.description
-                } if chapter.thematique else None,
-                "sections": [],
-                "qcm": qcm_data  # Ajouter les QCMs au chapitre
-            }
-            
-            # Récupérer toutes les sections du chapitre
-            for section in chapter.sections.all().order_by('order'):
-                section_data = {
-                    "id": section.id,
-                    "title": section.title,
-                    "content": section.content,
-                    "order": section.order,
-                    "images": section.images,
-                    "tables": section.tables,
-                    "subsections": []
-                }
-                
-                # Récupérer toutes les sous-sections de la section
-                for subsection in section.subsections.all().order_by('order'):
-                    subsection_data = {
-                        "id": subsection.id,
-                        "title": subsection.title,
-                        "content": subsection.content,
-                        "order": subsection.order,
-                        "images": subsection.images,
-                        "tables": subsection.tables
-                    }
-                    section_data["subsections"].append(subsection_data)
-                
-                chapter_data["sections"].append(section_data)
-            
-            structure["chapters"].append(chapter_data)
-        
-        return Response(structure, status=status.HTTP_200_OK)
+        if snapshots_enabled():
+            return snapshot_response(request, book, SnapshotKind.EXPORT)
+        return conditional_response(
+            request, book_etag(request, [book]),
+            # JSON envoyé chapitre par chapitre (gzip si accepté) : voir content.iter_book_export
+            lambda: stream_json_response(request, iter_book_export(book)),
+        )
     
     @action(detail=False, methods=['get'])
     def recent(self, request):
@@ -376,9 +314,9 @@ class BookViewSet(viewsets.ModelViewSet):
         seven_days_ago = timezone.now() - timedelta(days=7)
         
         # Récupérer les 5 derniers livres créés dans les 7 derniers jours, ordonnés par date de création
-        recent_books = Book.objects.filter(
+        recent_books = with_structure_counts(Book.objects.filter(
             created_at__gte=seven_days_ago
-        ).order_by('-created_at')[:5]  # Limiter aux 5 derniers livres
+        )).select_related('created_by').order_by('-created_at')[:5]  # Limiter aux 5 derniers livres
         
         # Utiliser le BookListSerializer pour une réponse optimisée
         serializer = self.get_serializer(recent_books, many=True)
@@ -402,7 +340,84 @@ class BookViewSet(viewsets.ModelViewSet):
             'started_at': book.processing_started_at,
             'finished_at': book.processing_finished_at,
         }
-        return Response(data, status=status.HTTP_200_OK)
+        return conditional_response(
+            request, book_etag(request, [book]), lambda: Response(data, status=status.HTTP_200_OK)
+        )
+
+    @action(detail=True, methods=['post'], url_path='reimport')
+    def reimport(self, request, id=None):
+        """Ré-importe un livre existant (nouveau PDF et/ou JSON de structure, sinon le PDF actuel).
+
+        Seuls les nœuds modifiés sont réécrits (books/reimport.py) : les IDs, QCM, progressions
+        de lecture et traductions encore valides des nœuds inchangés sont conservés.
+        """
+        book = self.get_object()
+        user = request.user
+        role = getattr(getattr(user, 'profile', user), 'role_name', None) or getattr(user, 'role_name', None)
+        if role != 'admin' and book.created_by_id != user.id:
+            raise PermissionDenied("Seul un admin ou le créateur du livre peut le ré-importer.")
+
+        import os
+        import uuid
+
+        pdf_file = request.FILES.get('pdf_file')
+        if pdf_file and not pdf_file.name.lower().endswith('.pdf'):
+            return Response(
+                {'error': 'Le fichier doit être au format PDF'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Un seul traitement à la fois par livre (mise à jour conditionnelle du statut)
+        queued = Book.objects.filter(id=book.id).exclude(
+            processing_status__in=['queued', 'processing']
+        ).update(
+            processing_status='queued',
+            processing_progress=0,
+            processing_error=None,
+            processing_started_at=None,
+            processing_finished_at=None,
+        )
+        if not queued:
+            return Response(
+                {'error': 'Un traitement est déjà en cours pour ce livre'},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        if pdf_file:
+            upload_dir = os.path.join(settings.MEDIA_ROOT, 'books/pdfs')
+            os.makedirs(upload_dir, exist_ok=True)
+            unique_filename = f"{uuid.uuid4()}{os.path.splitext(pdf_file.name)[1]}"
+            with open(os.path.join(upload_dir, unique_filename), 'wb+') as destination:
+                for chunk in pdf_file.chunks():
+                    destination.write(chunk)
+            book.pdf_url = f"{settings.MEDIA_URL}books/pdfs/{unique_filename}"
+            book.save(update_fields=['pdf_url'])
+
+        json_rel_path = None
+        json_file = request.FILES.get('json_structure_file')
+        if json_file:
+            json_dir = os.path.join(settings.MEDIA_ROOT, 'books/json')
+            os.makedirs(json_dir, exist_ok=True)
+            json_name = f"{uuid.uuid4()}.json"
+            with open(os.path.join(json_dir, json_name), 'wb') as out:
+                for chunk in json_file.chunks():
+                    out.write(chunk)
+            json_rel_path = os.path.join('books/json', json_name).replace('\\', '/')
+
+        generate_qcm = str(request.data.get('generate_qcm', 'true')).lower() == 'true'
+        try:
+            nb_questions = int(request.data.get('nb_questions_per_chapter', getattr(settings, 'QCM_DEFAULT_QUESTIONS', 5)))
+        except Exception:
+            nb_questions = getattr(settings, 'QCM_DEFAULT_QUESTIONS', 5)
+
+        submit_process_book(
+            book_id=book.id,
+            json_structure_file_rel=json_rel_path,
+            generate_qcm=generate_qcm,
+            nb_questions_per_chapter=nb_questions,
+            reimport=True,
+        )
+        return Response({'status': 'queued', 'book_id': book.id}, status=status.HTTP_202_ACCEPTED)
 
     @action(detail=True, methods=['post'], url_path='finalize')
     def finalize(self, request, id=None):
@@ -429,117 +444,28 @@ class BookViewSet(viewsets.ModelViewSet):
         """Retourner la structure du livre avec traductions selon ?lang=fr|en|pt (fallback sur source)."""
         book = self.get_object()
         req_lang = (request.query_params.get('lang') or '').strip().lower()
-        if req_lang not in ('fr', 'en', 'pt'):
-            req_lang = None
-
-        def pick_thematique(thematique: Thematique):
-            data = {
-                'id': thematique.id,
-                'title': thematique.title,
-                'description': thematique.description,
-                'translation_status': None,
-            }
-            if req_lang:
-                tr = ThematiqueTranslation.objects.filter(thematique=thematique, lang=req_lang).first()
-                if tr and (tr.title or tr.description):
-                    data['title'] = tr.title or data['title']
-                    data['description'] = tr.description or data['description']
-                    data['translation_status'] = tr.status
-            return data
-
-        structure = {
-            'book': {
-                'id': book.id,
-                'title': book.title,
-                'url': book.url,
-                'pdf_url': book.pdf_url,
-                'cover_image': book.cover_image.url if book.cover_image else None,
-                'created_at': book.created_at.isoformat(),
-                'language': book.language,
-            },
-            'chapters': []
-        }
+        if snapshots_enabled():
+            # JSON précalculé par (livre, langue), versionné : voir books/snapshots.py
+            return snapshot_response(request, book, SnapshotKind.CONTENT, req_lang)
+        # Nombre de requêtes constant : voir books/content.py
+        return conditional_response(
+            request, book_etag(request, [book]),
+            lambda: Response(build_book_content(book, req_lang or None), status=status.HTTP_200_OK),
+        )
 
-        for chapter in book.chapters.all().order_by('order'):
-            ch_title = chapter.title
-            ch_content = chapter.content
-            ch_status = None
-            if req_lang:
-                trc = ChapterTranslation.objects.filter(chapter=chapter, lang=req_lang).first()
-                if trc and (trc.title or trc.content):
-                    ch_title = trc.title or ch_title
-                    ch_content = trc.content or ch_content
-                    ch_status = trc.status
-
-            chapter_data = {
-                'id': chapter.id,
-                'title': ch_title,
-                'content': ch_content,
-                'order': chapter.order,
-                'images': getattr(chapter, 'images', []),
-                'tables': getattr(chapter, 'tables', []),
-                'translation_status': ch_status,
-                'thematique': pick_thematique(chapter.thematique) if chapter.thematique else None,
-                'sections': [],
-            }
+    @action(detail=True, methods=['get'], url_path=r'nodes/(?P<kind>chapter|section|subsection)/(?P<node_id>\d+)')
+    def node(self, request, id=None, kind=None, node_id=None):
+        """Contenu d'un seul chapitre / section / sous-section (?lang=), pour un chargement à la demande."""
+        book = self.get_object()
+        req_lang = (request.query_params.get('lang') or '').strip().lower()
 
-            for section in chapter.sections.all().order_by('order'):
-                se_title = section.title
-                se_content = section.content
-                se_images = section.images
-                se_tables = section.tables
-                se_status = None
-                if req_lang:
-                    trs = SectionTranslation.objects.filter(section=section, lang=req_lang).first()
-                    if trs and (trs.title or trs.content or trs.images or trs.tables):
-                        se_title = trs.title or se_title
-                        se_content = trs.content or se_content
-                        se_images = trs.images if isinstance(trs.images, list) else se_images
-                        se_tables = trs.tables if isinstance(trs.tables, list) else se_tables
-                        se_status = trs.status
-
-                section_data = {
-                    'id': section.id,
-                    'title': se_title,
-                    'content': se_content,
-                    'order': section.order,
-                    'images': se_images,
-                    'tables': se_tables,
-                    'translation_status': se_status,
-                    'subsections': [],
-                }
+        def build():
+            data = build_node_content(book, kind, node_id, req_lang or None)
+            if data is None:
+                return Response({'error': 'Élément introuvable dans ce livre.'}, status=status.HTTP_404_NOT_FOUND)
+            return Response(data, status=status.HTTP_200_OK)
 
-                for subsection in section.subsections.all().order_by('order'):
-                    su_title = subsection.title
-                    su_content = subsection.content
-                    su_images = subsection.images
-                    su_tables = subsection.tables
-                    su_status = None
-                    if req_lang:
-                        trs = SubsectionTranslation.objects.filter(subsection=subsection, lang=req_lang).first()
-                        if trs and (trs.title or trs.content or trs.images or trs.tables):
-                            su_title = trs.title or su_title
-                            su_content = trs.content or su_content
-                            su_images = trs.images if isinstance(trs.images, list) else su_images
-                            su_tables = trs.tables if isinstance(trs.tables, list) else su_tables
-                            su_status = trs.status
-
-                    subsection_data = {
-                        'id': subsection.id,
-                        'title': su_title,
-                        'content': su_content,
-                        'order': subsection.order,
-                        'images': su_images,
-                        'tables': su_tables,
-                        'translation_status': su_status,
-                    }
-                    section_data['subsections'].append(subsection_data)
-
-                chapter_data['sections'].append(section_data)
-
-            structure['chapters'].append(chapter_data)
-
-        return Response(structure, status=status.HTTP_200_OK)
+        return conditional_response(request, book_etag(request, [book]), build)
 
     @action(detail=True, methods=['get', 'put', 'patch'], url_path='reading-progress')
     def reading_progress(self, request, id=None):
@@ -557,7 +483,7 @@ class BookViewSet(viewsets.ModelViewSet):
         serializer = ReadingProgressSerializer(rp)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
-class ChapterViewSet(viewsets.ModelViewSet):
+class ChapterViewSet(ConditionalReadMixin, ProjectionMixin, viewsets.ModelViewSet):
     """ViewSet pour la gestion des chapitres"""
     queryset = Chapter.objects.all()
     serializer_class = ChapterSerializer
@@ -615,7 +541,7 @@ class ChapterViewSet(viewsets.ModelViewSet):
         serializer.save(book=book, order=new_order)
 
 
-class SectionViewSet(viewsets.ModelViewSet):
+class SectionViewSet(ConditionalReadMixin, ProjectionMixin, viewsets.ModelViewSet):
     """ViewSet pour la gestion des sections"""
     queryset = Section.objects.all()
     serializer_class = SectionSerializer
@@ -676,7 +602,7 @@ class SectionViewSet(viewsets.ModelViewSet):
         serializer.save(chapter=chapter, order=new_order)
 
 
-class SubsectionViewSet(viewsets.ModelViewSet):
+class SubsectionViewSet(ConditionalReadMixin, ProjectionMixin, viewsets.ModelViewSet):
     """ViewSet pour la gestion des sous-sections"""
     queryset = Subsection.objects.all()
     serializer_class = SubsectionSerializer
@@ -253,6 +253,47 @@ OPENAI_MODEL = os.environ.get('OPENAI_MODEL', 'gpt-4o-mini')
 QCM_DEFAULT_QUESTIONS = int(os.environ.get('QCM_DEFAULT_QUESTIONS', '5'))
 QCM_MAX_QUESTIONS = int(os.environ.get('QCM_MAX_QUESTIONS', '10'))
 
+# Configuration de l'extraction PDF (algo_balise)
+# Nombre de processus pour l'extraction page par page (1 = séquentiel)
+PDF_EXTRACTION_WORKERS = int(os.environ.get('PDF_EXTRACTION_WORKERS', '1'))
+# Nombre de processus tesseract pour l'OCR des pages scannées (1 = OCR en ligne)
+OCR_WORKERS = int(os.environ.get('OCR_WORKERS', '2'))
+# Le cache OCR (books/ocr_cache.py) est lu dans les processus d'extraction,
+# il se configure uniquement par l'environnement :
+# OCR_CACHE_ENABLED, OCR_CACHE_PATH, OCR_CACHE_MAX_MB, OCR_LANG
+
+# Création de la hiérarchie d'un livre : sur PostgreSQL, au-delà de HIERARCHY_COPY_MIN_ROWS
+# objets, les lignes passent par COPY + INSERT ... SELECT (books/pg_copy.py) au lieu de bulk_create
+HIERARCHY_COPY_ENABLED = os.environ.get('HIERARCHY_COPY_ENABLED', 'True').lower() == 'true'
+HIERARCHY_COPY_MIN_ROWS = int(os.environ.get('HIERARCHY_COPY_MIN_ROWS', '1000'))
+
+# Exécution des traitements de livres (books/jobs.py)
+# 'thread' : pool de threads du processus web (non durable)
+# 'db'     : file durable en base, consommée par `python manage.py run_book_worker`
+# 'celery' : tâche Celery books.tasks.process_book_task
+BOOK_JOB_BACKEND = os.environ.get('BOOK_JOB_BACKEND', 'thread')
+# Nombre de traitements simultanés par file
+BOOK_JOB_QUEUES = {
+    'import': int(os.environ.get('BOOK_IMPORT_CONCURRENCY', '2')),
+    'snapshots': int(os.environ.get('BOOK_SNAPSHOT_CONCURRENCY', '1')),
+}
+# Nombre d'essais avant de marquer une tâche en échec (erreurs transitoires ; source
+# introuvable ou JSON invalide : échec dès le premier essai, voir books.jobs)
+BOOK_JOB_MAX_ATTEMPTS = int(os.environ.get('BOOK_JOB_MAX_ATTEMPTS', '3'))
+# Une tâche 'running' sans heartbeat depuis ce délai est remise en file (worker perdu)
+BOOK_JOB_STALE_SECONDS = int(os.environ.get('BOOK_JOB_STALE_SECONDS', '600'))
+
+# Snapshots JSON (gzip) des endpoints content / export_structure, versionnés par
+# Book.content_version et servis avec ETag (books/snapshots.py)
+BOOK_SNAPSHOTS_ENABLED = os.environ.get('BOOK_SNAPSHOTS_ENABLED', 'True').lower() == 'true'
+# Chapitres chargés par lot lors de l'export en flux (books/content.py, iter_book_export)
+BOOK_EXPORT_CHUNK_SIZE = int(os.environ.get('BOOK_EXPORT_CHUNK_SIZE', '20'))
+
+# Cache-Control des endpoints de lecture des livres, servis avec ETag / 304 (books/http_cache.py).
+# Par défaut le client garde la réponse et la revalide ; un cache partagé (nginx proxy_cache
+# avec proxy_cache_revalidate) demande une clé incluant Authorization et 'public, no-cache'.
+BOOK_READ_CACHE_CONTROL = os.environ.get('BOOK_READ_CACHE_CONTROL', 'private, no-cache')
+
 # Configuration du modèle utilisateur personnalisé
 AUTH_USER_MODEL = 'authentication.CustomUser'
 
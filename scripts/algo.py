@@ -6,6 +6,7 @@ import pdfplumber
 from PIL import Image
 import io
 import hashlib
+from bisect import bisect_left, bisect_right
 
 def classify_line_by_pattern(line):
     """
@@ -368,6 +369,44 @@ def find_node_for_page(structured_data, page_num):
             return ch_obj, sec_obj, sub_obj
     return ch_obj, sec_obj, sub_obj
 
+class _PageIntervals:
+    """Segments de pages triés d'une liste de nœuds frères (premier nœud couvrant gagnant)."""
+
+    def __init__(self, nodes):
+        spans = [(n.get('start_page', 0), n.get('end_page', 0), n) for n in nodes or []]
+        spans = [(s, e, n) for s, e, n in spans if s and e]
+        self._points = sorted({s for s, _, _ in spans} | {e + 1 for _, e, _ in spans})
+        self._owners = [None] * len(self._points)
+        for s, e, n in reversed(spans):
+            for k in range(bisect_left(self._points, s), bisect_left(self._points, e + 1)):
+                self._owners[k] = n
+
+    def find(self, page_num):
+        k = bisect_right(self._points, page_num) - 1
+        return self._owners[k] if k >= 0 else None
+
+class PageNodeIndex:
+    """Index page -> (chapitre, section, sous-section), même résultat que find_node_for_page en O(log n)."""
+
+    def __init__(self, structured_data):
+        self._chapters = _PageIntervals((structured_data or {}).get('chapters', []))
+        self._children = {}
+
+    def _child(self, node, key):
+        idx = self._children.get((id(node), key))
+        if idx is None:
+            idx = self._children[(id(node), key)] = _PageIntervals(node.get(key, []))
+        return idx
+
+    def find(self, page_num):
+        ch_obj = self._chapters.find(page_num)
+        if ch_obj is None:
+            return None, None, None
+        sec_obj = self._child(ch_obj, 'sections').find(page_num)
+        if sec_obj is not None:
+            return ch_obj, sec_obj, self._child(sec_obj, 'subsections').find(page_num)
+        return ch_obj, None, self._child(ch_obj, 'subsections').find(page_num)
+
 def extract_assets(pdf_path, output_dir, structured_data=None):
     """
     Extrait toutes les images et tableaux du PDF, les enregistre dans des dossiers spécifiques
@@ -408,6 +447,7 @@ def extract_assets(pdf_path, output_dir, structured_data=None):
             structured_data['images'] = []
         if 'tables' not in structured_data:
             structured_data['tables'] = []
+    node_index = PageNodeIndex(structured_data)
     
     # 1. Extraire les images avec PyMuPDF
     try:
@@ -438,7 +478,7 @@ def extract_assets(pdf_path, output_dir, structured_data=None):
                 filepath = os.path.join(images_dir, filename)
                 image.save(filepath, 'PNG')
                 
-                ch_obj, sec_obj, sub_obj = find_node_for_page(structured_data or {}, page_num + 1)
+                ch_obj, sec_obj, sub_obj = node_index.find(page_num + 1)
                 context = {
                     'chapter': {'number': ch_obj.get('number'), 'title': ch_obj.get('title')} if ch_obj else None,
                     'section': {'number': sec_obj.get('number'), 'title': sec_obj.get('title')} if sec_obj else None,
@@ -530,7 +570,7 @@ def extract_assets(pdf_path, output_dir, structured_data=None):
                             'rows': table_data['rows'],
                             'columns': table_data['columns']
                         })
-                        ch_obj, sec_obj, sub_obj = find_node_for_page(structured_data or {}, page_num + 1)
+                        ch_obj, sec_obj, sub_obj = node_index.find(page_num + 1)
                         if sub_obj is not None:
                             sub_obj.setdefault('tables', []).append(table_data)
                         elif sec_obj is not None: